@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+原子文件写入 - 不阻塞事件循环，崩溃时不留下写了一半的文件
+
+内容先写入同目录下的临时文件，再用 os.replace 原子地替换目标文件，
+读者只会看到旧版本或新版本。写入在线程池中执行，不占用事件循环；
+同一路径的并发保存按顺序进行，后保存的内容最终生效。
+
+fsync 策略（环境变量 FILE_FSYNC）：
+- none: 不调用 fsync，速度最快，断电时可能丢失最近一次保存
+- file: 替换前对临时文件调用 fsync（默认）
+- full: 另外对所在目录调用 fsync，保证重命名本身也已落盘
+"""
+
+import asyncio
+import os
+import secrets
+from typing import Dict, Optional
+
+FSYNC_POLICIES = ("none", "file", "full")
+
+
+def _fsync_policy(fsync: Optional[str]) -> str:
+    policy = (fsync or os.getenv("FILE_FSYNC", "file")).lower()
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"不支持的 fsync 策略: {policy}，可选: {', '.join(FSYNC_POLICIES)}")
+    return policy
+
+
+def atomic_write_text(path: str, content: str, fsync: Optional[str] = None) -> int:
+    """
+    原子地写入文本文件（同步版本）
+
+    Args:
+        path: 目标文件路径
+        content: 文件内容
+        fsync: fsync 策略，默认读取环境变量 FILE_FSYNC
+
+    Returns:
+        写入的字节数
+    """
+    policy = _fsync_policy(fsync)
+    directory = os.path.dirname(os.path.abspath(path))
+    data = content.encode('utf-8')
+
+    try:
+        mode: Optional[int] = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = None
+
+    # 临时文件按 0o666 创建，由系统套用当前的 umask，新建文件的权限与普通 open() 一致；
+    # 替换已有文件时沿用其权限
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{secrets.token_hex(8)}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if policy != "none":
+                os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if policy == "full" and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return len(data)
+
+
+class PathLocks:
+    """按路径分配的 asyncio 锁，没有等待者时自动释放"""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def hold(self, path: str) -> "_PathLockContext":
+        """返回指定路径的锁上下文"""
+        return _PathLockContext(self, os.path.abspath(path))
+
+
+class _PathLockContext:
+    def __init__(self, owner: PathLocks, key: str):
+        self._owner = owner
+        self._key = key
+
+    async def __aenter__(self) -> None:
+        owner = self._owner
+        lock = owner._locks.setdefault(self._key, asyncio.Lock())
+        owner._users[self._key] = owner._users.get(self._key, 0) + 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._release_user()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._owner._locks[self._key].release()
+        self._release_user()
+
+    def _release_user(self) -> None:
+        owner = self._owner
+        owner._users[self._key] -= 1
+        if owner._users[self._key] == 0:
+            del owner._users[self._key]
+            del owner._locks[self._key]
+
+
+_path_locks = PathLocks()
+
+
+async def save_text(path: str, content: str, fsync: Optional[str] = None) -> int:
+    """
+    原子地写入文本文件，不阻塞事件循环；同一路径的并发保存依次执行
+
+    Args:
+        path: 目标文件路径
+        content: 文件内容
+        fsync: fsync 策略，默认读取环境变量 FILE_FSYNC
+
+    Returns:
+        写入的字节数
+    """
+    async with _path_locks.hold(path):
+        write = asyncio.ensure_future(asyncio.to_thread(atomic_write_text, path, content, fsync))
+        try:
+            return await asyncio.shield(write)
+        except asyncio.CancelledError:
+            # 线程中的写入无法中断，等它结束后再释放锁，避免与下一次保存交错
+            await asyncio.wait({write})
+            raise
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+批量课程生成 - 为一个目录下的全部材料无人值守地生成学习脚本
+
+teaching_team.py 每次只处理 c1.txt，并在终端里询问使用哪个模型。本模块以命令行参数指定
+材料目录和模型配置，用课程生成流水线（CoursePipeline）为目录下的每个材料文件生成一份学习脚本：
+1. 同时进行的生成任务数有上限（--concurrency / BATCH_CONCURRENCY），模型请求按 batch 优先级
+   排队，与实时教学共用模型主机时不挤占学生的请求
+2. 每完成或失败一个材料就原子地更新清单，记录输出文件、耗时、模型调用次数和词元用量
+3. 重新运行时跳过已完成、材料内容和模型都未变化且输出文件仍在的条目，崩溃后从断点继续
+4. 单个材料失败只记录错误，不影响其他材料；有失败条目时以非零状态码退出
+5. 设置 BUDGET_* 环境变量时每个材料单独计算预算，超出时保存当前一版脚本并在清单中记录原因
+6. 评审收敛（CONVERGENCE_*）时提前结束修改，清单中记录收敛时的草稿变化和评审意见相似度
+
+用法：
+    python src/batch_generate.py docs/ --model gemma3:27b --output-dir courses/ --concurrency 2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from autogen_core.models import ChatCompletionClient
+
+from atomic_write import save_text
+from draft_convergence import ConvergenceDetector
+from materials_index import DEFAULT_EXTENSIONS, is_excluded, load_excludes
+from model_registry import DEFAULT_PROFILE, MODEL_PROFILES, close_default_registry, get_default_registry
+from request_scheduler import BATCH
+from run_budget import RunBudget
+from teaching_team import create_course_pipeline
+from telemetry import TelemetryRecorder, telemetry_from_env
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "batch_manifest.json"
+OUTPUT_SUFFIX = "_course_script.md"
+
+# 流水线自行负责读取、评审和保存，任务说明只给出课程要求
+BATCH_TASK = """注意全部使用中文！请基于教学材料《{title}》生成一个沉浸式学习脚本。
+
+教学脚本的要求：每个知识点的教学过程不要超过5分钟，要让学生通过"做中学"完成知识点的学习。在教学过程的最后，要根据学生的表现情况，给出基于选择题的小测验，测验时间不要超过10分钟。最后给出针对学生的全面的评估认证报告结果。"""
+
+
+def discover_materials(root: str, extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+                       exclude: Sequence[str] = ()) -> List[str]:
+    """
+    列出材料目录下的材料文件
+
+    Args:
+        root: 材料目录
+        extensions: 材料文件扩展名
+        exclude: 跳过的子目录（绝对路径），如位于材料目录内的输出目录
+
+    Returns:
+        相对于材料目录的路径，按字母顺序排列；隐藏文件和目录、.materialsignore 中列出的路径被跳过
+    """
+    root = os.path.abspath(root)
+    excluded = {os.path.abspath(path) for path in exclude}
+    ignored = load_excludes(root)
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if not d.startswith(".") and os.path.join(dirpath, d) not in excluded
+        )
+        for name in filenames:
+            path = os.path.relpath(os.path.join(dirpath, name), root)
+            if (not name.startswith(".") and name.lower().endswith(tuple(extensions))
+                    and not is_excluded(path, ignored)):
+                found.append(path)
+    return sorted(found)
+
+
+def output_path_for(output_dir: str, material: str) -> str:
+    """材料对应的学习脚本路径，保留材料的子目录结构"""
+    stem = os.path.splitext(material)[0]
+    return os.path.join(os.path.abspath(output_dir), stem + OUTPUT_SUFFIX)
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class BatchManifest:
+    """批量生成清单：每个材料的状态、输出文件、耗时和用量"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = {"version": MANIFEST_VERSION, "items": {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"清单 {path} 无法读取，将重新生成全部材料: {e}")
+            return
+        if loaded.get("version") == MANIFEST_VERSION:
+            self.data = loaded
+
+    @property
+    def items(self) -> Dict[str, Dict[str, Any]]:
+        return self.data["items"]
+
+    def is_complete(self, material: str, sha256: str, model: str) -> bool:
+        """材料已生成过脚本，且材料内容、模型都未变化，输出文件仍然存在"""
+        item = self.items.get(material)
+        return (
+            item is not None
+            and item.get("status") == "done"
+            and item.get("material_sha256") == sha256
+            and item.get("model") == model
+            and os.path.exists(item.get("output", ""))
+        )
+
+    def totals(self) -> Dict[str, Any]:
+        """各状态的条目数及已完成条目的累计耗时和用量"""
+        totals: Dict[str, Any] = {"done": 0, "failed": 0, "running": 0,
+                                  "duration_s": 0.0, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        for item in self.items.values():
+            totals[item["status"]] = totals.get(item["status"], 0) + 1
+            totals["duration_s"] = round(totals["duration_s"] + item.get("duration_s", 0.0), 3)
+            for key, value in item.get("usage", {}).items():
+                totals[key] += value
+        return totals
+
+    async def save(self) -> None:
+        self.data["updated_at"] = _now()
+        self.data["totals"] = self.totals()
+        await save_text(self.path, json.dumps(self.data, ensure_ascii=False, indent=2))
+
+
+async def run_batch(materials_dir: str, output_dir: str, model: str = DEFAULT_PROFILE,
+                    concurrency: int = 2, review_rounds: int = 3, force: bool = False,
+                    manifest_path: Optional[str] = None,
+                    client_factory: Optional[Callable[[str], ChatCompletionClient]] = None,
+                    telemetry: Optional[TelemetryRecorder] = None,
+                    log: Callable[[str], None] = print) -> BatchManifest:
+    """
+    为材料目录下的每个材料生成学习脚本
+
+    Args:
+        materials_dir: 材料目录
+        output_dir: 学习脚本的输出目录
+        model: MODEL_PROFILES 中的配置名称
+        concurrency: 同时进行的生成任务数
+        review_rounds: 每份脚本最多评审轮数
+        force: 忽略清单，重新生成全部材料
+        manifest_path: 清单路径，默认为输出目录下的 batch_manifest.json
+        client_factory: 按模型配置名称创建模型客户端，默认从共享注册表以 batch 优先级获取
+        telemetry: 遥测记录器；提供时按代理记录所有材料的模型调用
+        log: 进度输出
+
+    Returns:
+        运行结束后的清单
+    """
+    materials_dir = os.path.abspath(materials_dir)
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = BatchManifest(manifest_path or os.path.join(output_dir, MANIFEST_FILENAME))
+    manifest.data.update({"materials_dir": materials_dir, "output_dir": output_dir})
+    if client_factory is None:
+        registry = get_default_registry()
+        client_factory = lambda name: registry.get_profile_client(name, priority=BATCH)
+
+    materials = discover_materials(materials_dir, exclude=[output_dir])
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    log(f"材料目录: {materials_dir}，共 {len(materials)} 个材料，最多同时生成 {max(1, concurrency)} 个")
+
+    async def generate(material: str) -> None:
+        sha256 = await asyncio.to_thread(_sha256_file, os.path.join(materials_dir, material))
+        if not force and manifest.is_complete(material, sha256, model):
+            log(f"跳过 {material}（已完成）")
+            return
+
+        async with semaphore:
+            output = output_path_for(output_dir, material)
+            item: Dict[str, Any] = {
+                "status": "running", "model": model, "material_sha256": sha256,
+                "output": output, "started_at": _now(),
+            }
+            manifest.items[material] = item
+            await manifest.save()
+            log(f"开始 {material}")
+
+            # 每个材料单独计算预算，未设置 BUDGET_* 时只统计用量；流水线负责把客户端包装进预算
+            budget = RunBudget.from_env() or RunBudget()
+            client = client_factory(model)
+            started = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                pipeline = await create_course_pipeline(
+                    client, max_review_rounds=review_rounds, source_filename=material,
+                    output_filename=output, materials_dir=materials_dir, telemetry=telemetry,
+                    budget=budget, convergence=ConvergenceDetector.from_env(),
+                )
+                title = os.path.splitext(os.path.basename(material))[0]
+                result = await pipeline.run(BATCH_TASK.format(title=title))
+                item.update({
+                    "status": "done", "approved": pipeline.approved,
+                    "review_rounds": pipeline.review_rounds, "stop_reason": result.stop_reason,
+                    "budget_exceeded": pipeline.budget_exceeded, "converged": pipeline.converged,
+                    "revisions": pipeline.revisions,
+                })
+                item.pop("error", None)
+            except Exception as e:
+                item.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+            finally:
+                item.update({
+                    "finished_at": _now(),
+                    "duration_s": round(time.perf_counter() - started, 3),
+                    "usage": budget.usage(),
+                })
+                await client.close()
+            await manifest.save()
+            if item["status"] == "done":
+                log(f"完成 {material} -> {output}（{item['duration_s']} 秒，{item['usage']['calls']} 次模型调用）")
+            else:
+                log(f"失败 {material}: {item['error']}")
+
+    await asyncio.gather(*(generate(material) for material in materials))
+    # 从材料目录中删除的材料不再出现在清单中
+    for material in set(manifest.items) - set(materials):
+        del manifest.items[material]
+    await manifest.save()
+    return manifest
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="为材料目录批量生成学习脚本")
+    parser.add_argument("materials_dir", help="材料目录")
+    parser.add_argument("--model", default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help="模型配置")
+    parser.add_argument("--output-dir", default=None, help="学习脚本的输出目录（默认为材料目录下的 courses/）")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "2")),
+                        help="同时进行的生成任务数（默认读取 BATCH_CONCURRENCY）")
+    parser.add_argument("--review-rounds", type=int, default=int(os.getenv("COURSE_REVIEW_ROUNDS", "3")),
+                        help="每份脚本最多评审轮数")
+    parser.add_argument("--manifest", default=None, help="清单路径（默认为输出目录下的 batch_manifest.json）")
+    parser.add_argument("--force", action="store_true", help="忽略清单，重新生成全部材料")
+    args = parser.parse_args(argv)
+
+    telemetry = telemetry_from_env()
+    try:
+        manifest = await run_batch(
+            args.materials_dir,
+            args.output_dir or os.path.join(args.materials_dir, "courses"),
+            model=args.model,
+            concurrency=args.concurrency,
+            review_rounds=args.review_rounds,
+            force=args.force,
+            manifest_path=args.manifest,
+            telemetry=telemetry,
+        )
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+            print(telemetry.format_summary())
+        await close_default_registry()
+
+    totals = manifest.totals()
+    print(f"清单: {manifest.path}")
+    print(f"完成 {totals['done']}，失败 {totals['failed']}；累计 {totals['calls']} 次模型调用，"
+          f"输入 {totals['prompt_tokens']} 词元，输出 {totals['completion_tokens']} 词元")
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
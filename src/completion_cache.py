@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+模型调用结果缓存 - 按内容寻址的磁盘缓存，支持录制与严格回放
+
+缓存键为 (模型, 消息, 参数, 工具) 的哈希值，结果以JSON文件保存在磁盘上，
+超过容量上限时按最近使用时间淘汰。重复运行教学团队时，相同的请求直接返回缓存结果。
+同一进程中同一缓存目录只有一个存储（get_completion_store），所有代理和会话共用其索引和容量上限；
+文件读写在线程池中进行，不阻塞事件循环。
+
+缓存模式（COMPLETION_CACHE_MODE 环境变量）：
+- off: 不使用缓存（默认）
+- read_write: 命中则直接返回，未命中时调用模型并写入缓存
+- record: 总是调用模型，并用新结果覆盖缓存
+- replay: 只从缓存读取，未命中时抛出 CacheMissError
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+from pydantic import BaseModel
+
+from model_registry import DelegatingChatCompletionClient
+
+
+CACHE_MODES = ("off", "read_write", "record", "replay")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "completions")
+
+
+class CacheMissError(Exception):
+    """严格回放模式下缓存未命中"""
+
+
+class DiskCompletionStore:
+    """磁盘上的缓存存储，超过容量上限时按最近使用时间淘汰"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        # 键 -> (文件大小, 最近使用时间)；第一次读写时才扫描缓存目录
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None
+        self._total_bytes = 0
+        # get / set 可能同时在线程池的多个线程中执行
+        self._lock = threading.RLock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key[:2], f"{key}.json")
+
+    def _ensure_index(self) -> Dict[str, Tuple[int, float]]:
+        """扫描缓存目录，重建大小与使用时间索引"""
+        with self._lock:
+            if self._index is None:
+                os.makedirs(self._cache_dir, exist_ok=True)
+                index: Dict[str, Tuple[int, float]] = {}
+                for root, _, files in os.walk(self._cache_dir):
+                    for name in files:
+                        if not name.endswith(".json"):
+                            continue
+                        stat = os.stat(os.path.join(root, name))
+                        index[name[:-5]] = (stat.st_size, stat.st_mtime)
+                        self._total_bytes += stat.st_size
+                self._index = index
+            return self._index
+
+    @property
+    def total_bytes(self) -> int:
+        """当前缓存占用的字节数"""
+        self._ensure_index()
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._ensure_index())
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存条目，命中时刷新其使用时间"""
+        with self._lock:
+            index = self._ensure_index()
+            if key not in index:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._forget(key)
+                return None
+            now = time.time()
+            os.utime(path, (now, now))
+            index[key] = (index[key][0], now)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """写入缓存条目（先写临时文件再重命名），必要时淘汰旧条目"""
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            index = self._ensure_index()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if key in index:
+                self._total_bytes -= index[key][0]
+            index[key] = (len(data), time.time())
+            self._total_bytes += len(data)
+            self._evict()
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """在线程池中读取缓存条目"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        """在线程池中写入缓存条目"""
+        await asyncio.to_thread(self.set, key, value)
+
+    def _forget(self, key: str) -> None:
+        size, _ = self._ensure_index().pop(key, (0, 0.0))
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        """按最近使用时间从旧到新淘汰，直到总大小不超过上限"""
+        if self._total_bytes <= self._max_bytes:
+            return
+        for key, _ in sorted(self._ensure_index().items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self._max_bytes:
+                break
+            self._forget(key)
+
+
+_stores: Dict[str, DiskCompletionStore] = {}
+
+
+def get_completion_store(cache_dir: Optional[str] = None, max_bytes: Optional[int] = None) -> DiskCompletionStore:
+    """
+    获取进程内共享的缓存存储，同一缓存目录只扫描一次，容量上限对所有使用者生效
+
+    Args:
+        cache_dir: 缓存目录，默认读取 COMPLETION_CACHE_DIR 环境变量
+        max_bytes: 缓存总大小上限，默认读取 COMPLETION_CACHE_MAX_MB 环境变量；只在第一次创建时生效
+    """
+    cache_dir = os.path.abspath(cache_dir or os.getenv("COMPLETION_CACHE_DIR", DEFAULT_CACHE_DIR))
+    store = _stores.get(cache_dir)
+    if store is None:
+        if max_bytes is None:
+            max_bytes = int(os.getenv("COMPLETION_CACHE_MAX_MB", "512")) * 1024 * 1024
+        store = _stores[cache_dir] = DiskCompletionStore(cache_dir, max_bytes=max_bytes)
+    return store
+
+
+def _client_identity(client: ChatCompletionClient) -> Dict[str, Any]:
+    """沿包装链找到底层客户端的创建参数（模型名称、options等）"""
+    while True:
+        create_args = getattr(client, "_create_args", None)
+        if create_args is not None:
+            return dict(create_args)
+        inner = getattr(client, "inner_client", None)
+        if inner is None:
+            return {"model_info": dict(client.model_info)}
+        client = inner
+
+
+def _serialize_result(result: Union[str, CreateResult]) -> Any:
+    if isinstance(result, CreateResult):
+        return {"create_result": result.model_dump(mode="json")}
+    return result
+
+
+def _deserialize_result(item: Any) -> Union[str, CreateResult]:
+    if isinstance(item, dict):
+        result = CreateResult.model_validate(item["create_result"])
+        result.cached = True
+        return result
+    return item
+
+
+class CachedChatCompletionClient(DelegatingChatCompletionClient):
+    """带磁盘缓存的模型客户端"""
+
+    def __init__(self, client: ChatCompletionClient, store: Optional[DiskCompletionStore] = None,
+                 mode: str = "read_write"):
+        """
+        Args:
+            client: 被包装的模型客户端
+            store: 缓存存储，默认使用共享的 DEFAULT_CACHE_DIR 存储
+            mode: 缓存模式，见模块说明
+        """
+        super().__init__(client)
+        if mode not in CACHE_MODES:
+            raise ValueError(f"不支持的缓存模式: {mode}")
+        self._store = store if store is not None else get_completion_store(DEFAULT_CACHE_DIR)
+        self._mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def cache_key(self, messages: Sequence[LLMMessage], tools: Sequence[Union[Tool, ToolSchema]] = [],
+                  json_output: Optional[Any] = None, extra_create_args: Mapping[str, Any] = {}) -> str:
+        """计算请求的缓存键"""
+        if isinstance(json_output, type) and issubclass(json_output, BaseModel):
+            json_output = json_output.model_json_schema()
+        data = {
+            "client": _client_identity(self._client),
+            "messages": [message.model_dump(mode="json") for message in messages],
+            "tools": [(tool.schema if isinstance(tool, Tool) else tool) for tool in tools],
+            "json_output": json_output,
+            "extra_create_args": dict(extra_create_args),
+        }
+        serialized = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    async def _lookup(self, key: str) -> Optional[List[Any]]:
+        """按缓存模式查询缓存，严格回放模式下未命中时抛出异常"""
+        if self._mode == "record":
+            return None
+        cached = await self._store.aget(key)
+        if cached is None:
+            self.misses += 1
+            if self._mode == "replay":
+                raise CacheMissError(f"回放模式下缓存未命中: {key}")
+            return None
+        self.hits += 1
+        return cached
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        key = self.cache_key(
+            messages, kwargs.get("tools", []), kwargs.get("json_output"), kwargs.get("extra_create_args", {})
+        )
+        cached = await self._lookup(key)
+        if cached is not None:
+            # 流式调用留下的缓存中，最后一项是完整结果
+            return _deserialize_result(cached[-1])
+
+        result = await self._client.create(messages, **kwargs)
+        await self._store.aset(key, [_serialize_result(result)])
+        return result
+
+    def create_stream(
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            key = self.cache_key(
+                messages, kwargs.get("tools", []), kwargs.get("json_output"), kwargs.get("extra_create_args", {})
+            )
+            cached = await self._lookup(key)
+            if cached is not None:
+                for item in cached:
+                    yield _deserialize_result(item)
+                return
+
+            output: List[Any] = []
+            async for chunk in self._client.create_stream(messages, **kwargs):
+                output.append(_serialize_result(chunk))
+                yield chunk
+            # 只有完整结束的流才写入缓存
+            await self._store.aset(key, output)
+
+        return _generator()
+
+
+def wrap_with_cache(client: ChatCompletionClient, mode: Optional[str] = None,
+                    cache_dir: Optional[str] = None) -> ChatCompletionClient:
+    """
+    按配置为模型客户端加上磁盘缓存
+
+    Args:
+        client: 模型客户端
+        mode: 缓存模式，默认读取 COMPLETION_CACHE_MODE 环境变量
+        cache_dir: 缓存目录，默认读取 COMPLETION_CACHE_DIR 环境变量
+
+    Returns:
+        模式为 off 时返回原客户端，否则返回带缓存的客户端
+    """
+    mode = mode or os.getenv("COMPLETION_CACHE_MODE", "off")
+    if mode == "off" or isinstance(client, CachedChatCompletionClient):
+        return client
+    return CachedChatCompletionClient(client, get_completion_store(cache_dir), mode=mode)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+上下文预算 - 按请求估算提示词长度，自适应选择 num_ctx
+
+Ollama 会按 num_ctx 分配 KV 缓存，num_ctx 变化时还可能重新加载模型。
+这里先用兼顾中文的估算器估计每个请求的提示词长度，再从少量固定档位中选择 num_ctx：
+档位只在需要时升高，连续多次用不到当前档位才降低，以减少模型重新加载。
+
+num_ctx 同时容纳提示词和模型输出，所以选择档位时要为输出预留词元。默认预留（NUM_CTX_RESERVE）
+适合回复较短的代理；课程生成以及评审整篇脚本、写出长篇意见的代理应使用 long_output_reserve()，
+否则较小的档位会截断输出。options 中设置了 num_predict（输出词元上限）时按它预留。
+"""
+
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+from autogen_core.models import LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+
+# 中日韩统一表意文字及全角标点，大多数中文模型的分词器中约一字一词元
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+DEFAULT_BUCKETS: Tuple[int, ...] = (4096, 8192, 16384, 32768, 65536)
+
+# 每条消息的角色、分隔符等额外开销
+_MESSAGE_OVERHEAD = 4
+
+
+def long_output_reserve() -> int:
+    """输出整篇学习脚本的代理所需的输出预留，默认读取 NUM_CTX_RESERVE_LONG 环境变量"""
+    return int(os.getenv("NUM_CTX_RESERVE_LONG", "16384"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的词元数
+
+    中文字符按每字一个词元计算，其余字符按每4个字符一个词元计算。
+
+    Args:
+        text: 要估算的文本
+
+    Returns:
+        估算的词元数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + math.ceil(other / 4)
+
+
+def content_text(content: Any) -> str:
+    """把消息内容（字符串、函数调用、工具结果、图片等）转换为用于估算的文本"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, (list, tuple)):
+        return "\n".join(content_text(item) for item in content)
+    for attr in ("content", "arguments"):
+        value = getattr(content, attr, None)
+        if isinstance(value, str):
+            return value
+    return ""
+
+
+def estimate_messages_tokens(messages: Sequence[LLMMessage],
+                             tools: Sequence[Union[Tool, ToolSchema]] = ()) -> int:
+    """
+    估算一次请求的提示词词元数（消息 + 工具定义）
+
+    Args:
+        messages: 请求的消息列表
+        tools: 请求携带的工具
+
+    Returns:
+        估算的词元数
+    """
+    total = 0
+    for message in messages:
+        total += estimate_tokens(content_text(getattr(message, "content", ""))) + _MESSAGE_OVERHEAD
+    for tool in tools:
+        schema = tool.schema if isinstance(tool, Tool) else tool
+        total += estimate_tokens(json.dumps(schema, ensure_ascii=False))
+    return total
+
+
+class ContextBudgeter:
+    """为同一模型的请求选择 num_ctx 档位，并记录选择情况"""
+
+    def __init__(self, max_num_ctx: Optional[int] = None, buckets: Optional[Sequence[int]] = None,
+                 reserve_tokens: Optional[int] = None, shrink_after: int = 20):
+        """
+        Args:
+            max_num_ctx: num_ctx 上限，默认读取 NUM_CTX 环境变量
+            buckets: 可选的 num_ctx 档位，默认读取 NUM_CTX_BUCKETS 环境变量（逗号分隔）
+            reserve_tokens: 默认为模型输出预留的词元数，默认读取 NUM_CTX_RESERVE 环境变量；
+                单次请求可以在 choose_num_ctx / apply 中另行指定
+            shrink_after: 连续多少次请求都能放进更小档位时才降档
+        """
+        if max_num_ctx is None:
+            max_num_ctx = int(os.getenv("NUM_CTX", "60000"))
+        if buckets is None:
+            env_buckets = os.getenv("NUM_CTX_BUCKETS")
+            buckets = [int(b) for b in env_buckets.split(",")] if env_buckets else DEFAULT_BUCKETS
+        if reserve_tokens is None:
+            reserve_tokens = int(os.getenv("NUM_CTX_RESERVE", "2048"))
+
+        self._max_num_ctx = max_num_ctx
+        # 超过上限的档位截断为上限本身
+        self._buckets = sorted({min(b, max_num_ctx) for b in buckets} | {max_num_ctx})
+        self._reserve_tokens = reserve_tokens
+        self._shrink_after = shrink_after
+        self._current: Optional[int] = None
+        self._smaller_streak = 0
+
+        self._requests = 0
+        self._bucket_counts: Dict[int, int] = {}
+        self._bucket_changes = 0
+        self._estimated_prompt_tokens = 0
+        self._overflows = 0
+
+    @property
+    def current(self) -> Optional[int]:
+        """当前使用的档位"""
+        return self._current
+
+    def choose_num_ctx(self, prompt_tokens: int, reserve_tokens: Optional[int] = None) -> int:
+        """
+        为估算的提示词长度选择 num_ctx
+
+        Args:
+            prompt_tokens: 估算的提示词词元数
+            reserve_tokens: 本次请求为输出预留的词元数，默认使用创建时的预留
+
+        Returns:
+            选定的 num_ctx
+        """
+        if reserve_tokens is None:
+            reserve_tokens = self._reserve_tokens
+        needed = prompt_tokens + reserve_tokens
+        fitting = next((b for b in self._buckets if b >= needed), self._max_num_ctx)
+        if needed > self._max_num_ctx:
+            self._overflows += 1
+
+        if self._current is None or fitting > self._current:
+            # 需要更大的上下文时立即升档
+            chosen = fitting
+            self._smaller_streak = 0
+        elif fitting < self._current:
+            # 连续多次用不到当前档位才降档，避免模型频繁重新加载
+            self._smaller_streak += 1
+            chosen = fitting if self._smaller_streak >= self._shrink_after else self._current
+            if chosen != self._current:
+                self._smaller_streak = 0
+        else:
+            chosen = self._current
+            self._smaller_streak = 0
+
+        if self._current is not None and chosen != self._current:
+            self._bucket_changes += 1
+        self._current = chosen
+
+        self._requests += 1
+        self._estimated_prompt_tokens += prompt_tokens
+        self._bucket_counts[chosen] = self._bucket_counts.get(chosen, 0) + 1
+        return chosen
+
+    def apply(self, messages: Sequence[LLMMessage], tools: Sequence[Union[Tool, ToolSchema]],
+              extra_create_args: Mapping[str, Any], base_options: Optional[Mapping[str, Any]],
+              reserve_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """
+        返回带有自适应 num_ctx 的 extra_create_args
+
+        Ollama 客户端会用 extra_create_args 中的 options 整体替换创建时的 options，
+        因此这里先合并客户端原有的 options 再覆盖 num_ctx。reserve_tokens 为本次请求的输出预留；
+        options 中设置了 num_predict 时输出不会超过它，按 num_predict 预留。
+        """
+        options = dict(base_options or {})
+        options.update(extra_create_args.get("options") or {})
+        num_predict = options.get("num_predict")
+        if isinstance(num_predict, int) and num_predict > 0:
+            reserve_tokens = num_predict
+        num_ctx = self.choose_num_ctx(estimate_messages_tokens(messages, tools), reserve_tokens)
+        options["num_ctx"] = num_ctx
+        new_args = dict(extra_create_args)
+        new_args["options"] = options
+        return new_args
+
+    def metrics(self) -> Dict[str, Any]:
+        """返回档位选择的统计信息"""
+        reserved = sum(bucket * count for bucket, count in self._bucket_counts.items())
+        return {
+            "requests": self._requests,
+            "current_num_ctx": self._current,
+            "bucket_counts": dict(sorted(self._bucket_counts.items())),
+            "bucket_changes": self._bucket_changes,
+            "overflows": self._overflows,
+            "mean_prompt_tokens": round(self._estimated_prompt_tokens / self._requests, 1) if self._requests else 0,
+            "mean_num_ctx": round(reserved / self._requests, 1) if self._requests else 0,
+            "max_num_ctx": self._max_num_ctx,
+        }
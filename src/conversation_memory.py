@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+有界对话记忆 - 滑动窗口 + 滚动摘要
+
+长时间的教学会话中，每一轮都把完整历史发给模型会让预填充开销随会话长度线性增长。
+RollingSummaryChatCompletionContext 作为 AssistantAgent 的 model_context 使用：
+开头的任务消息原样保留，最近的若干条消息放在滑动窗口中，
+滑出窗口的旧消息被增量合并进一段摘要，因此每轮提示词的大小与会话长度无关。
+固定消息（如当前教学任务）按键保存，始终放在摘要之后，不会滑出窗口，同一个键的新消息替换旧消息。
+"""
+
+from typing import Any, Dict, List, Mapping, Optional
+
+from autogen_core.model_context import ChatCompletionContext, ChatCompletionContextState
+from autogen_core.models import (
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+
+from context_budget import content_text, estimate_messages_tokens, estimate_tokens
+
+
+SUMMARY_SOURCE = "summary"
+
+
+def _format_message(message: LLMMessage) -> str:
+    """把消息转换为 "发言者: 内容" 的文本"""
+    source = getattr(message, "source", None) or type(message).__name__
+    return f"{source}: {content_text(getattr(message, 'content', ''))}"
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断文本，使估算词元数不超过上限（保留末尾的最新内容）"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high) // 2
+        if estimate_tokens(text[mid:]) <= max_tokens:
+            high = mid
+        else:
+            low = mid + 1
+    return text[low:]
+
+
+class TruncatingSummarizer:
+    """不调用模型的摘要器：每条旧消息保留开头一段，整体按词元上限截断"""
+
+    def __init__(self, max_chars_per_message: int = 80):
+        self._max_chars = max_chars_per_message
+
+    async def summarize(self, summary: str, messages: List[LLMMessage], max_tokens: int) -> str:
+        lines = [summary] if summary else []
+        for message in messages:
+            text = _format_message(message).replace("\n", " ")
+            lines.append(text[:self._max_chars] + ("…" if len(text) > self._max_chars else ""))
+        return _truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class ModelSummarizer:
+    """调用模型把滑出窗口的消息合并进已有摘要"""
+
+    def __init__(self, model_client: ChatCompletionClient):
+        self._model_client = model_client
+
+    async def summarize(self, summary: str, messages: List[LLMMessage], max_tokens: int) -> str:
+        conversation = "\n".join(_format_message(m) for m in messages)
+        prompt = f"""请更新下面的教学对话摘要。
+
+已有摘要：
+{summary or "（无）"}
+
+新增对话：
+{conversation}
+
+要求：
+1. 保留学生已完成的任务、当前进度、学生的薄弱点和已给出的关键反馈
+2. 删除寒暄和重复内容
+3. 摘要不超过{max_tokens}字，直接输出摘要正文"""
+        result = await self._model_client.create([
+            SystemMessage(content="你是一个负责整理教学对话记录的助手。"),
+            UserMessage(content=prompt, source="memory"),
+        ])
+        content = result.content if isinstance(result.content, str) else ""
+        return _truncate_to_tokens(content.strip(), max_tokens)
+
+
+class RollingSummaryChatCompletionContext(ChatCompletionContext):
+    """保留开头消息 + 滚动摘要 + 最近消息窗口的模型上下文"""
+
+    def __init__(self, summarizer: Optional[Any] = None, head_size: int = 1, window_size: int = 12,
+                 summarize_batch: int = 4, max_window_tokens: int = 6000, max_summary_tokens: int = 800,
+                 initial_messages: Optional[List[LLMMessage]] = None):
+        """
+        Args:
+            summarizer: 摘要器，需实现 async summarize(summary, messages, max_tokens)，默认不调用模型
+            head_size: 原样保留的开头消息数（教学任务说明）
+            window_size: 滑动窗口保留的最近消息数
+            summarize_batch: 至少积累多少条滑出窗口的消息才更新一次摘要，减少摘要调用次数
+            max_window_tokens: 滑动窗口的词元上限，超出时提前把旧消息移出窗口
+            max_summary_tokens: 摘要的词元上限
+            initial_messages: 初始消息
+        """
+        super().__init__(initial_messages)
+        self._summarizer = summarizer or TruncatingSummarizer()
+        self._head_size = head_size
+        self._window_size = window_size
+        self._summarize_batch = summarize_batch
+        self._max_window_tokens = max_window_tokens
+        self._max_summary_tokens = max_summary_tokens
+        self._summary = ""
+        self._pinned: Dict[str, LLMMessage] = {}
+        # 已并入摘要的消息的估算词元数，用于统计节省量
+        self._summarized_tokens = 0
+        self._summarized_messages = 0
+        self._turns = 0
+        self._tokens_sent = 0
+        self._tokens_saved = 0
+
+    @property
+    def summary(self) -> str:
+        """当前的滚动摘要"""
+        return self._summary
+
+    def pin(self, key: str, message: LLMMessage) -> None:
+        """固定一条消息，替换同一个键之前固定的消息"""
+        self._pinned[key] = message
+
+    def unpin(self, key: str) -> None:
+        """取消固定"""
+        self._pinned.pop(key, None)
+
+    def _split_window(self, tail: List[LLMMessage]) -> int:
+        """返回需要移出窗口的消息数"""
+        evict = max(0, len(tail) - self._window_size)
+        while evict < len(tail) and estimate_messages_tokens(tail[evict:]) > self._max_window_tokens:
+            evict += 1
+        # 窗口不能以工具执行结果开头，否则模型看不到对应的工具调用
+        while evict < len(tail) and isinstance(tail[evict], FunctionExecutionResultMessage):
+            evict += 1
+        return evict
+
+    async def get_messages(self) -> List[LLMMessage]:
+        head = self._messages[:self._head_size]
+        tail = self._messages[self._head_size:]
+
+        evict = self._split_window(tail)
+        window_over_tokens = evict > 0 and estimate_messages_tokens(tail) > self._max_window_tokens
+        if evict >= self._summarize_batch or window_over_tokens:
+            evicted = tail[:evict]
+            self._summary = await self._summarizer.summarize(self._summary, evicted, self._max_summary_tokens)
+            self._summarized_tokens += estimate_messages_tokens(evicted)
+            self._summarized_messages += len(evicted)
+            # 已并入摘要的消息不再保存，记忆大小同样有界
+            self._messages = head + tail[evict:]
+            tail = tail[evict:]
+        # 滑出窗口的消息不足一批时暂留在窗口中，等凑够一批再合并
+
+        messages: List[LLMMessage] = list(head)
+        if self._summary:
+            messages.append(UserMessage(content=f"【此前对话摘要】\n{self._summary}", source=SUMMARY_SOURCE))
+        messages.extend(self._pinned.values())
+        messages.extend(tail)
+
+        sent = estimate_messages_tokens(messages)
+        full = (estimate_messages_tokens(head) + self._summarized_tokens
+                + estimate_messages_tokens(list(self._pinned.values())) + estimate_messages_tokens(tail))
+        self._turns += 1
+        self._tokens_sent += sent
+        self._tokens_saved += max(0, full - sent)
+        return messages
+
+    def stats(self) -> Dict[str, Any]:
+        """返回摘要次数及节省的提示词词元数（估算）"""
+        return {
+            "turns": self._turns,
+            "summarized_messages": self._summarized_messages,
+            "summary_tokens": estimate_tokens(self._summary),
+            "tokens_sent": self._tokens_sent,
+            "tokens_saved": self._tokens_saved,
+        }
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._summary = ""
+        self._pinned = {}
+        self._summarized_tokens = 0
+        self._summarized_messages = 0
+        # 统计只反映清空之后的这次运行
+        self._turns = 0
+        self._tokens_sent = 0
+        self._tokens_saved = 0
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(ChatCompletionContextState(messages=self._messages).model_dump())
+        state.update({
+            "summary": self._summary,
+            "summarized_tokens": self._summarized_tokens,
+            "summarized_messages": self._summarized_messages,
+            "pinned": {key: ChatCompletionContextState(messages=[message]).model_dump()["messages"][0]
+                       for key, message in self._pinned.items()},
+        })
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self._messages = ChatCompletionContextState.model_validate(
+            {"messages": state.get("messages", [])}
+        ).messages
+        self._summary = state.get("summary", "")
+        self._summarized_tokens = state.get("summarized_tokens", 0)
+        self._summarized_messages = state.get("summarized_messages", 0)
+        self._pinned = {
+            key: ChatCompletionContextState.model_validate({"messages": [message]}).messages[0]
+            for key, message in state.get("pinned", {}).items()
+        }
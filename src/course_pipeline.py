@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+课程生成流水线 - 用显式状态机代替 MagenticOne 编排器
+
+课程生成的流程是固定的：读取材料 → 生成脚本 → 评审 → 修改 → …… → 保存。
+MagenticOneGroupChat 的编排器在每两次代理发言之间都要调用模型更新进度账本、选择下一位发言者，
+这些编排调用既耗时又可能偏离流程。CoursePipeline 按固定的状态转移直接调用各个代理：
+材料通过 FileHandlerAgent 的工具方法读取和保存，不经过模型；
+只有课程生成、学生评审和教研组负责人评审会调用模型。
+每轮评审时，学生和教研组负责人同时收到当前脚本并发评审，
+两者的意见合并为一条结构化反馈交给课程生成器修改。
+材料超过 material_token_budget 时，课程生成器只收到目录和与任务最相关的段落，
+其余内容由它在编写时按知识点检索，提示词大小不随材料增长。
+提供 budget（RunBudget）时，每个生成和评审步骤前检查预算，超出时直接保存当前一版脚本并结束。
+提供 convergence（ConvergenceDetector）时，每轮评审后比较相邻两版脚本和评审意见，
+脚本基本不再变化且意见重复时不再修改：请教研组负责人做最终决定（decide）或直接保存（stop）。
+revision_mode 为 patch 时，课程生成器修改时只输出按章节的补丁（见 script_patch），在本地应用并检查，
+输出词元数随改动大小而不是脚本长度增长；补丁无法应用时改为要求重写整篇脚本。
+
+run_stream 的事件流与团队一致，可以直接交给 Console 显示。
+"""
+
+import asyncio
+from enum import Enum
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Dict, List, Optional, Sequence, Tuple, Union
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, ModelClientStreamingChunkEvent, TextMessage
+from autogen_core import CancellationToken
+
+from context_budget import estimate_tokens
+from script_patch import MIN_DRAFT_RATIO, PatchError, patch_instructions, revise
+
+if TYPE_CHECKING:
+    from draft_convergence import ConvergenceDetector
+    from run_budget import RunBudget
+
+
+PIPELINE_SOURCE = "pipeline"
+
+REVISION_MODES = ("patch", "rewrite")
+
+# 评审意见汇总中使用的评审代理称呼
+REVIEWER_TITLES = {
+    "student": "学生",
+    "curriculum_director": "教研组负责人",
+}
+
+
+class PipelineStage(str, Enum):
+    """流水线状态"""
+
+    READ = "read"
+    GENERATE = "generate"
+    REVIEW = "review"
+    REVISE = "revise"
+    DECIDE = "decide"
+    SAVE = "save"
+    DONE = "done"
+
+
+def extract_script(text: str) -> str:
+    """去掉课程生成器回复开头的文件保存请求，只保留学习脚本正文"""
+    lines = text.strip().splitlines()
+    while lines and (not lines[0].strip() or "save_content_to_file" in lines[0] or "FileHandlerAgent" in lines[0]):
+        lines.pop(0)
+    return "\n".join(lines).strip() or text.strip()
+
+
+class DraftTracker:
+    """从课程生成器的消息中识别完整的脚本：比迄今最长一版短一半以上的回复（如向文件处理器提出的请求）不算"""
+
+    def __init__(self) -> None:
+        self.longest = 0
+
+    def draft(self, text: str) -> Optional[str]:
+        """返回消息中的脚本正文，不是完整脚本时返回 None"""
+        script = extract_script(text)
+        self.longest = max(self.longest, len(script))
+        return script if len(script) >= self.longest * MIN_DRAFT_RATIO else None
+
+    def reset(self) -> None:
+        self.longest = 0
+
+
+def merge_critiques(review_round: int, critiques: Sequence[Tuple[str, str]], approve_keyword: str = "APPROVE") -> str:
+    """
+    把多位评审的意见合并为一条结构化的反馈消息
+
+    Args:
+        review_round: 评审轮次
+        critiques: (评审代理名称, 评审意见) 列表
+        approve_keyword: 表示评审通过的关键词
+
+    Returns:
+        按评审分节、标明结论的反馈文本
+    """
+    sections = [f"# 第 {review_round} 轮评审意见汇总"]
+    verdicts = []
+    for name, text in critiques:
+        title = REVIEWER_TITLES.get(name, name)
+        verdict = "通过" if approve_keyword in text else "需要修改"
+        verdicts.append(f"- {title}：{verdict}")
+        sections.append(f"## {title}意见（{verdict}）\n{text.strip()}")
+    sections.insert(1, "## 结论\n" + "\n".join(verdicts))
+    return "\n\n".join(sections)
+
+
+class CoursePipeline:
+    """课程生成的状态机编排器，不产生任何编排用的模型调用"""
+
+    def __init__(self, file_handler: Any, course_generator: AssistantAgent,
+                 curriculum_director: AssistantAgent, student: AssistantAgent,
+                 source_filename: str = "c1.txt", output_filename: str = "course_script.md",
+                 max_review_rounds: int = 3, approve_keyword: str = "APPROVE",
+                 material_token_budget: int = 0, material_top_k: int = 8, budget: Optional["RunBudget"] = None,
+                 convergence: Optional["ConvergenceDetector"] = None, revision_mode: str = "rewrite"):
+        """
+        Args:
+            file_handler: 文件处理代理，需提供 read_file_content / save_content_to_file 方法，
+                设置 material_token_budget 时还需提供 get_table_of_contents / search_materials 方法
+            course_generator: 课程生成代理
+            curriculum_director: 教研组负责人代理，回复中包含 approve_keyword 表示通过
+            student: 学生代理
+            source_filename: 教学材料文件名
+            output_filename: 学习脚本的保存文件名
+            max_review_rounds: 最多评审轮数，达到上限时保存最后一版脚本
+            approve_keyword: 表示评审通过的关键词
+            material_token_budget: 材料超过该词元数时只提供目录和检索到的相关段落，为 0 时总是提供全文
+            material_top_k: 只提供相关段落时的段落数
+            budget: 运行预算（RunBudget），代理的模型客户端需经 budget.wrap 包装才会计入用量
+            convergence: 收敛检测器（ConvergenceDetector），评审收敛时提前结束修改
+            revision_mode: 修改方式，patch 只输出修改的章节，rewrite 重写整篇脚本
+        """
+        if max_review_rounds < 1:
+            raise ValueError("max_review_rounds 必须大于等于 1")
+        if revision_mode not in REVISION_MODES:
+            raise ValueError(f"不支持的修改方式: {revision_mode}，可选: {', '.join(REVISION_MODES)}")
+        self._file_handler = file_handler
+        self._course_generator = course_generator
+        self._curriculum_director = curriculum_director
+        self._student = student
+        self._source_filename = source_filename
+        self._output_filename = output_filename
+        self._max_review_rounds = max_review_rounds
+        self._approve_keyword = approve_keyword
+        self._material_token_budget = material_token_budget
+        self._material_top_k = material_top_k
+        self._budget = budget
+        self._convergence = convergence
+        self._revision_mode = revision_mode
+        self._reset_run_state()
+
+    def _reset_run_state(self) -> None:
+        self.stage = PipelineStage.READ
+        self.review_rounds = 0
+        self.approved = False
+        self.draft = ""
+        self.feedback = ""
+        self.saved_path: Optional[str] = None
+        self.budget_exceeded: Optional[str] = None
+        self.converged: Optional[str] = None
+        # 每轮修改的方式：patch（应用补丁）/ rewrite（重写整篇）/ fallback（补丁失败后重写），及补丁数或失败原因
+        self.revisions: List[Dict[str, Any]] = []
+        self._patch_error: Optional[str] = None
+        if self._convergence is not None:
+            self._convergence.reset()
+        self._last_response: Optional[Response] = None
+
+    async def _ask(self, agent: AssistantAgent, content: str,
+                   cancellation_token: CancellationToken) -> AsyncGenerator[Union[BaseAgentEvent, BaseChatMessage], None]:
+        """向代理发送一条消息，转发其事件流，最终回复保存在 self._last_response"""
+        request = TextMessage(content=content, source=PIPELINE_SOURCE)
+        async for event in agent.on_messages_stream([request], cancellation_token):
+            if isinstance(event, Response):
+                # 内部事件已经在流中逐条产出，这里只转发最终回复
+                self._last_response = event
+                yield event.chat_message
+            else:
+                yield event
+
+    @staticmethod
+    def _record(messages: List[Union[BaseAgentEvent, BaseChatMessage]],
+                event: Union[BaseAgentEvent, BaseChatMessage]) -> None:
+        """与团队一致，结果中不保留流式片段"""
+        if not isinstance(event, ModelClientStreamingChunkEvent):
+            messages.append(event)
+
+    def _review_prompt(self, agent: AssistantAgent) -> str:
+        if agent is self._curriculum_director:
+            return f"""这是第 {self.review_rounds} 轮评审。请严格评审下面的学习脚本。完全满足要求时回复"{self._approve_keyword}"，否则给出具体的修改意见：
+
+{self.draft}"""
+        return f"""这是第 {self.review_rounds} 轮评审。请从学生的角度评审下面的学习脚本，给出具体的修改意见：
+
+{self.draft}"""
+
+    async def _review(self, cancellation_token: CancellationToken) -> List[Tuple[AssistantAgent, Response]]:
+        """把当前脚本同时发给所有评审代理，每轮耗时取决于最慢的一位"""
+        reviewers = [self._student, self._curriculum_director]
+        responses = await asyncio.gather(*(
+            agent.on_messages([TextMessage(content=self._review_prompt(agent), source=PIPELINE_SOURCE)],
+                              cancellation_token)
+            for agent in reviewers
+        ))
+        return list(zip(reviewers, responses))
+
+    async def _material_context(self, task: str) -> str:
+        """课程生成器看到的材料：全文，或超出预算时的目录和相关段落"""
+        material = await self._file_handler.read_file_content(self._source_filename)
+        if not self._material_token_budget or estimate_tokens(material) <= self._material_token_budget:
+            return f"""以下是教学材料 {self._source_filename} 的内容：
+{material}"""
+        toc = await self._file_handler.get_table_of_contents(self._source_filename)
+        passages = await self._file_handler.search_materials(task, self._material_top_k, self._source_filename)
+        return f"""教学材料 {self._source_filename} 较长，以下是它的目录和与任务最相关的段落。编写某个知识点需要更多内容时，请调用 search_materials 工具检索。
+
+目录：
+{toc}
+
+相关段落：
+{passages}"""
+
+    def _reply_text(self) -> str:
+        assert self._last_response is not None
+        return self._last_response.chat_message.to_text()
+
+    async def run_stream(self, task: str, cancellation_token: Optional[CancellationToken] = None
+                         ) -> AsyncGenerator[Union[BaseAgentEvent, BaseChatMessage, TaskResult], None]:
+        """
+        运行流水线
+
+        Args:
+            task: 课程要求，作为课程生成的任务说明
+            cancellation_token: 取消令牌
+
+        Yields:
+            各代理的事件和消息，最后是 TaskResult
+        """
+        cancellation_token = cancellation_token or CancellationToken()
+        self._reset_run_state()
+        task_message = TextMessage(content=task, source="user")
+        messages: List[Union[BaseAgentEvent, BaseChatMessage]] = [task_message]
+        yield task_message
+
+        material = ""
+        while self.stage is not PipelineStage.DONE:
+            if self._budget is not None and self.stage in (
+                PipelineStage.GENERATE, PipelineStage.REVIEW, PipelineStage.REVISE, PipelineStage.DECIDE
+            ):
+                self.budget_exceeded = self._budget.exceeded()
+                if self.budget_exceeded is not None:
+                    # 超出预算时保存当前一版脚本，还没有脚本时直接结束
+                    self.stage = PipelineStage.SAVE if self.draft else PipelineStage.DONE
+                    continue
+
+            if self.stage is PipelineStage.READ:
+                material = await self._material_context(task)
+                self.stage = PipelineStage.GENERATE
+
+            elif self.stage is PipelineStage.GENERATE:
+                prompt = f"""{task}
+
+{material}
+
+请基于材料生成完整的沉浸式学习脚本，直接输出脚本正文。"""
+                async for event in self._ask(self._course_generator, prompt, cancellation_token):
+                    self._record(messages, event)
+                    yield event
+                self.draft = extract_script(self._reply_text())
+                self.stage = PipelineStage.REVIEW
+
+            elif self.stage is PipelineStage.REVIEW:
+                self.review_rounds += 1
+                reviews = await self._review(cancellation_token)
+                # 评审并发进行，结束后按固定顺序输出，避免多位评审的流式片段交错
+                for agent, response in reviews:
+                    for inner in response.inner_messages or []:
+                        self._record(messages, inner)
+                        yield inner
+                    self._record(messages, response.chat_message)
+                    yield response.chat_message
+
+                critiques = [(agent.name, response.chat_message.to_text()) for agent, response in reviews]
+                director_reply = dict(critiques)[self._curriculum_director.name]
+                self.approved = self._approve_keyword in director_reply
+                self.feedback = merge_critiques(self.review_rounds, critiques, self._approve_keyword)
+                change = None
+                if self._convergence is not None and not self.approved:
+                    change = self._convergence.observe(self.draft, dict(critiques))
+                if self.approved or self.review_rounds >= self._max_review_rounds:
+                    self.stage = PipelineStage.SAVE
+                elif change is not None and change.converged:
+                    # 脚本基本不再变化、评审意见重复，再修改一轮也不会有明显改进
+                    self.converged = change.describe()
+                    self.stage = PipelineStage.DECIDE if self._convergence.action == "decide" else PipelineStage.SAVE
+                else:
+                    self.stage = PipelineStage.REVISE
+
+            elif self.stage is PipelineStage.REVISE:
+                use_patch = self._revision_mode == "patch" and self._patch_error is None
+                if use_patch:
+                    prompt = f"""{self.feedback}
+
+请逐条回应上述意见并修改学习脚本。{patch_instructions(self.draft)}"""
+                elif self._patch_error is not None:
+                    prompt = f"""上一次的补丁无法应用（{self._patch_error}）。请直接输出按上述意见修改后的完整脚本正文。"""
+                else:
+                    prompt = f"""{self.feedback}
+
+请逐条回应上述意见并修改学习脚本，直接输出修改后的完整脚本正文。"""
+                async for event in self._ask(self._course_generator, prompt, cancellation_token):
+                    self._record(messages, event)
+                    yield event
+
+                reply = extract_script(self._reply_text())
+                if not use_patch:
+                    revision: Dict[str, Any] = {"round": self.review_rounds, "mode": "rewrite"}
+                    if self._patch_error is not None:
+                        revision.update({"mode": "fallback", "error": self._patch_error})
+                    self.revisions.append(revision)
+                    self.draft = reply
+                    self._patch_error = None
+                    self.stage = PipelineStage.REVIEW
+                    continue
+                try:
+                    self.draft, operations = revise(self.draft, reply)
+                except PatchError as e:
+                    # 留在修改阶段，下一次要求重写整篇脚本
+                    self._patch_error = str(e)
+                    continue
+                self.revisions.append({"round": self.review_rounds, "mode": "patch" if operations else "rewrite",
+                                       "operations": len(operations)})
+                self.stage = PipelineStage.REVIEW
+
+            elif self.stage is PipelineStage.DECIDE:
+                prompt = f"""最近一次修改后学习脚本基本没有变化（{self.converged}），评审意见也与上一轮基本相同，继续修改已不会有明显改进。
+请对当前这版学习脚本做出最终决定：可以发布时回复"{self._approve_keyword}"，否则回复"REJECT"并用一句话说明最主要的问题。"""
+                async for event in self._ask(self._curriculum_director, prompt, cancellation_token):
+                    self._record(messages, event)
+                    yield event
+                self.approved = self._approve_keyword in self._reply_text()
+                self.stage = PipelineStage.SAVE
+
+            elif self.stage is PipelineStage.SAVE:
+                self.saved_path = await self._file_handler.save_content_to_file(self.draft, self._output_filename)
+                self.stage = PipelineStage.DONE
+
+        if self.budget_exceeded is not None:
+            stop_reason = f"超出预算（{self.budget_exceeded}）" + ("，已保存当前一版脚本" if self.saved_path else "")
+        elif self.converged is not None:
+            stop_reason = f"评审已收敛（{self.converged}）"
+            if self._convergence is not None and self._convergence.action == "decide":
+                stop_reason += "，教研组负责人最终批准" if self.approved else "，教研组负责人最终未批准"
+        elif self.approved:
+            stop_reason = "教研组负责人已批准"
+        else:
+            stop_reason = f"达到评审轮数上限 {self._max_review_rounds}"
+        yield TaskResult(messages=messages, stop_reason=stop_reason)
+
+    async def run(self, task: str, cancellation_token: Optional[CancellationToken] = None) -> TaskResult:
+        """运行流水线并返回结果"""
+        result: Optional[TaskResult] = None
+        async for event in self.run_stream(task, cancellation_token):
+            if isinstance(event, TaskResult):
+                result = event
+        assert result is not None
+        return result
+
+    async def reset(self) -> None:
+        """重置流水线和所有代理的对话历史"""
+        self._reset_run_state()
+        for agent in (self._course_generator, self._curriculum_director, self._student):
+            await agent.on_reset(CancellationToken())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+草稿收敛检测 - 脚本基本不再变化、评审意见反复出现时提前结束评审
+
+评审往往在脚本实际上已经稳定后仍在继续：课程生成器相邻两版脚本只差几行，
+学生和教研组负责人重复上一轮的意见。每多一轮都要重新生成整篇脚本并评审两次。
+ConvergenceDetector 在每轮评审后比较：
+- 草稿变化：相邻两版脚本按行比较，发生变化的行所占比例
+- 评审意见相似度：每位评审本轮与上一轮意见的字符二元组 Jaccard 相似度，取各评审中的最小值
+
+变化不超过 max_draft_change 且相似度不低于 min_critique_similarity 时视为已收敛。
+收敛后的处理方式（action）：
+- decide：请教研组负责人对当前脚本做出最终的通过/不通过决定，然后保存
+- stop：直接保存当前脚本
+
+CoursePipeline 在评审阶段调用 ConvergenceDetector；MagenticOne 团队使用 ConvergenceTermination，
+它无法单独询问某位代理，收敛时总是直接保存当前脚本。
+
+环境变量：
+    CONVERGENCE_ACTION（decide / stop / off）、CONVERGENCE_DRAFT_CHANGE、CONVERGENCE_CRITIQUE_SIMILARITY
+"""
+
+import difflib
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage, TextMessage
+
+from course_pipeline import DraftTracker
+
+CONVERGENCE_ACTIONS = ("decide", "stop", "off")
+DEFAULT_MAX_DRAFT_CHANGE = 0.05
+DEFAULT_MIN_CRITIQUE_SIMILARITY = 0.6
+_SPACE_OR_PUNCT = re.compile(r"[\s\W_]+")
+
+
+def draft_change(previous: str, current: str) -> float:
+    """相邻两版脚本中发生变化的行所占比例，0 表示完全相同，1 表示完全不同"""
+    previous_lines = [line.strip() for line in previous.splitlines() if line.strip()]
+    current_lines = [line.strip() for line in current.splitlines() if line.strip()]
+    if not previous_lines and not current_lines:
+        return 0.0
+    matcher = difflib.SequenceMatcher(None, previous_lines, current_lines, autojunk=False)
+    return 1.0 - matcher.ratio()
+
+
+def _bigrams(text: str) -> set:
+    # 中文没有空格分词，按去掉空白和标点后的相邻两个字符比较
+    chars = _SPACE_OR_PUNCT.sub("", text.lower())
+    return {chars[i:i + 2] for i in range(len(chars) - 1)} or ({chars} if chars else set())
+
+
+def critique_similarity(previous: str, current: str) -> float:
+    """两条评审意见的字符二元组 Jaccard 相似度"""
+    a, b = _bigrams(previous), _bigrams(current)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class RoundChange:
+    """一轮评审相对上一轮的变化"""
+
+    review_round: int
+    draft_change: Optional[float]
+    critique_similarity: Optional[float]
+    converged: bool
+
+    def describe(self) -> str:
+        return (f"草稿变化 {self.draft_change or 0:.1%}，"
+                f"评审意见相似度 {self.critique_similarity or 0:.0%}")
+
+
+class ConvergenceDetector:
+    """逐轮比较草稿和评审意见，判断评审是否已经收敛"""
+
+    def __init__(self, max_draft_change: float = DEFAULT_MAX_DRAFT_CHANGE,
+                 min_critique_similarity: float = DEFAULT_MIN_CRITIQUE_SIMILARITY,
+                 action: str = "decide"):
+        """
+        Args:
+            max_draft_change: 草稿变化比例不超过该值时视为脚本已稳定
+            min_critique_similarity: 各评审意见与上一轮的相似度都不低于该值时视为意见重复
+            action: 收敛后的处理方式，decide 请教研组负责人做最终决定，stop 直接保存
+        """
+        if action not in ("decide", "stop"):
+            raise ValueError(f"不支持的收敛处理方式: {action}")
+        self.max_draft_change = max_draft_change
+        self.min_critique_similarity = min_critique_similarity
+        self.action = action
+        self.reset()
+
+    @classmethod
+    def from_env(cls) -> Optional["ConvergenceDetector"]:
+        """按 CONVERGENCE_* 环境变量创建，CONVERGENCE_ACTION=off 时返回 None"""
+        action = os.getenv("CONVERGENCE_ACTION", "decide").strip().lower() or "decide"
+        if action not in CONVERGENCE_ACTIONS:
+            raise ValueError(f"CONVERGENCE_ACTION 必须是 {'/'.join(CONVERGENCE_ACTIONS)} 之一: {action}")
+        if action == "off":
+            return None
+        return cls(
+            max_draft_change=float(os.getenv("CONVERGENCE_DRAFT_CHANGE", str(DEFAULT_MAX_DRAFT_CHANGE))),
+            min_critique_similarity=float(
+                os.getenv("CONVERGENCE_CRITIQUE_SIMILARITY", str(DEFAULT_MIN_CRITIQUE_SIMILARITY))
+            ),
+            action=action,
+        )
+
+    def reset(self) -> None:
+        """清空逐轮记录，开始新的一次运行"""
+        self.history: List[RoundChange] = []
+        self._draft: Optional[str] = None
+        self._critiques: Dict[str, str] = {}
+
+    def observe(self, draft: str, critiques: Dict[str, str]) -> RoundChange:
+        """
+        记录一轮评审
+
+        Args:
+            draft: 本轮评审的脚本
+            critiques: 评审代理名称到评审意见的映射
+
+        Returns:
+            本轮相对上一轮的变化；第一轮没有可比较的上一轮，不会收敛
+        """
+        change: Optional[float] = None
+        similarity: Optional[float] = None
+        if self._draft is not None:
+            change = draft_change(self._draft, draft)
+        common = [name for name in critiques if name in self._critiques]
+        if common:
+            similarity = min(critique_similarity(self._critiques[name], critiques[name]) for name in common)
+        converged = (
+            change is not None and similarity is not None
+            and change <= self.max_draft_change and similarity >= self.min_critique_similarity
+        )
+        result = RoundChange(len(self.history) + 1, change, similarity, converged)
+        self.history.append(result)
+        self._draft = draft
+        self._critiques.update(critiques)
+        return result
+
+
+class ConvergenceTermination(TerminationCondition):
+    """课程生成器的新一版脚本与上一版几乎相同、评审意见重复时终止团队，并保存当前脚本"""
+
+    def __init__(self, detector: ConvergenceDetector, draft_source: str, reviewers: Sequence[str],
+                 on_converged: Optional[Callable[[str], Awaitable[Any]]] = None):
+        """
+        Args:
+            detector: 收敛检测器
+            draft_source: 产出脚本的代理名称，如 course_generator
+            reviewers: 评审代理名称，如 student、curriculum_director
+            on_converged: 收敛时以当前脚本调用，如保存到文件
+        """
+        self._detector = detector
+        self._draft_source = draft_source
+        self._reviewers = set(reviewers)
+        self._on_converged = on_converged
+        self._terminated = False
+        self._drafts = DraftTracker()
+        self._draft: Optional[str] = None
+        self._critiques: Dict[str, str] = {}
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[Union[BaseAgentEvent, BaseChatMessage]]) -> Optional[StopMessage]:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        change: Optional[RoundChange] = None
+        for message in messages:
+            if not isinstance(message, TextMessage):
+                continue
+            if message.source in self._reviewers:
+                self._critiques[message.source] = message.content
+            elif message.source == self._draft_source:
+                draft = self._drafts.draft(message.content)
+                if draft is None:
+                    continue
+                # 新一版脚本出现时：它与上一版比较，针对上一版的评审意见与再上一轮的意见比较，
+                # 收敛时不再评审这一版
+                change = self._detector.observe(draft, dict(self._critiques))
+                self._critiques.clear()
+                self._draft = draft
+
+        if change is None or not change.converged:
+            return None
+        self._terminated = True
+        content = f"评审已收敛（{change.describe()}）"
+        if self._on_converged is not None and self._draft is not None:
+            await self._on_converged(self._draft)
+            content += "，已保存当前脚本"
+        return StopMessage(content=content, source="ConvergenceTermination")
+
+    async def reset(self) -> None:
+        self._terminated = False
+        self._drafts.reset()
+        self._draft = None
+        self._critiques.clear()
+        self._detector.reset()
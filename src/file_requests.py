@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+文件操作请求解析 - 识别发给 FileHandlerAgent 的文件读写请求
+
+FileHandlerAgent 的系统消息约定了固定的请求格式，例如：
+    FileHandlerAgent，请调用read_file_content工具读取文件，文件名：c1.txt
+    FileHandlerAgent，请调用get_table_of_contents工具查看目录，文件名：c1.txt
+    FileHandlerAgent，请调用read_file_section工具读取章节，文件名：c1.txt，章节：3
+    FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：课程.md，内容：……
+    FileHandlerAgent，请调用search_materials工具检索材料，查询：零样本提示词
+课程生成器也会在第一行给出保存请求、从第二行开始给出完整的脚本内容。
+此外也支持结构化的JSON命令：
+    {"action": "read", "filename": "c1.txt"}
+    {"action": "read", "filename": "c1.txt", "offset": 0, "length": 4096}
+    {"action": "read", "filename": "c1.txt", "section": "零样本提示词"}
+    {"action": "toc", "filename": "c1.txt"}
+    {"action": "save", "filename": "课程.md", "content": "……"}
+    {"action": "search", "query": "零样本提示词", "top_k": 3, "filename": "c1.txt"}
+
+能识别的请求由 FileHandlerAgent 直接执行，不需要模型来决定调用哪个工具。
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+READ_ACTIONS = {"read", "read_file_content", "read_file_section"}
+TOC_ACTIONS = {"toc", "get_table_of_contents"}
+SAVE_ACTIONS = {"save", "save_content_to_file"}
+SEARCH_ACTIONS = {"search", "search_materials"}
+
+_READ_PATTERN = re.compile(r'read_file_content|read_file_section|读取文件|读取章节')
+_TOC_PATTERN = re.compile(r'get_table_of_contents|查看目录')
+_SECTION_PATTERN = re.compile(r'章节\s*[：:]\s*[\[【「“"\']?([^\]】」”"\'，,；;\n]+)')
+_SAVE_PATTERN = re.compile(r'save_content_to_file|保存文件')
+_SEARCH_PATTERN = re.compile(r'search_materials|检索材料')
+_QUERY_PATTERN = re.compile(r'查询\s*[：:]\s*[\[【「“"\']?([^\]】」”"\'，,；;\n]+)')
+_FILENAME_PATTERN = re.compile(r'文件名\s*[：:]\s*[\[【「“"\']?([^\s\]】」”"\'，,；;]+)')
+_CONTENT_PATTERN = re.compile(r'内容\s*[：:]\s*', re.S)
+
+
+@dataclass
+class FileRequest:
+    """一次文件操作请求"""
+
+    action: str  # "read"、"toc"、"save" 或 "search"
+    filename: str  # 检索时为空表示全部材料
+    content: Optional[str] = None
+    offset: int = 0
+    length: int = 0  # 为 0 时读取整个文件
+    section: Optional[str] = None
+    query: Optional[str] = None
+    top_k: int = 5
+
+
+def _parse_json_command(text: str) -> Optional[FileRequest]:
+    try:
+        command = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(command, dict):
+        return None
+    action = command.get("action")
+    if action in SEARCH_ACTIONS:
+        query, top_k, filename = command.get("query"), command.get("top_k", 5), command.get("filename", "")
+        if not isinstance(query, str) or not query.strip() or not isinstance(top_k, int) or top_k < 1 \
+                or not isinstance(filename, str):
+            return None
+        return FileRequest("search", filename, query=query.strip(), top_k=top_k)
+    if not isinstance(command.get("filename"), str):
+        return None
+    if action in READ_ACTIONS:
+        offset, length, section = command.get("offset", 0), command.get("length", 0), command.get("section")
+        if not isinstance(offset, int) or not isinstance(length, int) or offset < 0 or length < 0:
+            return None
+        return FileRequest("read", command["filename"], offset=offset, length=length,
+                           section=str(section) if section is not None else None)
+    if action in TOC_ACTIONS:
+        return FileRequest("toc", command["filename"])
+    if action in SAVE_ACTIONS and isinstance(command.get("content"), str):
+        return FileRequest("save", command["filename"], command["content"])
+    return None
+
+
+def _strip_brackets(text: str) -> str:
+    text = text.strip()
+    if len(text) >= 2 and text[0] in "[【" and text[-1] in "]】":
+        return text[1:-1].strip()
+    return text
+
+
+def parse_file_request(text: str) -> Optional[FileRequest]:
+    """
+    解析一条消息中的文件操作请求
+
+    Args:
+        text: 消息文本
+
+    Returns:
+        识别到的请求；不是文件操作请求或缺少必要参数时返回 None
+    """
+    text = text.strip()
+    if text.startswith("{"):
+        return _parse_json_command(text)
+
+    first_line, _, rest = text.partition("\n")
+    filename_match = _FILENAME_PATTERN.search(first_line)
+    if _SEARCH_PATTERN.search(first_line):
+        query_match = _QUERY_PATTERN.search(first_line)
+        if query_match is None or not query_match.group(1).strip():
+            return None
+        return FileRequest("search", filename_match.group(1) if filename_match else "", query=query_match.group(1).strip())
+    if filename_match is None:
+        return None
+    filename = filename_match.group(1)
+
+    if _SAVE_PATTERN.search(first_line):
+        # "内容：" 之后为文件内容；否则第一行之后的全部文本为文件内容
+        content_match = _CONTENT_PATTERN.search(text, filename_match.end())
+        content = text[content_match.end():] if content_match else rest
+        content = _strip_brackets(content)
+        return FileRequest("save", filename, content) if content else None
+
+    if _TOC_PATTERN.search(first_line):
+        return FileRequest("toc", filename)
+
+    if _READ_PATTERN.search(first_line):
+        section_match = _SECTION_PATTERN.search(first_line)
+        return FileRequest("read", filename, section=section_match.group(1).strip() if section_match else None)
+    return None
+
+
+def find_file_request(texts: Sequence[str]) -> Optional[FileRequest]:
+    """
+    解析最新的一条消息中的文件操作请求
+
+    MagenticOne 中代理收到的是自上次发言以来的整段对话，只有最新的一条是给它的指令；
+    更早的消息中的请求可能已经过时，不再执行。
+    """
+    return parse_file_request(texts[-1]) if texts else None
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+学生输入来源 - 让 UserProxyAgent 等待学生时把控制权交还事件循环
+
+直接把 input 交给 UserProxyAgent 时，每次等待学生输入都占用一个执行器线程。这个线程无法取消：
+会话结束或中断后它仍阻塞在 stdin 上，并会吞掉学生的下一行输入。这里的输入来源都是异步的，
+等待期间流式输出、检查点保存和其他会话照常进行；等待与 UserProxyAgent 的取消令牌关联，
+团队停止时立即结束。
+
+    StdinInput    终端输入，stdin 可读时才读取，不占用线程
+    QueueInput    由程序送入的输入（如多学生教学服务收到的 HTTP 请求）
+    SocketInput   TCP 连接上按行读取的输入（如 nc 127.0.0.1 9000）
+
+用法：
+    team, _ = await create_teaching_team(model_client, input_func=StdinInput().ask)
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any, Optional, TextIO
+
+from autogen_core import CancellationToken
+
+
+class InputProvider:
+    """学生输入来源的基类，ask 即 UserProxyAgent 的异步 input_func"""
+
+    async def ask(self, prompt: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+        """显示提示并等待学生的一行输入；取消令牌触发时结束等待"""
+        pending = asyncio.ensure_future(self.read(prompt))
+        if cancellation_token is not None:
+            cancellation_token.link_future(pending)
+        return await pending
+
+    async def read(self, prompt: str) -> str:
+        """读取一行输入，输入结束时抛出 EOFError"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class StdinInput(InputProvider):
+    """从终端读取学生输入，终端可读时才读取，等待期间不占用线程"""
+
+    def __init__(self, stream: Optional[TextIO] = None, output: Optional[TextIO] = None):
+        """
+        Args:
+            stream: 输入流，默认为 sys.stdin
+            output: 显示提示的输出流，默认为 sys.stdout
+        """
+        self._stream = stream
+        self._output = output
+        self._buffer = b""
+        self._eof = False
+
+    def _write_prompt(self, prompt: str) -> None:
+        if prompt:
+            output = self._output or sys.stdout
+            output.write(prompt)
+            output.flush()
+
+    async def read(self, prompt: str) -> str:
+        stream = self._stream or sys.stdin
+        self._write_prompt(prompt)
+        try:
+            fd = stream.fileno() if stream.isatty() else None
+        except (AttributeError, OSError, ValueError):
+            fd = None
+        if fd is None:
+            # 管道、文件和 StringIO 等输入流可能已被 input() 预读进缓冲区，按行在线程中读取
+            line = await asyncio.to_thread(stream.readline)
+            if not line:
+                raise EOFError("输入已结束")
+            return line.rstrip("\r\n")
+
+        while b"\n" not in self._buffer and not self._eof:
+            chunk = await self._read_chunk(fd)
+            if chunk:
+                self._buffer += chunk
+            else:
+                self._eof = True
+        if not self._buffer and self._eof:
+            raise EOFError("输入已结束")
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line.decode(getattr(stream, "encoding", None) or "utf-8", errors="replace").rstrip("\r")
+
+    async def _read_chunk(self, fd: int) -> bytes:
+        """stdin 可读时读取已有的字节；事件循环不支持监听该描述符时在线程中读取"""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        try:
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        except (NotImplementedError, PermissionError, ValueError):
+            # Windows 的 Proactor 事件循环、普通文件等
+            return await asyncio.to_thread(os.read, fd, 65536)
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fd)
+        return os.read(fd, 65536)
+
+
+class QueueInput(InputProvider):
+    """由程序送入学生输入"""
+
+    _EOF: Any = object()
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, text: str) -> None:
+        """送入一条学生输入"""
+        self._queue.put_nowait(text)
+
+    @property
+    def pending(self) -> int:
+        """已送入但尚未读取的输入数"""
+        return self._queue.qsize()
+
+    async def read(self, prompt: str) -> str:
+        text = await self._queue.get()
+        if text is self._EOF:
+            # 留给之后的读取
+            self._queue.put_nowait(self._EOF)
+            raise EOFError("输入已关闭")
+        return text
+
+    async def close(self) -> None:
+        """关闭输入，之后的读取抛出 EOFError"""
+        self._queue.put_nowait(self._EOF)
+
+
+class SocketInput(InputProvider):
+    """从 TCP 连接按行读取学生输入，提示发送到同一连接"""
+
+    def __init__(self, reader: Optional[asyncio.StreamReader] = None,
+                 writer: Optional[asyncio.StreamWriter] = None, encoding: str = "utf-8"):
+        """
+        Args:
+            reader / writer: 已建立的连接；为空时需通过 listen 等待学生连接
+            encoding: 连接上的文本编码
+        """
+        self._reader = reader
+        self._writer = writer
+        self._encoding = encoding
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connected = asyncio.Event()
+        if reader is not None:
+            self._connected.set()
+        self.port: Optional[int] = None
+
+    @classmethod
+    async def connect(cls, host: str, port: int, encoding: str = "utf-8") -> "SocketInput":
+        """连接到提供输入的服务"""
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, encoding)
+
+    @classmethod
+    async def listen(cls, host: str = "127.0.0.1", port: int = 0, encoding: str = "utf-8") -> "SocketInput":
+        """
+        监听端口等待学生连接；连接断开后等待重新连接，新的连接替换旧的连接
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配（实际端口见 port 属性）
+        """
+        provider = cls(encoding=encoding)
+        provider._server = await asyncio.start_server(provider._on_connection, host, port)
+        provider.port = provider._server.sockets[0].getsockname()[1]
+        return provider
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader, self._writer = reader, writer
+        self._connected.set()
+
+    async def read(self, prompt: str) -> str:
+        while True:
+            await self._connected.wait()
+            reader, writer = self._reader, self._writer
+            if prompt:
+                writer.write(prompt.encode(self._encoding))
+                await writer.drain()
+            line = await reader.readline()
+            if line:
+                return line.decode(self._encoding, errors="replace").rstrip("\r\n")
+            if self._server is None:
+                raise EOFError("连接已关闭")
+            # 学生断开连接，等待重新连接
+            if self._reader is reader:
+                self._connected.clear()
+                self._writer = None
+            writer.close()
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
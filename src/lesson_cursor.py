@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+课程进度游标 - 只把当前任务交给教学助手
+
+把整份学习脚本放进教学助手的上下文会让每轮提示词随课程长度增长，只给第一个任务的开头
+又会让模型即兴发挥。LessonCursor 记录学生正在进行的任务，作为 AssistantAgent 的 memory 使用：
+每次调用模型前把当前任务的完整内容放入上下文；学生表示已完成时前进到下一个任务。
+提示词大小只与一个任务的长度有关，脚本内容不经删改。
+
+配合 RollingSummaryChatCompletionContext 使用时，当前任务作为固定消息放在摘要之后，
+不会滑出窗口，前进时被下一个任务替换；其他上下文中每个任务只在开始时加入一次。
+"""
+
+import inspect
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.memory import Memory, MemoryContent, MemoryMimeType, MemoryQueryResult, UpdateContextResult
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import SystemMessage
+
+from script_parser import LessonScript, Task
+
+PIN_KEY = "lesson_task"
+
+_DONE_PATTERN = re.compile(r'完成了|做完了|搞定了|已完成|已经完成|下一步|\bnext\b|\bdone\b', re.I)
+# 这些词也常出现在普通的回复和提问中（"我继续试试"、"下一个例子是什么意思"），只有单独成句时才算完成
+_SHORT_DONE_PATTERN = re.compile(r'^(好了|继续|下一个)[。.!！~～]*$')
+_NOT_DONE_PATTERN = re.compile(r'没|未|还不|不会|不懂|不行|吗|[?？]')
+
+
+def is_completion(text: str) -> bool:
+    """学生的回复是否表示当前任务已完成（"我完成了"、"下一步"、"好了"；"还没完成"、"完成了吗？"、"我继续试试"不算）"""
+    done = _DONE_PATTERN.search(text) or _SHORT_DONE_PATTERN.match(text.strip())
+    return bool(done) and not _NOT_DONE_PATTERN.search(text)
+
+
+class LessonCursor(Memory):
+    """按学习脚本逐个任务推进的课程进度"""
+
+    def __init__(self, script: LessonScript, start: int = 0):
+        """
+        Args:
+            script: 解析后的学习脚本
+            start: 从第几个任务开始（从 0 计数）
+        """
+        self.script = script
+        self.tasks: List[Task] = script.tasks
+        self.index = min(max(start, 0), len(self.tasks))
+        # 已经放入上下文的任务序号，任务变化时才重新放入
+        self._injected: Optional[int] = None
+
+    @property
+    def current(self) -> Optional[Task]:
+        """当前任务，全部完成后为 None"""
+        return self.tasks[self.index] if self.index < len(self.tasks) else None
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.tasks)
+
+    def advance(self) -> Optional[Task]:
+        """前进到下一个任务并返回它"""
+        if not self.finished:
+            self.index += 1
+        return self.current
+
+    def observe_learner(self, text: str) -> bool:
+        """根据学生的回复推进进度，返回是否前进了"""
+        if self.finished or not is_completion(text):
+            return False
+        self.advance()
+        return True
+
+    def wrap_input(self, input_func: Callable[..., Any]) -> Callable[..., Any]:
+        """包装 UserProxyAgent 的 input_func（同步或异步），学生的每条回复都经过游标"""
+        if inspect.iscoroutinefunction(input_func):
+            async def lesson_input_async(prompt: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+                text = await input_func(prompt, cancellation_token)
+                self.observe_learner(text)
+                return text
+            return lesson_input_async
+
+        def lesson_input(prompt: str) -> str:
+            text = input_func(prompt)
+            self.observe_learner(text)
+            return text
+        return lesson_input
+
+    def outline(self) -> str:
+        """全部任务的标题列表，当前任务带标记"""
+        lines = []
+        for i, task in enumerate(self.tasks):
+            marker = "→" if i == self.index else ("✓" if i < self.index else " ")
+            minutes = f"（{task.minutes}分钟）" if task.minutes and "分钟" not in task.title else ""
+            lines.append(f"{marker} {i + 1}. {task.title}{minutes}")
+        return "\n".join(lines)
+
+    def task_prompt(self) -> str:
+        """放入教学助手上下文的当前任务说明"""
+        task = self.current
+        if task is None:
+            return f"""【课程进度】全部 {len(self.tasks)} 个任务已完成。
+请对学生的整体表现进行总结评估并给出评分，然后输出"教学完成"。"""
+        header = f"所在模块：{task.module}"
+        if task.minutes:
+            header += f"，预计用时 {task.minutes} 分钟"
+        parts = [f"【当前任务 {self.index + 1}/{len(self.tasks)}】{task.title}", header, "", task.content]
+        if task.checklist:
+            parts += ["", "完成标准："] + [f"- {item}" for item in task.checklist]
+        parts += ["", "只围绕这个任务与学生互动；学生明确表示完成后，会给出下一个任务。"]
+        return "\n".join(parts)
+
+    async def update_context(self, model_context: ChatCompletionContext) -> UpdateContextResult:
+        """把当前任务放入模型上下文；任务没有变化时不重复加入"""
+        message = SystemMessage(content=self.task_prompt())
+        if hasattr(model_context, "pin"):
+            model_context.pin(PIN_KEY, message)
+        elif self._injected != self.index:
+            await model_context.add_message(message)
+
+        if self._injected == self.index:
+            return UpdateContextResult(memories=MemoryQueryResult(results=[]))
+        self._injected = self.index
+        return UpdateContextResult(memories=MemoryQueryResult(results=[
+            MemoryContent(content=message.content, mime_type=MemoryMimeType.TEXT,
+                          metadata={"task_index": self.index})
+        ]))
+
+    async def query(self, query: str | MemoryContent, cancellation_token: CancellationToken | None = None,
+                    **kwargs: Any) -> MemoryQueryResult:
+        """返回当前任务"""
+        return MemoryQueryResult(results=[MemoryContent(content=self.task_prompt(), mime_type=MemoryMimeType.TEXT)])
+
+    async def add(self, content: MemoryContent, cancellation_token: CancellationToken | None = None) -> None:
+        """课程内容来自学习脚本，添加的记忆被忽略（不抛出异常，以免中断使用通用记忆接口的调用方）"""
+
+    async def clear(self) -> None:
+        """回到第一个任务"""
+        self.index = 0
+        self._injected = None
+
+    async def close(self) -> None:
+        pass
+
+    async def save_state(self) -> Dict[str, Any]:
+        return {"index": self.index}
+
+    async def load_state(self, state: Dict[str, Any]) -> None:
+        self.index = min(max(int(state.get("index", 0)), 0), len(self.tasks))
+        self._injected = None
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+教学材料的分段读取 - 按字节范围或章节读取，并生成目录
+
+教学材料可能有几百KB，整篇读入后注入对话会让上下文随材料大小增长。
+这里提供按范围读取、按章节读取和目录三种方式，代理只取需要的部分。
+超过 MMAP_THRESHOLD 的文件通过内存映射访问，读取一段时不必把整个文件读入内存。
+
+偏移和长度以 UTF-8 字节计，读取时会对齐到字符边界，不会截断多字节字符。
+"""
+
+import contextlib
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# 超过该大小的文件使用内存映射读取
+MMAP_THRESHOLD = 256 * 1024
+# 未指定长度时每次读取的字节数
+DEFAULT_CHUNK_BYTES = 16 * 1024
+# 纯文本材料中被视为标题的行的最大字数
+MAX_PLAIN_HEADING_CHARS = 30
+
+_MARKDOWN_HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE = re.compile(r'^\s*(```|~~~)')
+# 以这些字符结尾的短行是正文而不是标题
+_SENTENCE_ENDINGS = tuple("。，、；：！？,.;:!?）)】」”\"")
+_PLAIN_HEADING_TEXT = re.compile(r'[A-Za-z\u3400-\u9fff]{2,}')
+_INVISIBLE = "\ufeff\u200b\u200c\u200d\u2060"
+
+
+@dataclass
+class Section:
+    """材料中的一个章节"""
+
+    title: str
+    level: int
+    start: int  # 标题行的起始字节偏移
+    end: int  # 下一个同级或更高级标题的起始字节偏移
+    line: int  # 标题所在行号（从1开始）
+
+
+@contextlib.contextmanager
+def open_material(path: str) -> Iterator[Union[bytes, mmap.mmap]]:
+    """打开材料文件，大文件返回内存映射，小文件直接返回全部字节"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD or size == 0:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _align_start(data: Union[bytes, mmap.mmap], offset: int) -> int:
+    """把偏移向后移动到 UTF-8 字符的起始字节"""
+    while offset < len(data) and (data[offset] & 0xC0) == 0x80:
+        offset += 1
+    return offset
+
+
+def read_range(path: str, offset: int = 0, length: int = DEFAULT_CHUNK_BYTES) -> Tuple[str, int, int]:
+    """
+    读取文件的一段
+
+    Args:
+        path: 文件路径
+        offset: 起始字节偏移
+        length: 读取的字节数
+
+    Returns:
+        (文本, 下一段的起始偏移, 文件总字节数)，读到文件末尾时下一段偏移等于总字节数
+    """
+    if offset < 0 or length <= 0:
+        raise ValueError("offset 不能为负数，length 必须大于 0")
+    with open_material(path) as data:
+        total = len(data)
+        start = _align_start(data, min(offset, total))
+        end = _align_start(data, min(start + length, total))
+        return bytes(data[start:end]).decode('utf-8', errors='replace'), end, total
+
+
+def _clean_line(raw: bytes) -> str:
+    text = raw.decode('utf-8', errors='replace')
+    for char in _INVISIBLE:
+        text = text.replace(char, "")
+    return text.strip()
+
+
+def iter_lines(data: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, int, bytes]]:
+    """逐行遍历，返回 (行号, 起始偏移, 行内容)"""
+    position = 0
+    line_number = 1
+    total = len(data)
+    while position < total:
+        newline = data.find(b"\n", position)
+        end = total if newline == -1 else newline
+        yield line_number, position, data[position:end]
+        position = end + 1
+        line_number += 1
+
+
+def scan_sections(data: Union[bytes, mmap.mmap]) -> List[Section]:
+    lines = []
+    in_fence = False
+    for line_number, start, raw in iter_lines(data):
+        text = _clean_line(raw)
+        if _FENCE.match(text):
+            in_fence = not in_fence
+            continue
+        # 代码块中的 "# 注释" 等行不是标题
+        if not in_fence:
+            lines.append((line_number, start, text))
+    markdown = any(_MARKDOWN_HEADING.match(text) for _, _, text in lines)
+
+    headings: List[Tuple[str, int, int, int]] = []
+    for line_number, start, text in lines:
+        if not text:
+            continue
+        if markdown:
+            match = _MARKDOWN_HEADING.match(text)
+            if match:
+                headings.append((match.group(2), len(match.group(1)), start, line_number))
+            continue
+        # 纯文本材料：不以标点结尾、且不是纯数字编号的短行视为标题
+        if (len(text) <= MAX_PLAIN_HEADING_CHARS and not text.endswith(_SENTENCE_ENDINGS)
+                and _PLAIN_HEADING_TEXT.search(text)):
+            headings.append((text, 1, start, line_number))
+
+    sections = []
+    for i, (title, level, start, line_number) in enumerate(headings):
+        end = next((h[2] for h in headings[i + 1:] if h[1] <= level), len(data))
+        sections.append(Section(title=title, level=level, start=start, end=end, line=line_number))
+    return sections
+
+
+# 目录缓存，以 (路径, 修改时间, 大小) 为键，文件变化后自动失效
+_toc_cache: Dict[Tuple[str, int, int], List[Section]] = {}
+
+
+def table_of_contents(path: str) -> List[Section]:
+    """
+    生成材料的目录
+
+    Markdown 文件按 # 标题划分章节；纯文本文件把不以标点结尾的短行视为一级标题。
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        按出现顺序排列的章节列表
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _toc_cache:
+        with open_material(path) as data:
+            _toc_cache[key] = scan_sections(data)
+    return _toc_cache[key]
+
+
+def format_toc(sections: List[Section]) -> str:
+    """把目录格式化为带序号、字节范围的文本"""
+    lines = []
+    for index, section in enumerate(sections, 1):
+        indent = "  " * (section.level - 1)
+        lines.append(f"{indent}{index}. {section.title} [offset={section.start}, length={section.end - section.start}]")
+    return "\n".join(lines)
+
+
+def find_section(sections: List[Section], heading: str) -> Optional[Section]:
+    """按序号、完整标题或标题片段查找章节"""
+    heading = heading.strip()
+    if heading.isdigit() and 1 <= int(heading) <= len(sections):
+        return sections[int(heading) - 1]
+    for section in sections:
+        if section.title == heading:
+            return section
+    for section in sections:
+        if heading in section.title:
+            return section
+    return None
+
+
+def read_section(path: str, heading: str, max_bytes: int = DEFAULT_CHUNK_BYTES * 4) -> str:
+    """
+    读取一个章节的内容
+
+    Args:
+        path: 文件路径
+        heading: 章节序号、标题或标题片段
+        max_bytes: 最多返回的字节数，超出部分可以按范围继续读取
+
+    Returns:
+        章节文本
+    """
+    section = find_section(table_of_contents(path), heading)
+    if section is None:
+        raise ValueError(f"未找到章节: {heading}")
+    text, next_offset, _ = read_range(path, section.start, min(section.end - section.start, max_bytes) or 1)
+    if next_offset < section.end:
+        text += f"\n\n[章节未读完，可从 offset={next_offset} 继续读取，章节结束于 {section.end}]"
+    return text
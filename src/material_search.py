@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+教学材料检索 - 基于 BM25 的本地全文检索
+
+把整篇材料放进课程生成器的上下文，提示词大小会随材料增长。MaterialSearch 在
+MaterialsIndex 的分块之上建立倒排索引，代理按正在编写的章节查询，只取回最相关的几段。
+中文按相邻两字（二元组）切词，英文和数字按单词切词，完全在本地计算，不需要网络。
+
+每个文件的词频按内容哈希缓存在磁盘上，刷新时只有内容变化的文件重新切词。
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from atomic_write import atomic_write_text
+from materials_index import INDEX_VERSION, Chunk, MaterialsIndex
+
+_TERM_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]+|[A-Za-z0-9]+')
+_CJK_RUN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+# 切词规则变化时递增，使磁盘上的词频缓存失效
+TOKENIZER_VERSION = 1
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """中文连续字按二元组切分（单字保留），英文和数字按小写单词切分"""
+    for run in _TERM_PATTERN.findall(text):
+        if _CJK_RUN.match(run):
+            if len(run) == 1:
+                yield run
+            else:
+                for i in range(len(run) - 1):
+                    yield run[i:i + 2]
+        else:
+            yield run.lower()
+
+
+@dataclass
+class SearchHit:
+    """一条检索结果"""
+
+    path: str
+    chunk: Chunk
+    score: float
+    text: str
+
+
+class MaterialSearch:
+    """材料分块上的 BM25 检索"""
+
+    def __init__(self, index: Optional[MaterialsIndex] = None, cache_path: Optional[str] = None,
+                 k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            index: 材料索引，默认索引项目的 docs/ 目录
+            cache_path: 词频缓存文件路径，默认与清单文件放在一起
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        self.index = index or MaterialsIndex()
+        self.cache_path = cache_path or os.path.splitext(self.index.manifest_path)[0] + ".search.json"
+        self.k1 = k1
+        self.b = b
+        # 每个文件：(内容哈希, 每个分块的词频)
+        self._file_terms: Dict[str, Tuple[str, List[Dict[str, int]]]] = {}
+        self._docs: List[Tuple[str, Chunk, int]] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._average_length = 0.0
+        self._ready = False
+        # 工具可能在多个线程中同时调用，刷新和查询串行执行
+        self._lock = threading.Lock()
+        self._load_cache()
+
+    def _settings(self) -> Dict:
+        # 切词规则或分块规则变化后，缓存中的词频与分块对不上
+        return {"tokenizer_version": TOKENIZER_VERSION, "index_version": INDEX_VERSION,
+                "chunk_tokens": self.index.chunk_tokens}
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if cache.get("settings") != self._settings():
+            return
+        self._file_terms = {path: (item["sha256"], item["chunks"]) for path, item in cache.get("files", {}).items()}
+
+    def _save_cache(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        cache = {
+            "settings": self._settings(),
+            "files": {path: {"sha256": sha, "chunks": chunks} for path, (sha, chunks) in sorted(self._file_terms.items())},
+        }
+        atomic_write_text(self.cache_path, json.dumps(cache, ensure_ascii=False), fsync="none")
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        刷新材料索引，并重新切词内容变化的文件；材料没有变化时直接复用内存中的倒排索引
+
+        Returns:
+            files（文件数）、retokenized（重新切词的文件数）、chunks（分块数）、terms（词项数）
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> Dict[str, int]:
+        stats = self.index.refresh()
+        entries = self.index.entries()
+        if self._ready and not (stats["added"] or stats["changed"] or stats["removed"]):
+            return {"files": len(entries), "retokenized": 0, "chunks": len(self._docs), "terms": len(self._postings)}
+
+        retokenized = 0
+        current = set()
+        for entry in entries:
+            current.add(entry.path)
+            cached = self._file_terms.get(entry.path)
+            if cached is None or cached[0] != entry.sha256 or len(cached[1]) != len(entry.chunks):
+                chunk_terms = [dict(Counter(tokenize(self.index.read_chunk(entry.path, chunk)))) for chunk in entry.chunks]
+                self._file_terms[entry.path] = (entry.sha256, chunk_terms)
+                retokenized += 1
+        removed = [path for path in self._file_terms if path not in current]
+        for path in removed:
+            del self._file_terms[path]
+        if retokenized or removed:
+            self._save_cache()
+
+        # 由各文件的词频重建内存中的倒排索引
+        self._docs = []
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for entry in entries:
+            for chunk, terms in zip(entry.chunks, self._file_terms[entry.path][1]):
+                doc_id = len(self._docs)
+                self._docs.append((entry.path, chunk, sum(terms.values())))
+                for term, count in terms.items():
+                    postings[term].append((doc_id, count))
+        self._postings = dict(postings)
+        self._average_length = (sum(length for _, _, length in self._docs) / len(self._docs)) if self._docs else 0.0
+        self._ready = True
+        return {"files": len(entries), "retokenized": retokenized, "chunks": len(self._docs), "terms": len(self._postings)}
+
+    def search(self, query: str, top_k: int = 5, path: Optional[str] = None) -> List[SearchHit]:
+        """
+        检索与查询最相关的分块
+
+        Args:
+            query: 查询文本
+            top_k: 返回的结果数
+            path: 只在指定材料文件（相对路径）中检索
+
+        Returns:
+            按相关度从高到低排列的结果
+        """
+        with self._lock:
+            if not self._ready:
+                self._refresh()
+            return self._search(query, top_k, path)
+
+    def _search(self, query: str, top_k: int, path: Optional[str]) -> List[SearchHit]:
+        scores: Dict[int, float] = defaultdict(float)
+        total = len(self._docs)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, count in postings:
+                length = self._docs[doc_id][2]
+                norm = self.k1 * (1 - self.b + self.b * length / (self._average_length or 1))
+                scores[doc_id] += idf * count * (self.k1 + 1) / (count + norm)
+
+        if path is not None:
+            path = os.path.normpath(path)
+            scores = {doc_id: score for doc_id, score in scores.items() if self._docs[doc_id][0] == path}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [
+            SearchHit(path=self._docs[doc_id][0], chunk=self._docs[doc_id][1], score=score,
+                      text=self.index.read_chunk(self._docs[doc_id][0], self._docs[doc_id][1]))
+            for doc_id, score in ranked
+        ]
+
+    async def search_materials(self, query: str, top_k: int = 5, filename: str = "") -> str:
+        """
+        在教学材料中检索与查询相关的段落
+
+        Args:
+            query: 要查找的知识点或问题，如 "零样本提示词"
+            top_k: 返回的段落数
+            filename: 只在该材料文件中检索，留空表示全部材料
+
+        Returns:
+            相关段落，每段标明来源文件、章节和字节范围
+        """
+        def refresh_and_search() -> List[SearchHit]:
+            # 材料可能刚被保存或修改，先增量刷新；没有变化时只需检查文件状态
+            self.refresh()
+            return self.search(query, top_k=top_k, path=filename or None)
+
+        hits = await asyncio.to_thread(refresh_and_search)
+        if not hits:
+            return f"没有找到与 \"{query}\" 相关的材料"
+        return "\n\n".join(
+            f"[{i}] {hit.path} · {hit.chunk.section or '（无章节）'} "
+            f"[offset={hit.chunk.start}, length={hit.chunk.end - hit.chunk.start}]\n{hit.text.strip()}"
+            for i, hit in enumerate(hits, 1)
+        )
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+教学材料索引 - docs/ 目录的增量内容清单
+
+每次运行都重新读取和处理全部材料是不必要的。MaterialsIndex 为 docs/ 下的每个材料文件
+记录内容哈希、修改时间、大小，以及由内容推导出的章节、词元数和分块边界，并持久化为JSON清单。
+刷新时修改时间和大小都未变的文件直接复用；变了的文件先比较哈希，内容相同只更新元数据，
+只有内容真正变化的文件才重新计算。
+
+课程生成器保存的学习脚本是生成结果而不是材料，否则检索时会把旧脚本当作材料取回。
+材料目录下的 .materialsignore 列出不纳入索引的路径（每行一个相对路径，以 / 结尾表示目录，# 开头为注释），
+FileHandlerAgent 在材料目录内保存文件时自动把它追加进去。
+
+用法：
+    python src/materials_index.py          # 刷新索引并输出摘要
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from atomic_write import atomic_write_text
+from context_budget import estimate_tokens
+from material_reader import Section, iter_lines, open_material, read_range, scan_sections
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DOCS_DIR = os.path.join(_PROJECT_ROOT, "docs")
+DEFAULT_MANIFEST_PATH = os.path.join(_PROJECT_ROOT, ".cache", "materials_manifest.json")
+DEFAULT_EXTENSIONS = (".txt", ".md")
+EXCLUDE_FILENAME = ".materialsignore"
+# 清单格式或推导规则变化时递增，旧清单中的条目全部重新计算
+INDEX_VERSION = 3
+
+
+@dataclass
+class Chunk:
+    """材料中的一个分块（字节范围）"""
+
+    start: int
+    end: int
+    tokens: int
+    section: str  # 分块所在章节的标题，不在任何章节中时为空
+
+
+@dataclass
+class MaterialEntry:
+    """一个材料文件的清单条目"""
+
+    path: str  # 相对于材料目录的路径
+    sha256: str
+    mtime_ns: int
+    size: int
+    tokens: int
+    sections: List[Section] = field(default_factory=list)
+    chunks: List[Chunk] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MaterialEntry":
+        return cls(
+            path=data["path"], sha256=data["sha256"], mtime_ns=data["mtime_ns"], size=data["size"],
+            tokens=data["tokens"],
+            sections=[Section(**s) for s in data.get("sections", [])],
+            chunks=[Chunk(**c) for c in data.get("chunks", [])],
+        )
+
+
+_exclude_lock = threading.Lock()
+
+
+def _exclude_key(path: str) -> str:
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def load_excludes(root: str) -> List[str]:
+    """读取材料目录的排除列表（相对路径，目录以 / 结尾）"""
+    try:
+        with open(os.path.join(root, EXCLUDE_FILENAME), 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def is_excluded(path: str, excludes: Sequence[str]) -> bool:
+    """相对路径是否在排除列表中，或位于列出的目录下"""
+    key = _exclude_key(path)
+    for entry in excludes:
+        if entry.endswith("/"):
+            if key.startswith(_exclude_key(entry) + "/"):
+                return True
+        elif key == _exclude_key(entry):
+            return True
+    return False
+
+
+def add_exclude(root: str, path: str) -> bool:
+    """
+    把路径加入材料目录的排除列表
+
+    Args:
+        root: 材料目录
+        path: 要排除的文件（绝对路径或相对于材料目录的路径），目录以 / 结尾
+
+    Returns:
+        是否新加入；路径不在材料目录内或已在列表中时返回 False
+    """
+    root = os.path.abspath(root)
+    relative = os.path.relpath(os.path.join(root, path), root)
+    if relative == os.curdir or relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+        return False
+    entry = _exclude_key(relative) + ("/" if path.endswith(("/", os.sep)) else "")
+    with _exclude_lock:
+        excludes = load_excludes(root)
+        if entry in excludes or is_excluded(relative, excludes):
+            return False
+        exclude_path = os.path.join(root, EXCLUDE_FILENAME)
+        try:
+            with open(exclude_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = "# 生成的学习脚本等不纳入材料索引和检索的路径，保存脚本时自动追加\n"
+        if content and not content.endswith("\n"):
+            content += "\n"
+        atomic_write_text(exclude_path, content + entry + "\n", fsync="none")
+    return True
+
+
+def chunk_material(data, sections: Sequence[Section], chunk_tokens: int) -> List[Chunk]:
+    """
+    按行把材料切分为不超过 chunk_tokens 个词元的分块
+
+    章节开头开始一个新分块；但当前分块不足 chunk_tokens 的四分之一时（如只有标题的空章节）
+    继续并入后面的章节，避免产生只有一行标题的碎块。
+
+    Args:
+        data: 材料的全部字节（或内存映射）
+        sections: 材料的章节
+        chunk_tokens: 每个分块的目标词元数，单行超过时该行单独成块
+
+    Returns:
+        按顺序排列、首尾相接覆盖整个文件的分块，section 为分块开头所在章节的标题
+    """
+    section_starts = {s.start: s.title for s in sections}
+    min_tokens = chunk_tokens // 4
+    chunks: List[Chunk] = []
+    current_section = ""
+    chunk_section = ""
+    start = 0
+    tokens = 0
+    for _, line_start, raw in iter_lines(data):
+        line_tokens = estimate_tokens(raw.decode('utf-8', errors='replace'))
+        new_section = line_start in section_starts
+        if line_start > start and ((new_section and tokens >= min_tokens) or tokens + line_tokens > chunk_tokens):
+            chunks.append(Chunk(start=start, end=line_start, tokens=tokens, section=chunk_section))
+            start, tokens = line_start, 0
+        if new_section:
+            current_section = section_starts[line_start]
+        if line_start == start:
+            chunk_section = current_section
+        tokens += line_tokens
+    if len(data) > start:
+        chunks.append(Chunk(start=start, end=len(data), tokens=tokens, section=chunk_section))
+    return chunks
+
+
+class MaterialsIndex:
+    """docs/ 材料目录的增量索引"""
+
+    def __init__(self, root: str = DEFAULT_DOCS_DIR, manifest_path: Optional[str] = None,
+                 chunk_tokens: int = 400, extensions: Sequence[str] = DEFAULT_EXTENSIONS):
+        """
+        Args:
+            root: 材料目录
+            manifest_path: 清单文件路径，默认读取环境变量 MATERIALS_INDEX_PATH；
+                           docs/ 以外的材料目录在文件名后加上目录路径的哈希，各用各的清单
+            chunk_tokens: 每个分块的目标词元数
+            extensions: 纳入索引的文件扩展名
+        """
+        self.root = os.path.abspath(root)
+        if manifest_path is None:
+            manifest_path = os.getenv("MATERIALS_INDEX_PATH", DEFAULT_MANIFEST_PATH)
+            if self.root != os.path.abspath(DEFAULT_DOCS_DIR):
+                # 其他材料目录的清单不能与 docs/ 的清单互相覆盖
+                base, ext = os.path.splitext(manifest_path)
+                manifest_path = f"{base}-{hashlib.sha1(self.root.encode('utf-8')).hexdigest()[:12]}{ext}"
+        self.manifest_path = manifest_path
+        self.chunk_tokens = chunk_tokens
+        self.extensions = tuple(extensions)
+        self._entries: Dict[str, MaterialEntry] = {}
+        self._load()
+
+    def _settings(self) -> Dict:
+        return {"version": INDEX_VERSION, "root": self.root, "chunk_tokens": self.chunk_tokens}
+
+    def _load(self) -> None:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        # 推导规则不同的清单不可复用
+        if manifest.get("settings") != self._settings():
+            return
+        self._entries = {
+            path: MaterialEntry.from_dict(entry) for path, entry in manifest.get("entries", {}).items()
+        }
+
+    def save(self) -> None:
+        """把清单原子地写入磁盘"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        manifest = {
+            "settings": self._settings(),
+            "entries": {path: asdict(entry) for path, entry in sorted(self._entries.items())},
+        }
+        atomic_write_text(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=1), fsync="none")
+
+    def _scan_files(self) -> Dict[str, os.stat_result]:
+        files = {}
+        excludes = load_excludes(self.root)
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith(".") or not filename.endswith(self.extensions):
+                    continue
+                full_path = os.path.join(directory, filename)
+                path = os.path.relpath(full_path, self.root)
+                if not is_excluded(path, excludes):
+                    files[path] = os.stat(full_path)
+        return files
+
+    def _build_entry(self, path: str, stat: os.stat_result, previous: Optional[MaterialEntry]) -> MaterialEntry:
+        with open_material(os.path.join(self.root, path)) as data:
+            digest = hashlib.sha256(data).hexdigest()
+            if previous is not None and previous.sha256 == digest:
+                # 只有修改时间变了，内容相同，复用推导结果
+                previous.mtime_ns, previous.size = stat.st_mtime_ns, stat.st_size
+                return previous
+            sections = scan_sections(data)
+            return MaterialEntry(
+                path=path, sha256=digest, mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+                tokens=estimate_tokens(bytes(data).decode('utf-8', errors='replace')),
+                sections=sections,
+                chunks=chunk_material(data, sections, self.chunk_tokens),
+            )
+
+    def refresh(self, save: bool = True) -> Dict[str, int]:
+        """
+        增量刷新索引
+
+        Args:
+            save: 有变化时是否写回清单文件
+
+        Returns:
+            各类文件数：added / changed / touched（仅元数据变化） / unchanged / removed
+        """
+        stats = {"added": 0, "changed": 0, "touched": 0, "unchanged": 0, "removed": 0}
+        files = self._scan_files()
+
+        for path in list(self._entries):
+            if path not in files:
+                del self._entries[path]
+                stats["removed"] += 1
+
+        for path, stat in sorted(files.items()):
+            previous = self._entries.get(path)
+            if previous is not None and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+                stats["unchanged"] += 1
+                continue
+            previous_hash = previous.sha256 if previous is not None else None
+            entry = self._build_entry(path, stat, previous)
+            self._entries[path] = entry
+            if previous is None:
+                stats["added"] += 1
+            elif entry.sha256 == previous_hash:
+                stats["touched"] += 1
+            else:
+                stats["changed"] += 1
+
+        if save and (stats["unchanged"] != len(files) or stats["removed"]):
+            self.save()
+        return stats
+
+    def entries(self) -> List[MaterialEntry]:
+        """按路径排序的全部条目"""
+        return [self._entries[path] for path in sorted(self._entries)]
+
+    def get(self, path: str) -> Optional[MaterialEntry]:
+        """按相对路径获取条目"""
+        return self._entries.get(os.path.normpath(path))
+
+    def read_chunk(self, path: str, chunk: Chunk) -> str:
+        """读取一个分块的文本"""
+        text, _, _ = read_range(os.path.join(self.root, path), chunk.start, max(chunk.end - chunk.start, 1))
+        return text
+
+
+def main():
+    index = MaterialsIndex()
+    stats = index.refresh()
+    print(f"材料目录: {index.root}")
+    print("刷新结果: " + "，".join(f"{key} {value}" for key, value in stats.items()))
+    for entry in index.entries():
+        print(f"- {entry.path}: {entry.size} 字节，约 {entry.tokens} 词元，"
+              f"{len(entry.sections)} 个章节，{len(entry.chunks)} 个分块")
+
+
+if __name__ == "__main__":
+    main()
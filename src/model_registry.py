@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+模型客户端注册表 - 在进程内共享、复用模型客户端
+
+同一进程中的多个教学团队、教学会话通过注册表获取模型客户端，
+相同 (backend, model, options) 的请求共用同一个底层客户端及其HTTP连接池，
+并按模型限制并发请求数：名额由 PriorityScheduler 按优先级分配，实时教学（interactive）
+优先于课程批量生成（batch）。进程退出前调用 aclose() 统一关闭所有客户端。
+"""
+
+import json
+import os
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.ollama import OllamaChatCompletionClient
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from context_budget import ContextBudgeter
+from request_scheduler import INTERACTIVE, PRIORITIES, PriorityScheduler
+
+
+# 预置的模型配置，teaching_team.py 与 teaching_assistant.py 共用
+MODEL_PROFILES: Dict[str, Dict[str, Any]] = {
+    "gemma3:27b": {
+        "backend": "ollama",
+        "model": "gemma3:27b",
+        "model_info": {
+            'vision': False,
+            'function_calling': True,
+            'json_output': False,
+            'structured_output': False,
+            'family': "gemma",
+        },
+        "num_ctx_default": "60000",
+    },
+    "qwen3:30b": {
+        "backend": "ollama",
+        "model": "qwen3:30b",
+        "model_info": {
+            'vision': False,
+            'function_calling': True,
+            'json_output': False,
+            'structured_output': False,
+            'family': "qwen",
+        },
+        "num_ctx_default": "60000",
+    },
+    "glm-4.5": {
+        "backend": "openai",
+        "model": "glm-4.5",
+        "model_info": {
+            'vision': False,
+            'function_calling': True,
+            'json_output': True,
+            'structured_output': False,
+            'family': "glm",
+        },
+        "num_ctx_default": "10000",
+        "options": {
+            'thinking': {"type": "disabled"},
+        },
+    },
+}
+
+# 交互菜单选项与模型配置的对应关系
+MODEL_CHOICES: Dict[str, str] = {
+    "1": "gemma3:27b",
+    "2": "qwen3:30b",
+    "3": "glm-4.5",
+}
+
+DEFAULT_PROFILE = "gemma3:27b"
+
+
+class DelegatingChatCompletionClient(ChatCompletionClient):
+    """转发所有调用到内部客户端的包装基类，连接共享、缓存等包装器都基于它实现"""
+
+    def __init__(self, client: ChatCompletionClient):
+        self._client = client
+
+    @property
+    def inner_client(self) -> ChatCompletionClient:
+        """被包装的底层客户端"""
+        return self._client
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Union[Tool, ToolSchema]] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Any] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await self._client.create(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Union[Tool, ToolSchema]] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Any] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._client.create_stream(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Union[Tool, ToolSchema]] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Union[Tool, ToolSchema]] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+class SharedModelClient(DelegatingChatCompletionClient):
+    """注册表分发的共享客户端 - 按优先级排队使用同一模型的并发名额，close() 不会关闭底层连接"""
+
+    def __init__(self, client: ChatCompletionClient, scheduler: PriorityScheduler, key: Tuple[str, ...],
+                 budgeter: Optional[ContextBudgeter] = None, base_options: Optional[Dict[str, Any]] = None,
+                 priority: str = INTERACTIVE, output_reserve: Optional[int] = None,
+                 rotation_unit: Optional[int] = None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的请求优先级: {priority}（可选 {', '.join(PRIORITIES)}）")
+        super().__init__(client)
+        self._scheduler = scheduler
+        self._key = key
+        self._budgeter = budgeter
+        self._base_options = base_options
+        self._priority = priority
+        self._output_reserve = output_reserve
+        # 每个共享客户端（一个教学会话或一个生成任务）是一个轮转单位，按代理派生的客户端沿用它
+        self._rotation_unit = rotation_unit if rotation_unit is not None else id(self)
+
+    @property
+    def priority(self) -> str:
+        """请求优先级，interactive 或 batch"""
+        return self._priority
+
+    @property
+    def key(self) -> Tuple[str, ...]:
+        """注册表中的键 (backend, model, options, client_kwargs)"""
+        return self._key
+
+    @property
+    def output_reserve(self) -> Optional[int]:
+        """选择 num_ctx 时为输出预留的词元数，None 表示使用 NUM_CTX_RESERVE"""
+        return self._output_reserve
+
+    def with_output_reserve(self, tokens: Optional[int]) -> "SharedModelClient":
+        """派生一个输出预留不同的客户端，与本客户端共用连接、并发名额和轮转单位"""
+        return SharedModelClient(self._client, self._scheduler, self._key, budgeter=self._budgeter,
+                                 base_options=self._base_options, priority=self._priority,
+                                 output_reserve=tokens, rotation_unit=self._rotation_unit)
+
+    def _budget(self, messages: Sequence[LLMMessage], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """按提示词长度为本次请求选择 num_ctx"""
+        if self._budgeter is None:
+            return kwargs
+        kwargs = dict(kwargs)
+        kwargs["extra_create_args"] = self._budgeter.apply(
+            messages, kwargs.get("tools", []), kwargs.get("extra_create_args", {}), self._base_options,
+            reserve_tokens=self._output_reserve,
+        )
+        return kwargs
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        kwargs = self._budget(messages, kwargs)
+        async with self._scheduler.slot(self._priority, self._rotation_unit):
+            return await self._client.create(messages, **kwargs)
+
+    def create_stream(
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        kwargs = self._budget(messages, kwargs)
+
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            async with self._scheduler.slot(self._priority, self._rotation_unit):
+                async for chunk in self._client.create_stream(messages, **kwargs):
+                    yield chunk
+
+        return _generator()
+
+    async def close(self) -> None:
+        # 共享客户端由注册表统一关闭，这里不做任何事
+        return None
+
+
+def _freeze(value: Optional[Mapping[str, Any]]) -> str:
+    """把配置字典转换为可哈希的稳定字符串"""
+    return json.dumps(value or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ModelClientRegistry:
+    """模型客户端注册表，按 (backend, model, options) 复用客户端"""
+
+    def __init__(self, default_max_concurrency: Optional[int] = None,
+                 max_concurrency: Optional[Dict[str, int]] = None,
+                 adaptive_num_ctx: Optional[bool] = None,
+                 interactive_reserve: Optional[int] = None):
+        """
+        Args:
+            default_max_concurrency: 每个模型默认允许的并发请求数，默认读取 MODEL_MAX_CONCURRENCY 环境变量
+            max_concurrency: 按模型名称单独设置的并发上限
+            adaptive_num_ctx: 是否为 Ollama 请求自适应选择 num_ctx，默认读取 ADAPTIVE_NUM_CTX 环境变量
+            interactive_reserve: 每个模型只给实时教学使用的名额数，默认读取 MODEL_INTERACTIVE_RESERVE 环境变量；
+                                 未设置时只在第一次给出 interactive 客户端后预留 1 个，只做课程生成的进程不预留
+        """
+        if default_max_concurrency is None:
+            default_max_concurrency = int(os.getenv("MODEL_MAX_CONCURRENCY", "2"))
+        if interactive_reserve is None and os.getenv("MODEL_INTERACTIVE_RESERVE"):
+            interactive_reserve = int(os.getenv("MODEL_INTERACTIVE_RESERVE"))
+        if adaptive_num_ctx is None:
+            adaptive_num_ctx = os.getenv("ADAPTIVE_NUM_CTX", "1") != "0"
+        self._default_max_concurrency = default_max_concurrency
+        self._max_concurrency = dict(max_concurrency or {})
+        self._adaptive_num_ctx = adaptive_num_ctx
+        self._interactive_reserve = interactive_reserve
+        self._clients: Dict[Tuple[str, ...], ChatCompletionClient] = {}
+        self._schedulers: Dict[Tuple[str, str], PriorityScheduler] = {}
+        self._budgeters: Dict[Tuple[str, str], ContextBudgeter] = {}
+
+    def _build_client(self, backend: str, model: str, model_info: Optional[Dict[str, Any]],
+                      options: Optional[Dict[str, Any]], client_kwargs: Dict[str, Any]) -> ChatCompletionClient:
+        """根据后端类型创建底层客户端"""
+        if backend == "ollama":
+            return OllamaChatCompletionClient(
+                model=model,
+                model_info=model_info,
+                options=options,
+                **client_kwargs,
+            )
+        if backend == "openai":
+            return OpenAIChatCompletionClient(
+                model=model,
+                model_info=model_info,
+                options=options,
+                **client_kwargs,
+            )
+        raise ValueError(f"不支持的模型后端: {backend}")
+
+    def _scheduler_for(self, backend: str, model: str, priority: str = INTERACTIVE) -> PriorityScheduler:
+        """同一模型的所有客户端共用一个请求调度器"""
+        scheduler_key = (backend, model)
+        if scheduler_key not in self._schedulers:
+            limit = self._max_concurrency.get(model, self._default_max_concurrency)
+            self._schedulers[scheduler_key] = PriorityScheduler(limit, self._interactive_reserve)
+        scheduler = self._schedulers[scheduler_key]
+        if priority == INTERACTIVE and self._interactive_reserve is None:
+            # 本进程有实时教学的客户端，从此给它预留一个名额
+            scheduler.reserve_for_interactive(1)
+        return scheduler
+
+    def _budgeter_for(self, backend: str, model: str, options: Optional[Dict[str, Any]]) -> Optional[ContextBudgeter]:
+        """同一 Ollama 模型的所有客户端共用一个上下文预算，options 中的 num_ctx 作为上限"""
+        if backend != "ollama" or not self._adaptive_num_ctx:
+            return None
+        budgeter_key = (backend, model)
+        if budgeter_key not in self._budgeters:
+            max_num_ctx = (options or {}).get("num_ctx")
+            self._budgeters[budgeter_key] = ContextBudgeter(max_num_ctx=int(max_num_ctx) if max_num_ctx else None)
+        return self._budgeters[budgeter_key]
+
+    def get_client(self, backend: str, model: str, *, model_info: Optional[Dict[str, Any]] = None,
+                   options: Optional[Dict[str, Any]] = None, priority: str = INTERACTIVE,
+                   **client_kwargs: Any) -> SharedModelClient:
+        """
+        获取共享的模型客户端
+
+        Args:
+            backend: 模型后端，"ollama" 或 "openai"
+            model: 模型名称
+            model_info: 模型能力描述
+            options: 模型参数（如 num_ctx）
+            priority: 请求优先级，实时教学用 "interactive"（默认），课程生成用 "batch"
+            **client_kwargs: 传给底层客户端的其他参数（如 host、api_key、base_url）
+
+        Returns:
+            共享客户端，多次以相同参数调用返回共用同一底层连接的客户端
+        """
+        key = (backend, model, _freeze(options), _freeze(client_kwargs))
+        client = self._clients.get(key)
+        if client is None:
+            client = self._build_client(backend, model, model_info, options, client_kwargs)
+            self._clients[key] = client
+        return SharedModelClient(
+            client,
+            self._scheduler_for(backend, model, priority),
+            key,
+            budgeter=self._budgeter_for(backend, model, options),
+            base_options=options,
+            priority=priority,
+        )
+
+    def get_profile_client(self, profile_name: str, priority: str = INTERACTIVE,
+                           **client_kwargs: Any) -> SharedModelClient:
+        """
+        按预置配置获取共享客户端
+
+        Args:
+            profile_name: MODEL_PROFILES 中的配置名称
+            priority: 请求优先级，实时教学用 "interactive"（默认），课程生成用 "batch"
+            **client_kwargs: 覆盖或补充的客户端参数
+
+        Returns:
+            共享客户端
+        """
+        profile = MODEL_PROFILES[profile_name]
+        options = {
+            'num_ctx': int(os.getenv("NUM_CTX", profile["num_ctx_default"])),
+            'stream': True,  # 开启流式输出
+        }
+        options.update(profile.get("options", {}))
+        if profile["backend"] == "openai":
+            client_kwargs.setdefault("api_key", os.getenv("GLM_API_KEY"))
+            client_kwargs.setdefault("base_url", os.getenv("GLM_BASE_URL"))
+        return self.get_client(
+            profile["backend"],
+            profile["model"],
+            model_info=dict(profile["model_info"]),
+            options=options,
+            priority=priority,
+            **client_kwargs,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """返回注册表中客户端数量、各模型的并发上限、请求排队情况及 num_ctx 档位统计"""
+        return {
+            "clients": len(self._clients),
+            "concurrency_limits": {
+                f"{backend}/{model}": scheduler.max_concurrency
+                for (backend, model), scheduler in self._schedulers.items()
+            },
+            "scheduler": {
+                f"{backend}/{model}": scheduler.stats()
+                for (backend, model), scheduler in self._schedulers.items()
+            },
+            "context_budget": {
+                f"{backend}/{model}": budgeter.metrics()
+                for (backend, model), budgeter in self._budgeters.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        """关闭所有底层客户端"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                print(f"关闭模型客户端时出错: {e}")
+
+
+def with_output_reserve(client: ChatCompletionClient, tokens: Optional[int]) -> ChatCompletionClient:
+    """
+    为需要长输出的代理（如输出整篇脚本的课程生成器）设置选择 num_ctx 时的输出预留
+
+    只有注册表分发的共享客户端会自适应选择 num_ctx，其他客户端原样返回。
+    """
+    if isinstance(client, SharedModelClient):
+        return client.with_output_reserve(tokens)
+    return client
+
+
+def resolve_model_choice(choice: str) -> str:
+    """
+    把交互菜单的选项转换为模型配置名称
+
+    选择 GLM4.5 但未配置 GLM_API_KEY / GLM_BASE_URL 时回退到默认模型。
+
+    Args:
+        choice: 用户输入的选项
+
+    Returns:
+        MODEL_PROFILES 中的配置名称
+    """
+    profile_name = MODEL_CHOICES.get(choice.strip(), DEFAULT_PROFILE)
+
+    if MODEL_PROFILES[profile_name]["backend"] == "openai":
+        api_key = os.getenv("GLM_API_KEY", "your_api_key_here")
+        base_url = os.getenv("GLM_BASE_URL", "your_api_base_url_here")
+        if api_key == "your_api_key_here" or base_url == "your_api_base_url_here":
+            print("警告: 请在 .env 文件中设置 GLM_API_KEY 和 GLM_BASE_URL 环境变量以使用GLM4.5模型")
+            print("例如:")
+            print("  GLM_API_KEY=your_actual_api_key")
+            print("  GLM_BASE_URL=your_actual_base_url")
+            print("当前将使用默认的gemma3:27b模型")
+            return DEFAULT_PROFILE
+
+    print(f"已选择 {profile_name} 模型")
+    return profile_name
+
+
+_default_registry: Optional[ModelClientRegistry] = None
+
+
+def get_default_registry() -> ModelClientRegistry:
+    """获取进程级别的默认注册表"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelClientRegistry()
+    return _default_registry
+
+
+async def close_default_registry() -> None:
+    """输出 num_ctx 档位和请求排队统计并关闭默认注册表中的所有客户端"""
+    global _default_registry
+    if _default_registry is not None:
+        stats = _default_registry.stats()
+        for name, metrics in stats["context_budget"].items():
+            if metrics["requests"]:
+                print(f"{name} num_ctx 档位统计: {metrics}")
+        for name, scheduler in stats["scheduler"].items():
+            for priority in PRIORITIES:
+                if scheduler[priority]["granted"]:
+                    print(f"{name} {priority} 请求排队统计: {scheduler[priority]}")
+        await _default_registry.aclose()
+        _default_registry = None
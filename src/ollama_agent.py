@@ -4,15 +4,19 @@ Ollama Agent 示例 - 使用本地 gemma3:27b 模型
 """
 
 import asyncio
-from autogen_ext.models.ollama import OllamaChatCompletionClient
+import os
 from autogen_core.models import UserMessage
+from model_registry import ModelClientRegistry
 
 
 async def main():
     # 初始化 Ollama 客户端，使用 gemma3:27b 模型
     # 与 notebook/test.ipynb 中的配置保持一致
-    ollama_client = OllamaChatCompletionClient(
-        model="gemma3:27b",
+    # num_ctx 作为上限，实际请求按提示词长度自适应选择档位
+    registry = ModelClientRegistry()
+    ollama_client = registry.get_client(
+        "ollama",
+        "gemma3:27b",
         model_info={
             'vision': False,
             'function_calling': True,
@@ -20,7 +24,7 @@ async def main():
             'structured_output': False,  # 添加缺失的structured_output字段
         },
         options={
-            'num_ctx': 60000,
+            'num_ctx': int(os.getenv("NUM_CTX", "60000")),
         }
     )
     
@@ -32,13 +36,14 @@ async def main():
         
         print("模型响应:")
         print(response.content)
+        print(f"num_ctx 档位统计: {registry.stats()['context_budget']}")
         
     except Exception as e:
         print(f"发生错误: {e}")
     
     finally:
         # 关闭客户端连接
-        await ollama_client.close()
+        await registry.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+按优先级调度模型请求 - 课程批量生成与实时教学共用一台模型主机
+
+ModelClientRegistry 原来用信号量限制同一模型的并发请求，先到先得：几份课程同时生成时，
+学生等待下一条提示的请求要排在数千词元的生成后面。PriorityScheduler 取代这个信号量：
+1. 请求分为 interactive（教学）和 batch（课程生成）两类，有空闲名额时先分配给 interactive
+2. 模型请求无法中途让出名额，因此 batch 最多占用 (上限 - 预留) 个名额，
+   预留的名额只给 interactive，学生不必等待正在进行的长生成结束
+3. 同一类别中按客户端（一个教学会话或一个生成任务）轮流分配，单个任务的大量请求不会饿死其他任务
+4. 记录各类别的排队数、运行数和等待时间；调用方可用 observe_waits 取得自己请求的等待时间
+
+调度器在发出请求的进程中运行，只能协调同一进程内的请求。预留名额只在进程中确实有 interactive
+客户端时才有意义（ModelClientRegistry 第一次给出 interactive 客户端时才预留）；只做课程生成的进程
+使用全部名额。多个进程共用一台模型主机时的跨进程优先级不在本模块的范围内。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, List, Optional
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# 每个类别保留最近多少次等待时间用于统计
+_WAIT_SAMPLES = 1000
+
+# 当前上下文中请求的等待时间记录，由 observe_waits 设置
+_wait_observer: ContextVar[Optional[List[float]]] = ContextVar("scheduler_wait_observer", default=None)
+
+
+def observe_waits() -> List[float]:
+    """
+    开始记录当前上下文（当前任务）之后发出的请求在调度器中的等待时间
+
+    每次模型调用前调用一次即可，新的记录列表取代上一次的列表。
+
+    Returns:
+        记录列表，请求获得名额时追加等待秒数
+    """
+    waits: List[float] = []
+    _wait_observer.set(waits)
+    return waits
+
+
+class _PriorityClass:
+    """一个优先级类别：按客户端分组的等待队列和统计"""
+
+    def __init__(self):
+        # 客户端 -> 等待中的 future，OrderedDict 的顺序即轮转顺序
+        self.queues: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self.active = 0
+        self.granted = 0
+        self.waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def push(self, tenant: Hashable, waiter: asyncio.Future) -> None:
+        self.queues.setdefault(tenant, deque()).append(waiter)
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """取出轮到的客户端最早的请求，该客户端移到轮转队尾"""
+        while self.queues:
+            tenant, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.queues.move_to_end(tenant)
+            else:
+                del self.queues[tenant]
+            if not waiter.done():
+                return waiter
+        return None
+
+    def remove(self, tenant: Hashable, waiter: asyncio.Future) -> None:
+        queue = self.queues.get(tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self.queues[tenant]
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+        return {
+            "queued": self.depth,
+            "active": self.active,
+            "granted": self.granted,
+            "wait_mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+            "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+            "wait_max": round(waits[-1], 4) if waits else 0.0,
+        }
+
+
+class PriorityScheduler:
+    """同一模型后端的并发名额，按优先级和客户端轮转分配"""
+
+    def __init__(self, max_concurrency: int, interactive_reserve: Optional[int] = None):
+        """
+        Args:
+            max_concurrency: 同时进行的请求上限
+            interactive_reserve: 只给 interactive 使用的名额数，默认不预留
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.interactive_reserve = 0
+        self.reserve_for_interactive(interactive_reserve or 0)
+        self._classes: Dict[str, _PriorityClass] = {name: _PriorityClass() for name in PRIORITIES}
+
+    def reserve_for_interactive(self, count: int) -> None:
+        """把预留给 interactive 的名额增加到 count 个（不会减少），正在运行的 batch 请求不受影响"""
+        # 至少给 batch 留一个名额
+        self.interactive_reserve = max(self.interactive_reserve, min(max(0, count), self.max_concurrency - 1))
+
+    def _limit(self, priority: str) -> int:
+        if priority == INTERACTIVE:
+            return self.max_concurrency
+        return self.max_concurrency - self.interactive_reserve
+
+    @property
+    def active(self) -> int:
+        return sum(c.active for c in self._classes.values())
+
+    def _class(self, priority: str) -> _PriorityClass:
+        if priority not in self._classes:
+            raise ValueError(f"未知的请求优先级: {priority}（可选 {', '.join(PRIORITIES)}）")
+        return self._classes[priority]
+
+    def _can_run(self, priority: str) -> bool:
+        return self.active < self.max_concurrency and self._classes[priority].active < self._limit(priority)
+
+    def _grant(self, priority: str, wait: float) -> None:
+        cls = self._classes[priority]
+        cls.active += 1
+        cls.granted += 1
+        cls.waits.append(wait)
+        observer = _wait_observer.get()
+        if observer is not None:
+            observer.append(wait)
+
+    def _dispatch(self) -> None:
+        """把空闲名额按优先级分配给等待中的请求"""
+        for priority in PRIORITIES:
+            cls = self._classes[priority]
+            while cls.queues and self._can_run(priority):
+                waiter = cls.pop()
+                if waiter is None:
+                    break
+                # 名额在唤醒前记到请求名下，避免被随后到达的请求抢走
+                cls.active += 1
+                waiter.set_result(None)
+
+    async def acquire(self, priority: str = INTERACTIVE, tenant: Hashable = None) -> None:
+        """
+        等待一个名额
+
+        Args:
+            priority: 请求优先级，interactive 或 batch
+            tenant: 发出请求的客户端，同一类别中按客户端轮流分配
+        """
+        cls = self._class(priority)
+        started = time.perf_counter()
+        # 同类别没有人排队时直接运行，否则排到队尾以保持轮转公平
+        if not cls.queues and self._can_run(priority):
+            self._grant(priority, 0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        cls.push(tenant, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已经分到名额但在唤醒前被取消，把名额还回去
+                cls.active -= 1
+                self._dispatch()
+            else:
+                cls.remove(tenant, waiter)
+            raise
+        # 名额已在 _dispatch 中计入 active
+        cls.active -= 1
+        self._grant(priority, time.perf_counter() - started)
+
+    def release(self, priority: str = INTERACTIVE) -> None:
+        """归还名额"""
+        self._class(priority).active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = INTERACTIVE, tenant: Hashable = None) -> AsyncIterator[None]:
+        """在名额内执行一次请求"""
+        await self.acquire(priority, tenant)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self) -> Dict[str, Any]:
+        """并发上限、预留名额以及各类别的排队数、运行数和等待时间（秒）"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "interactive_reserve": self.interactive_reserve,
+            **{priority: cls.stats() for priority, cls in self._classes.items()},
+        }
+
+    def queue_depth(self) -> Dict[str, int]:
+        """各类别的排队请求数"""
+        return {priority: cls.depth for priority, cls in self._classes.items()}
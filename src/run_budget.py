@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+运行预算 - 按词元数、模型调用次数和运行时间结束课程生成
+
+课程生成团队原来只在教研组负责人回复 APPROVE 或达到 max_turns=5000 时停止，评审迟迟不通过时
+会持续占用 GPU 数小时。RunBudget 统计一次运行中经过它的所有模型调用（包括 MagenticOne 编排器
+自己的调用），任一上限达到即视为超出预算：
+- 输入词元、输出词元、总词元
+- 模型调用次数
+- 运行时间（秒）
+
+BudgetTermination 是可以与 TextMentionTermination 等条件用 | 组合的终止条件，每位代理发言后检查预算。
+超出预算时它把迄今最好的一版脚本交给回调保存；课程生成流水线（CoursePipeline）则直接保存当前一版脚本。
+预算在代理发言之间检查，不会中断正在进行的模型调用。
+
+环境变量（均为空时不限制）：
+    BUDGET_TOTAL_TOKENS / BUDGET_PROMPT_TOKENS / BUDGET_COMPLETION_TOKENS / BUDGET_MODEL_CALLS / BUDGET_WALL_SECONDS
+"""
+
+import os
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional, Sequence, Union
+
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage, TextMessage
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, RequestUsage
+
+from course_pipeline import DraftTracker
+from model_registry import DelegatingChatCompletionClient
+
+# 环境变量与 RunBudget 参数的对应关系
+BUDGET_ENV = {
+    "BUDGET_TOTAL_TOKENS": "max_total_tokens",
+    "BUDGET_PROMPT_TOKENS": "max_prompt_tokens",
+    "BUDGET_COMPLETION_TOKENS": "max_completion_tokens",
+    "BUDGET_MODEL_CALLS": "max_model_calls",
+    "BUDGET_WALL_SECONDS": "max_seconds",
+}
+
+
+class RunBudget:
+    """一次运行的模型调用用量与上限"""
+
+    def __init__(self, max_total_tokens: Optional[int] = None, max_prompt_tokens: Optional[int] = None,
+                 max_completion_tokens: Optional[int] = None, max_model_calls: Optional[int] = None,
+                 max_seconds: Optional[float] = None):
+        """
+        Args:
+            max_total_tokens: 输入与输出词元合计上限
+            max_prompt_tokens: 输入词元上限
+            max_completion_tokens: 输出词元上限
+            max_model_calls: 模型调用次数上限
+            max_seconds: 从创建（或 reset）起的运行时间上限
+
+        所有上限为空时只统计用量，不会超出预算。
+        """
+        self.max_total_tokens = max_total_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.max_model_calls = max_model_calls
+        self.max_seconds = max_seconds
+        self.reset()
+
+    @classmethod
+    def from_env(cls) -> Optional["RunBudget"]:
+        """按 BUDGET_* 环境变量创建预算，都未设置时返回 None"""
+        limits: Dict[str, Any] = {}
+        for name, param in BUDGET_ENV.items():
+            value = os.getenv(name, "").strip()
+            if value:
+                limits[param] = float(value) if param == "max_seconds" else int(value)
+        return cls(**limits) if limits else None
+
+    def reset(self) -> None:
+        """清零用量并重新开始计时"""
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.model_calls = 0
+        self._started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def add(self, usage: RequestUsage) -> None:
+        """记录一次模型调用的用量"""
+        self.model_calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+
+    def exceeded(self) -> Optional[str]:
+        """超出预算时返回原因，否则返回 None"""
+        checks = [
+            ("总词元", self.prompt_tokens + self.completion_tokens, self.max_total_tokens),
+            ("输入词元", self.prompt_tokens, self.max_prompt_tokens),
+            ("输出词元", self.completion_tokens, self.max_completion_tokens),
+            ("模型调用", self.model_calls, self.max_model_calls),
+        ]
+        for label, used, limit in checks:
+            if limit is not None and used >= limit:
+                return f"{label} {used}/{limit}"
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return f"运行时间 {self.elapsed:.0f}/{self.max_seconds:.0f} 秒"
+        return None
+
+    def usage(self) -> Dict[str, int]:
+        """模型调用次数和词元用量"""
+        return {
+            "calls": self.model_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    def wrap(self, client: ChatCompletionClient) -> "BudgetedChatCompletionClient":
+        """包装模型客户端，经过它的调用计入预算"""
+        return BudgetedChatCompletionClient(client, self)
+
+
+class BudgetedChatCompletionClient(DelegatingChatCompletionClient):
+    """把每次模型调用的用量计入 RunBudget"""
+
+    def __init__(self, client: ChatCompletionClient, budget: RunBudget):
+        super().__init__(client)
+        self.budget = budget
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        result = await self._client.create(messages, **kwargs)
+        self.budget.add(result.usage)
+        return result
+
+    def create_stream(
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            async for chunk in self._client.create_stream(messages, **kwargs):
+                if isinstance(chunk, CreateResult):
+                    self.budget.add(chunk.usage)
+                yield chunk
+
+        return _generator()
+
+
+class BudgetTermination(TerminationCondition):
+    """超出 RunBudget 时终止团队，并保存迄今最好的一版脚本"""
+
+    def __init__(self, budget: RunBudget, draft_source: Optional[str] = None,
+                 on_budget_stop: Optional[Callable[[str], Awaitable[Any]]] = None):
+        """
+        Args:
+            budget: 运行预算，其用量由包装过的模型客户端累计
+            draft_source: 产出脚本的代理名称，如 course_generator
+            on_budget_stop: 超出预算时以最好的一版脚本调用，如保存到文件
+        """
+        self._budget = budget
+        self._draft_source = draft_source
+        self._on_budget_stop = on_budget_stop
+        self._terminated = False
+        self._drafts = DraftTracker()
+        self.best_draft: Optional[str] = None
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[Union[BaseAgentEvent, BaseChatMessage]]) -> Optional[StopMessage]:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        if self._draft_source is not None:
+            for message in messages:
+                if isinstance(message, TextMessage) and message.source == self._draft_source:
+                    # 最好的一版是最近一版完整脚本
+                    self.best_draft = self._drafts.draft(message.content) or self.best_draft
+
+        reason = self._budget.exceeded()
+        if reason is None:
+            return None
+        self._terminated = True
+        content = f"超出预算（{reason}）"
+        if self.best_draft and self._on_budget_stop is not None:
+            await self._on_budget_stop(self.best_draft)
+            content += "，已保存迄今最好的一版脚本"
+        return StopMessage(content=content, source="BudgetTermination")
+
+    async def reset(self) -> None:
+        # 预算跨越同一团队的多次运行，需要重新计算时调用 budget.reset()
+        self._terminated = False
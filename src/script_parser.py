@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+学习脚本解析 - 把 Markdown 学习脚本解析为带类型的课程树
+
+逐行扫描一遍脚本，得到：
+- 开头的 YAML 元数据（frontmatter）
+- 模块（二级标题）及其中的任务（"### 任务1.1：……"；模块内没有任务标题时整个模块就是一个任务）
+- 每个任务的预计用时（标题中的"（15分钟）"或正文中的"预计用时：5分钟"）、检查清单和小测验
+
+代码块中的 "#" 不会被当作标题。解析结果按脚本内容的哈希缓存在内存和磁盘上，
+同一份脚本在再次启动时不需要重新解析。
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from atomic_write import atomic_write_text
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(_PROJECT_ROOT, ".cache", "scripts")
+# 解析规则或数据结构变化时递增，旧的缓存不再使用
+PARSER_VERSION = 1
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_FENCE = re.compile(r'^\s*(```|~~~)')
+_TASK_TITLE = re.compile(r'^[^\w]*任务\s*([0-9一二三四五六七八九十]+(?:\.[0-9]+)*)\s*[：:．.、]?\s*(.*)$')
+_HEADING_MINUTES = re.compile(r'[（(]\s*(?:约|预计)?\s*(\d+)\s*分钟\s*[)）]')
+_BODY_MINUTES = re.compile(r'(?:预计用时|建议用时|用时|时长)\s*[*：:]*\s*[（(]?\s*(\d+)\s*分钟')
+_CHECKLIST_HEADING = re.compile(r'检查清单|检查点|自查|Checklist', re.I)
+_QUIZ_HEADING = re.compile(r'测验|小测|选择题|Quiz', re.I)
+_CHECKBOX = re.compile(r'^\s*[-*+]\s*\[([ xX\u2713\u2714])\]\s*(.+)$')
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d+[.、．)])\s*(.+)$')
+_TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-{2,}')
+_QUESTION = re.compile(r'^\s*(?:\*\*)?\s*(?:Q|问题|第)?\s*(\d+)\s*(?:题)?\s*[.、．:：)）]\s*(.+?)\s*(?:\*\*)?\s*$')
+_OPTION = re.compile(r'^\s*(?:[-*+]\s*)?[（(]?([A-Fa-f])\s*[.、．:：)）]\s*(.+)$')
+_ANSWER = re.compile(r'(?:正确答案|参考答案|答案|Answer)\s*[*：:]*\s*[（(]?\s*([A-Fa-f])\b')
+# 表格中表示"已勾选"的单元格
+_CHECK_MARKS = {"\u2705", "\u2714", "\u2714\ufe0f", "\u2611", "\u2611\ufe0f", "\u2713", "x", "X", "\u274c", ""}
+
+
+@dataclass(slots=True)
+class QuizQuestion:
+    """一道选择题"""
+
+    question: str
+    options: List[str] = field(default_factory=list)
+    answer: Optional[str] = None  # 选项字母，脚本没有给出时为 None
+
+
+@dataclass(slots=True)
+class Task:
+    """一个教学任务"""
+
+    id: int  # 在整份脚本中从 1 开始的序号
+    module: str  # 所在模块（二级标题）
+    title: str
+    number: Optional[str] = None  # 标题中的任务编号，如 "1.1"、"一"
+    minutes: Optional[int] = None  # 预计用时
+    content: str = ""
+    checklist: List[str] = field(default_factory=list)
+    quiz: List[QuizQuestion] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """与旧版 parse_learning_script 相同的字典格式（附带预计用时）"""
+        return {"id": self.id, "section": self.module, "title": self.title,
+                "content": self.content, "minutes": self.minutes}
+
+
+@dataclass(slots=True)
+class Module:
+    """一个模块（二级标题下的内容）"""
+
+    title: str
+    intro: str = ""  # 第一个任务之前的说明
+    tasks: List[Task] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class LessonScript:
+    """解析后的学习脚本"""
+
+    title: str = ""
+    frontmatter: Dict[str, Any] = field(default_factory=dict)
+    intro: str = ""  # 第一个模块之前的内容
+    modules: List[Module] = field(default_factory=list)
+
+    @property
+    def tasks(self) -> List[Task]:
+        """按顺序排列的全部任务"""
+        return [task for module in self.modules for task in module.tasks]
+
+    @property
+    def quiz(self) -> List[QuizQuestion]:
+        """全部选择题"""
+        return [question for task in self.tasks for question in task.quiz]
+
+    @property
+    def duration_minutes(self) -> Optional[int]:
+        """课程总时长：优先使用元数据中的 duration_minutes，否则累加各任务的预计用时"""
+        duration = self.frontmatter.get("duration_minutes")
+        if isinstance(duration, int):
+            return duration
+        minutes = [task.minutes for task in self.tasks if task.minutes is not None]
+        return sum(minutes) if minutes else None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LessonScript":
+        modules = []
+        for module in data.get("modules", []):
+            tasks = [
+                Task(**{**task, "quiz": [QuizQuestion(**q) for q in task.get("quiz", [])]})
+                for task in module.get("tasks", [])
+            ]
+            modules.append(Module(title=module["title"], intro=module.get("intro", ""), tasks=tasks))
+        return cls(title=data.get("title", ""), frontmatter=data.get("frontmatter", {}),
+                   intro=data.get("intro", ""), modules=modules)
+
+
+def _parse_scalar(value: str) -> Any:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    lowered = value.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    return value
+
+
+def _json_value(value: Any) -> Any:
+    """把 YAML 解析出的日期等值转为字符串，元数据与磁盘缓存中的 JSON 保持一致"""
+    if isinstance(value, dict):
+        return {str(key): _json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def parse_frontmatter(text: str) -> Dict[str, Any]:
+    """
+    解析 YAML 元数据
+
+    安装了 PyYAML 时使用它解析；否则按 "键: 值" 逐行解析，值支持字符串、数字、布尔和 JSON 形式的列表。
+    日期等 JSON 无法表示的值转为字符串（如 2025-01-01）。
+    """
+    try:
+        import yaml
+    except ImportError:
+        yaml = None
+    if yaml is not None:
+        try:
+            data = yaml.safe_load(text)
+            if isinstance(data, dict):
+                return _json_value(data)
+        except yaml.YAMLError:
+            pass
+
+    data: Dict[str, Any] = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip() and not key.startswith((" ", "\t", "#")):
+            data[key.strip()] = _parse_scalar(value)
+    return data
+
+
+class _TaskBuilder:
+    """解析过程中的任务状态"""
+
+    __slots__ = ("task", "lines", "section_kind", "question", "pending_row")
+
+    def __init__(self, task: Task):
+        self.task = task
+        self.lines: List[str] = []
+        self.section_kind = ""  # "checklist"、"quiz" 或空
+        self.question: Optional[QuizQuestion] = None
+        # 检查清单表格的上一行：下一行是分隔行时它是表头，否则是检查项
+        self.pending_row: Optional[str] = None
+
+    def add_line(self, line: str, in_fence: bool) -> None:
+        self.lines.append(line)
+        if in_fence:
+            return
+        task = self.task
+        if task.minutes is None:
+            match = _BODY_MINUTES.search(line)
+            if match:
+                task.minutes = int(match.group(1))
+
+        checkbox = _CHECKBOX.match(line)
+        if checkbox:
+            task.checklist.append(checkbox.group(2).strip())
+        elif self.section_kind == "checklist":
+            self._add_checklist_line(line.strip())
+        elif self.section_kind == "quiz":
+            self._add_quiz_line(line)
+
+    def _flush_row(self) -> None:
+        if self.pending_row is not None:
+            cells = [cell.strip() for cell in self.pending_row.strip("|").split("|")]
+            items = [cell for cell in cells if cell not in _CHECK_MARKS]
+            if items:
+                self.task.checklist.append(items[0])
+            self.pending_row = None
+
+    def _add_checklist_line(self, line: str) -> None:
+        if line.startswith("|"):
+            if _TABLE_SEPARATOR.match(line.strip("|")):
+                self.pending_row = None
+            else:
+                self._flush_row()
+                self.pending_row = line
+            return
+        self._flush_row()
+        item = _LIST_ITEM.match(line)
+        if item:
+            self.task.checklist.append(item.group(1).strip())
+
+    def _add_quiz_line(self, line: str) -> None:
+        answer = _ANSWER.search(line)
+        if answer and self.question is not None:
+            self.question.answer = answer.group(1).upper()
+            return
+        option = _OPTION.match(line)
+        if option and self.question is not None:
+            self.question.options.append(option.group(2).strip())
+            return
+        question = _QUESTION.match(line)
+        if question:
+            self.question = QuizQuestion(question=question.group(2).strip())
+            self.task.quiz.append(self.question)
+
+    def start_subsection(self, title: str) -> None:
+        self._flush_row()
+        if _CHECKLIST_HEADING.search(title):
+            self.section_kind = "checklist"
+        elif _QUIZ_HEADING.search(title):
+            self.section_kind = "quiz"
+        else:
+            self.section_kind = ""
+        self.question = None
+
+    def finish(self) -> Task:
+        self._flush_row()
+        self.task.content = "\n".join(self.lines).strip()
+        return self.task
+
+
+def _minutes_in(title: str) -> Optional[int]:
+    match = _HEADING_MINUTES.search(title)
+    return int(match.group(1)) if match else None
+
+
+def parse_script(text: str) -> LessonScript:
+    """
+    一遍扫描解析学习脚本
+
+    Args:
+        text: 学习脚本的 Markdown 文本
+
+    Returns:
+        课程树；模块内没有 "### 任务……" 标题时，整个模块作为一个任务
+    """
+    script = LessonScript()
+    lines = text.splitlines()
+    position = 0
+    # 开头的 YAML 元数据
+    if lines and lines[0].strip() == "---":
+        for end in range(1, len(lines)):
+            if lines[end].strip() in ("---", "..."):
+                script.frontmatter = parse_frontmatter("\n".join(lines[1:end]))
+                position = end + 1
+                break
+
+    intro: List[str] = []
+    module: Optional[Module] = None
+    module_intro: List[str] = []
+    builder: Optional[_TaskBuilder] = None
+    # 模块标题本身作为任务（模块内还没有出现任务标题）
+    implicit = False
+    next_id = 1
+    in_fence = False
+
+    def close_task() -> None:
+        nonlocal builder, next_id
+        if builder is not None:
+            module.tasks.append(builder.finish())
+            builder = None
+            next_id += 1
+
+    def close_module() -> None:
+        nonlocal module
+        if module is not None:
+            close_task()
+            module.intro = "\n".join(module_intro).strip()
+            script.modules.append(module)
+            module = None
+
+    for line in lines[position:]:
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            heading = None
+        else:
+            heading = None if in_fence else _HEADING.match(line)
+
+        if heading is not None:
+            level, title = len(heading.group(1)), heading.group(2).strip()
+            if level == 1 and module is None:
+                if not script.title:
+                    script.title = title
+                    continue
+            elif level == 2:
+                close_module()
+                module = Module(title=title)
+                module_intro = []
+                task_match = _TASK_TITLE.match(title)
+                builder = _TaskBuilder(Task(
+                    id=next_id, module=title, title=title,
+                    number=task_match.group(1) if task_match else None, minutes=_minutes_in(title),
+                ))
+                # 模块标题本身可能就是 "小测验"、"检查清单"
+                builder.start_subsection(title)
+                implicit = True
+                continue
+            elif level >= 3 and module is not None:
+                task_match = _TASK_TITLE.match(title)
+                if task_match is not None:
+                    if implicit:
+                        # 第一个任务之前的内容是模块说明
+                        module_intro = builder.lines
+                        builder = None
+                        implicit = False
+                    else:
+                        close_task()
+                    builder = _TaskBuilder(Task(
+                        id=next_id, module=module.title, title=task_match.group(2).strip() or title,
+                        number=task_match.group(1), minutes=_minutes_in(title),
+                    ))
+                    continue
+                if builder is not None:
+                    builder.start_subsection(title)
+
+        if builder is not None:
+            builder.add_line(line, in_fence)
+        else:
+            intro.append(line)
+
+    close_module()
+    script.intro = "\n".join(intro).strip()
+    return script
+
+
+_memory_cache: Dict[str, LessonScript] = {}
+
+
+def parse_script_cached(text: str, cache_dir: Optional[str] = None) -> LessonScript:
+    """
+    解析学习脚本，结果按内容哈希缓存
+
+    先查进程内缓存，再查磁盘缓存（默认 .cache/scripts，可用环境变量 SCRIPT_CACHE_DIR 指定），
+    都没有时才解析并写入缓存。
+
+    Args:
+        text: 学习脚本的 Markdown 文本
+        cache_dir: 磁盘缓存目录
+
+    Returns:
+        课程树（缓存命中时与其他调用方共享同一对象，请勿修改）
+    """
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    key = f"v{PARSER_VERSION}-{digest}"
+    script = _memory_cache.get(key)
+    if script is not None:
+        return script
+
+    cache_dir = cache_dir or os.getenv("SCRIPT_CACHE_DIR", DEFAULT_CACHE_DIR)
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            script = LessonScript.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        script = parse_script(text)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            atomic_write_text(cache_path, json.dumps(asdict(script), ensure_ascii=False), fsync="none")
+        except (OSError, TypeError, ValueError):
+            pass  # 缓存写不进去不影响解析结果
+
+    _memory_cache[key] = script
+    return script
+
+
+def load_script(path: str, cache_dir: Optional[str] = None) -> LessonScript:
+    """读取并解析学习脚本文件（带缓存）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_script_cached(f.read(), cache_dir)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+学习脚本补丁 - 修改时只输出需要改动的章节，而不是重写整篇脚本
+
+每轮修改都让课程生成器重新输出数千词元的完整脚本，而在 CPU 上运行的 Ollama 中，
+输出词元是最慢的资源。补丁模式下课程生成器只输出按章节（Markdown 标题）组织的修改：
+
+    <<<REPLACE 任务1.1：认识提示词（5分钟）
+    ### 任务1.1：认识提示词（5分钟）
+    ……替换后的完整章节……
+    >>>
+    <<<INSERT_AFTER 任务1.1：认识提示词（5分钟）
+    ### 任务1.2：……
+    >>>
+    <<<DELETE 任务2.3：……
+    >>>
+
+一个章节从它的标题开始，到下一个同级或更高级的标题为止，包括其中的小节；代码块中的 "#" 不算标题。
+补丁在本地应用到上一版脚本，并检查结果是否完整（代码块闭合、任务没有丢失、长度没有骤减），
+任何一步失败都抛出 PatchError，由调用方改为要求重写整篇脚本。
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from script_parser import parse_script
+
+PATCH_ACTIONS = ("REPLACE", "INSERT_AFTER", "INSERT_BEFORE", "DELETE")
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_FENCE = re.compile(r'^\s*(```|~~~)')
+_PATCH_OPEN = re.compile(r'^\s*<<<\s*(' + '|'.join(PATCH_ACTIONS) + r')\s+(.+?)\s*$')
+_PATCH_CLOSE = re.compile(r'^\s*>>>\s*$')
+# 比上一版或迄今最长一版短一半以上的文本不算完整脚本：应用补丁后出现时，多半是模型把补丁写成了摘要；
+# 团队对话中出现时，多半是向文件处理器提出的请求（见 course_pipeline.DraftTracker）
+MIN_DRAFT_RATIO = 0.5
+
+
+class PatchError(ValueError):
+    """补丁无法解析、无法应用或应用后的脚本不完整"""
+
+
+@dataclass
+class PatchOperation:
+    """一处按章节的修改"""
+
+    action: str  # PATCH_ACTIONS 之一
+    target: str  # 目标章节的标题（不含 "#"）
+    content: str = ""  # 替换或插入的章节，以标题开头
+
+
+@dataclass
+class Section:
+    """脚本中的一个章节（行号范围，end 不含）"""
+
+    title: str
+    level: int
+    start: int
+    end: int
+
+
+def _normalize_title(title: str) -> str:
+    return " ".join(title.strip().lstrip("#").split())
+
+
+def split_sections(lines: List[str]) -> List[Section]:
+    """找出所有标题章节，每个章节包括其下的小节"""
+    headings: List[Tuple[int, int, str]] = []
+    in_fence = False
+    for number, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else _HEADING.match(line)
+        if match is not None:
+            headings.append((number, len(match.group(1)), match.group(2).strip()))
+
+    sections = []
+    for index, (start, level, title) in enumerate(headings):
+        end = len(lines)
+        for later_start, later_level, _ in headings[index + 1:]:
+            if later_level <= level:
+                end = later_start
+                break
+        sections.append(Section(title=title, level=level, start=start, end=end))
+    return sections
+
+
+def outline(script: str) -> str:
+    """脚本的目录（所有标题行），放进补丁提示中供模型准确引用章节标题"""
+    lines = script.splitlines()
+    return "\n".join(lines[section.start].strip() for section in split_sections(lines))
+
+
+def parse_patch(reply: str) -> List[PatchOperation]:
+    """
+    从课程生成器的回复中提取补丁
+
+    Returns:
+        按出现顺序排列的修改；回复中没有补丁块时返回空列表
+    """
+    operations: List[PatchOperation] = []
+    current: Optional[PatchOperation] = None
+    body: List[str] = []
+    for line in reply.splitlines():
+        if current is None:
+            match = _PATCH_OPEN.match(line)
+            if match is not None:
+                current = PatchOperation(action=match.group(1), target=_normalize_title(match.group(2)))
+                body = []
+        elif _PATCH_CLOSE.match(line):
+            current.content = "\n".join(body).strip("\n")
+            operations.append(current)
+            current = None
+        else:
+            body.append(line)
+    if current is not None:
+        raise PatchError(f"补丁块没有结束标记 >>>: {current.action} {current.target}")
+    return operations
+
+
+def _find_section(lines: List[str], target: str) -> Section:
+    matches = [section for section in split_sections(lines) if _normalize_title(section.title) == target]
+    if not matches:
+        raise PatchError(f"未找到章节: {target}")
+    if len(matches) > 1:
+        raise PatchError(f"章节标题不唯一: {target}")
+    return matches[0]
+
+
+def _content_lines(operation: PatchOperation, level: Optional[int] = None) -> List[str]:
+    """替换或插入的内容必须以标题开头；替换时标题级别须与原章节相同，否则会改变脚本结构"""
+    lines = operation.content.splitlines()
+    match = _HEADING.match(lines[0]) if lines else None
+    if match is None:
+        raise PatchError(f"{operation.action} {operation.target} 的内容没有以章节标题开头")
+    if level is not None and len(match.group(1)) != level:
+        raise PatchError(f"{operation.action} {operation.target} 的标题级别与原章节不同")
+    return lines + [""]
+
+
+def apply_patch(script: str, operations: List[PatchOperation]) -> str:
+    """按顺序把补丁应用到脚本上，返回新脚本"""
+    lines = script.splitlines()
+    for operation in operations:
+        section = _find_section(lines, operation.target)
+        if operation.action == "DELETE":
+            lines[section.start:section.end] = []
+        elif operation.action == "REPLACE":
+            lines[section.start:section.end] = _content_lines(operation, section.level)
+        elif operation.action == "INSERT_AFTER":
+            lines[section.end:section.end] = _content_lines(operation)
+        else:
+            lines[section.start:section.start] = _content_lines(operation)
+    return "\n".join(lines).strip() + "\n"
+
+
+def validate_script(previous: str, script: str) -> None:
+    """检查应用补丁后的脚本仍然完整"""
+    lines = script.splitlines()
+    if sum(1 for line in lines if _FENCE.match(line)) % 2:
+        raise PatchError("代码块没有闭合")
+    if len(script.strip()) < len(previous.strip()) * MIN_DRAFT_RATIO:
+        raise PatchError("应用补丁后脚本长度不到上一版的一半")
+    if parse_script(previous).tasks and not parse_script(script).tasks:
+        raise PatchError("应用补丁后脚本中没有任务")
+
+
+def patch_instructions(script: str) -> str:
+    """要求课程生成器以补丁形式修改的提示"""
+    return f"""请只输出需要修改的章节，不要重复没有修改的内容。每处修改使用下面的补丁格式，章节标题必须与目录中的标题完全一致：
+
+<<<REPLACE 章节标题
+替换后的完整章节（以同级标题开头，包括其中的小节）
+>>>
+<<<INSERT_AFTER 章节标题
+新增的章节（以标题开头），插入在该章节之后
+>>>
+<<<INSERT_BEFORE 章节标题
+新增的章节（以标题开头），插入在该章节之前
+>>>
+<<<DELETE 章节标题
+>>>
+
+当前脚本的目录：
+{outline(script)}"""
+
+
+def revise(script: str, reply: str) -> Tuple[str, List[PatchOperation]]:
+    """
+    根据课程生成器的回复得到新一版脚本
+
+    Args:
+        script: 上一版脚本
+        reply: 课程生成器的回复（已去掉开头的文件保存请求）
+
+    Returns:
+        (新一版脚本, 应用的修改)；回复本身是完整脚本（模型没有使用补丁格式）时修改列表为空
+
+    Raises:
+        PatchError: 补丁无法应用或结果不完整，此时应要求重写整篇脚本
+    """
+    operations = parse_patch(reply)
+    if not operations:
+        # 模型直接重写了整篇脚本
+        if any(section.level <= 3 for section in split_sections(reply.splitlines())):
+            validate_script(script, reply)
+            return reply, []
+        raise PatchError("回复中既没有补丁，也不是完整的脚本")
+    revised = apply_patch(script, operations)
+    validate_script(script, revised)
+    return revised.strip(), operations
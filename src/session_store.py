@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+教学会话的检查点与恢复
+
+教学会话中断（崩溃、重启、共享后端断开）后，从头再来意味着把整个对话重新交给模型。
+SessionCheckpointer 在每次等待学生输入前，把团队和各代理的状态（含对话记忆）以及课程进度
+原子地写入本地的会话目录（默认 .cache/sessions，可用环境变量 SESSION_DIR 指定）。
+此时教学助手刚回复完，团队处于可以一致保存的状态。
+恢复时只需加载状态，不调用模型，接着等待学生输入。
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import re
+import secrets
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from autogen_core import CancellationToken
+
+from atomic_write import save_text
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SESSION_DIR = os.path.join(_PROJECT_ROOT, ".cache", "sessions")
+CHECKPOINT_VERSION = 1
+
+_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def new_session_id() -> str:
+    """生成会话 ID，如 20260101-093000-a1b2c3"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def _json_default(value: Any) -> Any:
+    # 消息中的 created_at 等时间字段
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+class SessionStore:
+    """按会话 ID 保存检查点的本地目录"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root: 会话目录，默认读取环境变量 SESSION_DIR
+        """
+        self.root = root or os.getenv("SESSION_DIR", DEFAULT_SESSION_DIR)
+
+    def path(self, session_id: str) -> str:
+        """会话检查点文件路径"""
+        if not _SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"无效的会话 ID: {session_id}")
+        return os.path.join(self.root, f"{session_id}.json")
+
+    async def save(self, session_id: str, checkpoint: Dict[str, Any]) -> int:
+        """原子地保存检查点，返回写入的字节数"""
+        path = self.path(session_id)
+        os.makedirs(self.root, exist_ok=True)
+        return await save_text(path, json.dumps(checkpoint, ensure_ascii=False, default=_json_default), fsync="file")
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """读取检查点，会话不存在时抛出 FileNotFoundError"""
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"会话 {session_id} 不存在（{path}）")
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"会话 {session_id} 的检查点版本不受支持: {checkpoint.get('version')}")
+        return checkpoint
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """按最近更新时间排列的会话摘要"""
+        sessions = []
+        if not os.path.isdir(self.root):
+            return sessions
+        for filename in os.listdir(self.root):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, filename), 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+            except (OSError, ValueError):
+                continue
+            sessions.append({
+                "session_id": checkpoint.get("session_id", filename[:-5]),
+                "updated_at": checkpoint.get("updated_at", 0),
+                "lesson": checkpoint.get("lesson", {}),
+            })
+        sessions.sort(key=lambda s: s["updated_at"], reverse=True)
+        return sessions
+
+
+class SessionCheckpointer:
+    """在等待学生输入前保存团队状态和课程进度"""
+
+    def __init__(self, store: SessionStore, session_id: str, lesson: Any = None,
+                 metadata: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            store: 会话存储
+            session_id: 会话 ID
+            lesson: 课程进度（需提供 async save_state / load_state），可以为空
+            metadata: 随检查点保存的其他信息，如模型名称和学习脚本路径
+        """
+        self.store = store
+        self.session_id = session_id
+        self.lesson = lesson
+        self.metadata = dict(metadata or {})
+        # 团队创建后再设置
+        self.team: Any = None
+        self.saves = 0
+
+    async def checkpoint(self) -> None:
+        """保存一次检查点"""
+        if self.team is None:
+            return
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "session_id": self.session_id,
+            "updated_at": time.time(),
+            "metadata": self.metadata,
+            "lesson": await self.lesson.save_state() if self.lesson is not None else None,
+            "team": await self.team.save_state(),
+        }
+        await self.store.save(self.session_id, checkpoint)
+        self.saves += 1
+
+    async def restore(self, checkpoint: Dict[str, Any]) -> None:
+        """从检查点恢复团队状态和课程进度，不调用模型"""
+        await self.team.load_state(checkpoint["team"])
+        if self.lesson is not None and checkpoint.get("lesson") is not None:
+            await self.lesson.load_state(checkpoint["lesson"])
+
+    def wrap_input(self, input_func: Callable[..., Any]):
+        """包装 UserProxyAgent 的 input_func：先保存检查点，再等待学生输入（同步函数在线程中执行）"""
+        is_async = inspect.iscoroutinefunction(input_func)
+
+        async def checkpointed_input(prompt: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+            await self.checkpoint()
+            if is_async:
+                return await input_func(prompt, cancellation_token)
+            return await asyncio.to_thread(input_func, prompt)
+        return checkpointed_input
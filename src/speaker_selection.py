@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+基于规则的发言者选择 - 作为 SelectorGroupChat 的 selector_func 使用
+
+SelectorGroupChat 默认每轮都调用一次模型来决定下一位发言者。
+对于教学助手与学生的两人对话，下一位总是另一方；消息中明确点名时也无需询问模型。
+RuleBasedSpeakerSelector 按以下规则直接给出发言者，只有多人且无法判断时才返回 None，
+由 SelectorGroupChat 回退到模型选择：
+1. 最后一条消息用 "@名字" 或以 "名字：" 开头点名某一位参与者时，由被点名者发言
+2. 只有两位参与者时，由上一位发言者之外的参与者发言
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Union
+
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+
+
+class RuleBasedSpeakerSelector:
+    """不调用模型的发言者选择器"""
+
+    def __init__(self, participant_names: Sequence[str], aliases: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            participant_names: 团队中所有参与者的名称
+            aliases: 参与者的别名（如 "教学助手"），点名时与名称同等对待
+        """
+        self._names = list(participant_names)
+        self._aliases: Dict[str, str] = {name: name for name in self._names}
+        for name, name_aliases in (aliases or {}).items():
+            for alias in name_aliases:
+                self._aliases[alias] = name
+        # 较长的名称优先匹配，避免 "user" 抢先匹配 "user_proxy"
+        names_pattern = "|".join(re.escape(a) for a in sorted(self._aliases, key=len, reverse=True))
+        self._prefix_pattern = re.compile(rf'^\s*({names_pattern})\s*[：:，,]')
+        self._at_pattern = re.compile(rf'@\s*({names_pattern})')
+        self.rule_selections = 0
+        self.model_fallbacks = 0
+
+    def _addressed(self, text: str) -> Optional[str]:
+        """返回消息中明确点名的参与者"""
+        mentions = {self._aliases[m] for m in self._at_pattern.findall(text)}
+        if mentions:
+            # 同时点名多位参与者时无法判断
+            return mentions.pop() if len(mentions) == 1 else None
+        match = self._prefix_pattern.match(text)
+        return self._aliases[match.group(1)] if match else None
+
+    def select(self, messages: Sequence[Union[BaseAgentEvent, BaseChatMessage]]) -> Optional[str]:
+        """
+        选择下一位发言者
+
+        Args:
+            messages: 当前对话线程
+
+        Returns:
+            发言者名称；无法按规则判断时返回 None，由模型选择
+        """
+        last = next((m for m in reversed(messages) if isinstance(m, BaseChatMessage)), None)
+        last_speaker = last.source if last is not None else None
+
+        if last is not None:
+            addressed = self._addressed(last.to_text())
+            if addressed is not None and addressed != last_speaker:
+                self.rule_selections += 1
+                return addressed
+
+        if len(self._names) == 2:
+            others = [name for name in self._names if name != last_speaker]
+            self.rule_selections += 1
+            # 任务消息的来源不是参与者时，由第二位参与者（AI 代理）先发言
+            return others[0] if len(others) == 1 else self._names[-1]
+
+        self.model_fallbacks += 1
+        return None
+
+    __call__ = select
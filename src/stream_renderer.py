@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+合并输出的流式渲染器 - 代替 autogen 的 Console 显示团队的事件流
+
+Console 对每个流式片段都在线程池中调用一次 print 并 flush。后端很快、几位代理轮流发言时，
+每秒有数千次线程切换和写系统调用，终端明显卡顿。StreamRenderer 的显示内容与 Console 相同
+（每条消息前有 "---------- 类型 (发言者) ----------" 标题），但片段先放进缓冲区：
+1. 最早的未写片段等待满 flush_interval 秒，或缓冲区超过 flush_bytes 个字符时，才合并写入一次
+2. 同一时间最多一次写入在线程池中进行，写入期间到达的片段留给下一次
+3. 完整消息和等待学生输入时立即写出缓冲区，提示不会夹在上一条回复中间
+4. headless 模式不显示流式片段，只输出完整消息，适合服务端日志
+
+显示方式（环境变量 STREAM_RENDER）：
+- coalesce: 合并输出（默认）
+- headless: 只输出完整消息
+- console: autogen 原来的 Console
+
+用法：
+    await render_stream(team.run_stream(task=task))
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional, TextIO, TypeVar, Union
+
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import (
+    BaseAgentEvent,
+    BaseChatMessage,
+    ModelClientStreamingChunkEvent,
+    UserInputRequestedEvent,
+)
+from autogen_agentchat.ui import Console, UserInputManager
+from autogen_core.models import RequestUsage
+
+RENDER_MODES = ("coalesce", "headless", "console")
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_FLUSH_BYTES = 4096
+# 保留最近多少个片段的显示延迟用于统计
+_LATENCY_SAMPLES = 10000
+
+T = TypeVar("T", bound=Union[TaskResult, Response])
+
+
+class StreamRenderer:
+    """合并流式片段后写入终端的渲染器"""
+
+    def __init__(self, output: Optional[TextIO] = None, flush_interval: Optional[float] = None,
+                 flush_bytes: Optional[int] = None, headless: bool = False, output_stats: bool = False,
+                 user_input_manager: Optional[UserInputManager] = None):
+        """
+        Args:
+            output: 输出流，默认为 sys.stdout
+            flush_interval: 片段最多等待多少秒后写出，默认读取 STREAM_FLUSH_MS
+            flush_bytes: 缓冲区超过多少字符时立即写出，默认读取 STREAM_FLUSH_BYTES
+            headless: 不显示流式片段，只输出完整消息
+            output_stats: 与 Console 相同，输出每条消息和整个任务的词元用量
+            user_input_manager: 与 Console 相同，收到等待输入事件时通知
+        """
+        self._output = output or sys.stdout
+        self._flush_interval = (
+            flush_interval if flush_interval is not None
+            else int(os.getenv("STREAM_FLUSH_MS", str(int(DEFAULT_FLUSH_INTERVAL * 1000)))) / 1000
+        )
+        self._flush_bytes = flush_bytes or int(os.getenv("STREAM_FLUSH_BYTES", str(DEFAULT_FLUSH_BYTES)))
+        self._headless = headless
+        self._output_stats = output_stats
+        self._user_input_manager = user_input_manager
+
+        self._pending: List[str] = []
+        self._pending_size = 0
+        # 缓冲区中每个片段的到达时间，写出后计算显示延迟
+        self._pending_times: List[float] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writer: Optional[asyncio.Task] = None
+        # 正在流式显示的发言者，切换发言者时重新输出标题
+        self._streaming_source: Optional[str] = None
+
+        self.total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self.chunks = 0
+        self.writes = 0
+        self.chars_written = 0
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    # ---- 缓冲与写出 ----
+
+    def _emit(self, text: str, chunk: bool = False) -> None:
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if chunk:
+            self._pending_times.append(time.perf_counter())
+        if self._pending_size >= self._flush_bytes:
+            self._kick()
+        elif self._timer is None and self._writer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._flush_interval, self._kick)
+
+    def _kick(self) -> None:
+        """立即开始写出缓冲区（已有写入在进行时由它接着写）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writer is None and self._pending:
+            self._writer = asyncio.ensure_future(self._drain())
+
+    def _write(self, text: str) -> None:
+        self._output.write(text)
+        self._output.flush()
+
+    async def _write_pending(self) -> None:
+        text = "".join(self._pending)
+        times = self._pending_times
+        self._pending, self._pending_size, self._pending_times = [], 0, []
+        await asyncio.to_thread(self._write, text)
+        done = time.perf_counter()
+        self._latencies.extend(done - t for t in times)
+        self.writes += 1
+        self.chars_written += len(text)
+
+    async def _drain(self) -> None:
+        try:
+            await self._write_pending()
+            # 写入期间又攒满一个缓冲区时接着写，否则等下一个时间窗口
+            while self._pending_size >= self._flush_bytes:
+                await self._write_pending()
+        finally:
+            self._writer = None
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._flush_interval, self._kick)
+
+    async def flush(self) -> None:
+        """写出缓冲区中的全部内容"""
+        while True:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._writer is not None:
+                await self._writer
+                continue
+            if not self._pending:
+                return
+            await self._write_pending()
+
+    def _flush_now(self) -> None:
+        """出错或被取消时同步写出剩余内容"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            text = "".join(self._pending)
+            self._pending, self._pending_size, self._pending_times = [], 0, []
+            try:
+                self._write(text)
+            except (OSError, ValueError):
+                pass
+
+    # ---- 事件显示 ----
+
+    @staticmethod
+    def _header(message: Union[BaseAgentEvent, BaseChatMessage]) -> str:
+        return f"{'-' * 10} {message.__class__.__name__} ({message.source}) {'-' * 10}\n"
+
+    def _end_streaming(self) -> None:
+        if self._streaming_source is not None:
+            self._emit("\n")
+            self._streaming_source = None
+
+    def _add_usage(self, message: Union[BaseAgentEvent, BaseChatMessage]) -> None:
+        usage = getattr(message, "models_usage", None)
+        if usage:
+            if self._output_stats:
+                self._emit(f"[Prompt tokens: {usage.prompt_tokens}, Completion tokens: {usage.completion_tokens}]\n")
+            self.total_usage.prompt_tokens += usage.prompt_tokens
+            self.total_usage.completion_tokens += usage.completion_tokens
+
+    def _show_chunk(self, message: ModelClientStreamingChunkEvent) -> None:
+        self.chunks += 1
+        if self._headless:
+            return
+        if self._streaming_source != message.source:
+            self._end_streaming()
+            self._emit(self._header(message))
+            self._streaming_source = message.source
+        self._emit(message.content, chunk=True)
+
+    def _show_message(self, message: Union[BaseAgentEvent, BaseChatMessage]) -> None:
+        if isinstance(message, BaseChatMessage) and self._streaming_source == message.source:
+            # 内容已经以片段形式显示过，只需换行
+            self._streaming_source = None
+            self._emit("\n")
+        else:
+            self._end_streaming()
+            self._emit(self._header(message) + message.to_text() + "\n")
+        self._add_usage(message)
+        self._kick()
+
+    def _summary(self, lines: List[str], started: float) -> None:
+        if self._output_stats:
+            self._emit(
+                f"{'-' * 10} Summary {'-' * 10}\n" + "".join(f"{line}\n" for line in lines)
+                + f"Total prompt tokens: {self.total_usage.prompt_tokens}\n"
+                + f"Total completion tokens: {self.total_usage.completion_tokens}\n"
+                + f"Duration: {time.time() - started:.2f} seconds\n"
+            )
+
+    async def render(self, stream: AsyncGenerator[Any, None]) -> T:
+        """
+        显示事件流，返回最后的 TaskResult 或 Response（与 Console 相同）
+
+        Args:
+            stream: team.run_stream() 或 agent.on_messages_stream() 的事件流
+        """
+        started = time.time()
+        last_processed: Optional[T] = None
+        try:
+            async for message in stream:
+                if isinstance(message, TaskResult):
+                    self._end_streaming()
+                    self._summary([f"Number of messages: {len(message.messages)}",
+                                   f"Finish reason: {message.stop_reason}"], started)
+                    last_processed = message  # type: ignore
+                elif isinstance(message, Response):
+                    self._end_streaming()
+                    chat_message = message.chat_message
+                    self._emit(f"{'-' * 10} {chat_message.source} {'-' * 10}\n{chat_message.to_text()}\n")
+                    self._add_usage(chat_message)
+                    self._summary([f"Number of inner messages: {len(message.inner_messages or [])}"], started)
+                    last_processed = message  # type: ignore
+                elif isinstance(message, UserInputRequestedEvent):
+                    # 学生看到提示前，先把之前的输出全部显示出来
+                    await self.flush()
+                    if self._user_input_manager is not None:
+                        self._user_input_manager.notify_event_received(message.request_id)
+                elif isinstance(message, ModelClientStreamingChunkEvent):
+                    self._show_chunk(message)
+                    if self._pending_size >= self._flush_bytes:
+                        # 事件流连续产出时让写入任务有机会开始
+                        await asyncio.sleep(0)
+                else:
+                    self._show_message(message)
+            await self.flush()
+        except BaseException:
+            self._flush_now()
+            raise
+
+        if last_processed is None:
+            raise ValueError("No TaskResult or Response was processed.")
+        return last_processed
+
+    def stats(self) -> Dict[str, Any]:
+        """片段数、写入次数、写出的字符数，以及片段从到达到写入终端的延迟（秒）"""
+        latencies = sorted(self._latencies)
+        return {
+            "chunks": self.chunks,
+            "writes": self.writes,
+            "chars_written": self.chars_written,
+            "latency_mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "latency_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4) if latencies else 0.0,
+            "latency_max": round(latencies[-1], 4) if latencies else 0.0,
+        }
+
+
+async def render_stream(stream: AsyncGenerator[Any, None], mode: Optional[str] = None,
+                        output_stats: bool = False, **kwargs: Any) -> Any:
+    """
+    按显示方式渲染事件流，可直接替换 Console(stream)
+
+    Args:
+        stream: team.run_stream() 或 agent.on_messages_stream() 的事件流
+        mode: coalesce / headless / console，默认读取环境变量 STREAM_RENDER
+        output_stats: 输出词元用量统计
+        **kwargs: 传给 StreamRenderer 的其他参数
+
+    Returns:
+        最后的 TaskResult 或 Response
+    """
+    mode = (mode or os.getenv("STREAM_RENDER", "coalesce")).lower()
+    if mode not in RENDER_MODES:
+        raise ValueError(f"不支持的显示方式: {mode}，可选: {', '.join(RENDER_MODES)}")
+    if mode == "console":
+        return await Console(stream, output_stats=output_stats,
+                             user_input_manager=kwargs.get("user_input_manager"))
+    renderer = StreamRenderer(headless=mode == "headless", output_stats=output_stats, **kwargs)
+    return await renderer.render(stream)
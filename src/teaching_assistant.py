@@ -3,29 +3,36 @@
 教学助手 - 使用AutoGen AI Agent实现沉浸式教学交互
 """
 
+import argparse
 import asyncio
+import hashlib
 import os
-import re
-from typing import List, Dict, Any
-from autogen_ext.models.ollama import OllamaChatCompletionClient
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from typing import Callable, List, Dict, Any, Optional
 from autogen_core.models import UserMessage, SystemMessage
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
 from autogen_agentchat.teams import SelectorGroupChat, RoundRobinGroupChat, MagenticOneGroupChat
 from autogen_agentchat.conditions import TextMentionTermination
-from autogen_agentchat.ui import Console
-from httpx import stream
-from numpy import True_
-from sympy import true
+from completion_cache import wrap_with_cache
+from conversation_memory import ModelSummarizer, RollingSummaryChatCompletionContext
+from learner_input import StdinInput
+from lesson_cursor import LessonCursor
+from model_registry import close_default_registry, get_default_registry, resolve_model_choice
+from script_parser import parse_script_cached
+from session_store import SessionCheckpointer, SessionStore, new_session_id
+from speaker_selection import RuleBasedSpeakerSelector
+from stream_renderer import render_stream
+from telemetry import TelemetryRecorder, instrument, telemetry_from_env
 
 
 class TeachingAssistantAgent(AssistantAgent):
     """教学助手Agent - 负责引导用户完成学习任务"""
     
-    def __init__(self, model_client):
+    def __init__(self, model_client, model_context=None, memory=None):
         super().__init__(
             "teaching_assistant",
             model_client=model_client,
+            model_context=model_context,  # 为空时使用完整历史
+            memory=memory,  # 如 LessonCursor：每轮放入当前任务
             system_message="""你是一个专业的中文教学助手AI，你的任务是按照预先准备的学习脚本与用户进行沉浸式教学交互。
 
 你的角色和职责：
@@ -92,76 +99,128 @@ async def load_learning_script(script_path: str) -> str:
 
 
 def parse_learning_script(script_content: str) -> List[Dict[str, Any]]:
-    """解析学习脚本，提取任务步骤"""
-    tasks = []
-    
-    # 首先按主要章节(## 标题)分割内容
-    sections = re.split(r'(^## .*?$)', script_content, flags=re.MULTILINE)
-    
-    # 然后在每个章节内按具体任务(### 任务X)分割
-    task_id = 1
-    for i in range(1, len(sections), 2):
-        if i+1 < len(sections):
-            section_title = sections[i].strip('# ').strip() if i < len(sections) else ""
-            section_content = sections[i+1].strip() if i+1 < len(sections) else ""
-            
-            # 提取章节内的各个任务
-            task_blocks = re.split(r'(?:^###\s*任务\s*\d+[：:]?.*?$)', section_content, flags=re.MULTILINE)
-            
-            if len(task_blocks) > 1:
-                # 有明确的任务划分
-                for j, task_content in enumerate(task_blocks[1:], 1):
-                    # 提取任务标题
-                    task_title_match = re.search(r'任务\s*\d+[：:]?(.*)', task_blocks[j-1] if j-1 < len(task_blocks) else "")
-                    task_title = task_title_match.group(1).strip() if task_title_match else f"任务 {j}"
-                    
-                    tasks.append({
-                        "id": task_id,
-                        "section": section_title,
-                        "title": task_title,
-                        "content": task_content.strip()
-                    })
-                    task_id += 1
-            else:
-                # 没有明确的任务划分，将整个章节作为一个任务
-                tasks.append({
-                    "id": task_id,
-                    "section": section_title,
-                    "title": section_title,
-                    "content": section_content
-                })
-                task_id += 1
-    
-    return tasks
+    """
+    解析学习脚本，提取任务步骤
+
+    解析结果按内容哈希缓存，需要模块、检查清单、小测验等完整结构时请使用 script_parser.parse_script_cached。
+
+    Returns:
+        任务列表，每项包含 id、section、title、content 和 minutes（预计用时，没有标注时为 None）
+    """
+    return [task.to_dict() for task in parse_script_cached(script_content).tasks]
+
+
+def build_teaching_task(lesson: LessonCursor) -> str:
+    """教学任务的开场说明：任务列表和教学规则，当前任务的完整内容由 LessonCursor 单独提供"""
+    return f"""作为教学助手，请按照以下学习脚本来与用户进行交互式教学：
+        
+学习脚本的任务列表（→ 为当前任务）：
+{lesson.outline()}
+
+当前任务的完整内容会在对话中单独提供，学生完成后会自动换成下一个任务。
+
+请严格按照脚本的步骤与用户交互，确保用户完成每个实践任务。
+
+教学流程应包括：
+1. 介绍课程内容和目标
+2. 逐步引导用户完成每个任务
+3. 在每个关键节点检查用户的完成情况
+4. 提供必要的解释和反馈
+5. 在所有步骤完成后进行总结评估
+
+重要规则：
+- 所有实践任务都必须在当前系统中完成，不要建议用户使用外部AI工具或平台
+- 用户将直接与你进行交互练习，完成各种任务
+- 必须等待学生明确表示已完成当前任务后才能进入下一步
+- 如果学生没有明确表示完成，应继续当前任务的指导和交互
+- 不要自动推进到下一步，必须由学生主动确认完成
+- 在每个任务结束时，明确询问学生是否已完成并准备好进入下一步
+- 所有交流必须使用中文进行
+- 只有在完成所有学习任务并进行总结评估后，才能输出"教学完成"字样
+- 在任何情况下都不要提前输出"教学完成"字样
+- 即使用户说"教学完成"，如果实际教学任务尚未完成，也不要结束教学
+- 每次交互只能专注于一个知识点或一个练习，避免给学生造成过多的上下文负担
+- 在开始新知识点前，确保学生已经充分理解和掌握了当前知识点
+- 不要一次性向学生展示太多内容或任务，应该逐步引导
 
+在整个教学过程中，需要与用户进行充分的交互，确保用户真正理解和掌握了所学内容。
+请开始与用户进行沉浸式教学交互，只有在完成所有任务并进行总结评估后才能结束。
+每次交互请只专注于一个知识点或一个练习，确保学生能够充分理解和掌握。
+"""
+
+
+async def create_teaching_team(model_client, max_turns: int = 5000, lesson: Optional[LessonCursor] = None,
+                               checkpointer: Optional[SessionCheckpointer] = None,
+                               input_func: Optional[Callable[..., Any]] = None,
+                               telemetry: Optional[TelemetryRecorder] = None):
+    """
+    创建教学团队
 
-async def create_teaching_team(model_client):
-    """创建教学团队"""
+    Args:
+        model_client: 模型客户端
+        max_turns: 最大轮次
+        lesson: 课程进度游标；提供时教学助手每轮只看到当前任务，学生表示完成后前进到下一个任务
+        checkpointer: 会话检查点；提供时每次等待学生输入前保存团队状态和课程进度
+        input_func: 获取学生输入的函数，同步签名为 (prompt)，异步签名为 (prompt, cancellation_token)；
+                    默认从终端异步读取（StdinInput），等待学生时不阻塞事件循环
+        telemetry: 遥测记录器；提供时分别记录教学助手、对话摘要和发言者选择的模型调用
+    """
+    # 按 COMPLETION_CACHE_MODE 配置为模型调用加上磁盘缓存
+    model_client = wrap_with_cache(model_client)
+    
     # 创建UserProxyAgent用于与用户交互
+    # 默认从终端异步读取用户输入，学生的回复同时用于推进课程进度
+    input_func = input_func or StdinInput().ask
+    if lesson is not None:
+        input_func = lesson.wrap_input(input_func)
+    if checkpointer is not None:
+        input_func = checkpointer.wrap_input(input_func)
     user_proxy = UserProxyAgent(
         "user",
-        input_func=input  # 使用input函数获取用户输入
+        input_func=input_func
     )
     
-    # 创建主要的教学助手AI代理
-    teaching_assistant_agent = TeachingAssistantAgent(model_client)
+    # 创建主要的教学助手AI代理，对话历史按滑动窗口 + 滚动摘要保存，每轮提示词大小有界
+    teaching_assistant_agent = TeachingAssistantAgent(
+        instrument(model_client, telemetry, "teaching_assistant"),
+        model_context=RollingSummaryChatCompletionContext(
+            summarizer=ModelSummarizer(instrument(model_client, telemetry, "summarizer"))
+        ),
+        memory=[lesson] if lesson is not None else None,
+    )
     
     # 定义终止条件 - 当教学完成时终止
     termination_condition = TextMentionTermination("教学完成")
     
     # 创建团队，只包含用户代理和主要的教学助手代理
+    # 两人对话的发言顺序由规则决定，不再每轮调用模型选择发言者
     team = SelectorGroupChat(
         [user_proxy, teaching_assistant_agent],
-        model_client=model_client,
+        # 规则无法决定发言者时才调用模型选择
+        model_client=instrument(model_client, telemetry, "selector"),
+        selector_func=RuleBasedSpeakerSelector(
+            [user_proxy.name, teaching_assistant_agent.name],
+            aliases={teaching_assistant_agent.name: ["教学助手", "助教", "老师"]},
+        ),
         #termination_condition=termination_condition,
-        max_turns=5000  # 增加最大轮次，确保有足够的时间完成所有任务
+        max_turns=max_turns  # 增加最大轮次，确保有足够的时间完成所有任务
     )
+    if checkpointer is not None:
+        checkpointer.team = team
     
     return team, user_proxy
 
 
-async def select_model():
-    """选择模型"""
+async def select_model(model_name: Optional[str] = None):
+    """
+    选择模型
+
+    Args:
+        model_name: 已知的模型名称（如恢复会话时），提供时不再询问
+
+    Returns:
+        (模型客户端, 模型名称)
+    """
     # 尝试加载 .env 文件
     try:
         from dotenv import load_dotenv
@@ -169,102 +228,45 @@ async def select_model():
     except ImportError:
         pass  # 如果没有安装 python-dotenv，则跳过
     
-    print("请选择要使用的模型:")
-    print("1. gemma3:27b (Ollama) - Google开发的高效模型（默认）")
-    print("2. qwen3:30b (Ollama) - 阿里巴巴通义千问系列模型")
-    print("3. glm4.5 (OpenAI兼容接口) - 智谱AI开发的模型")
-    
-    choice = input("请输入选项 (1/2/3): ").strip()
-    
-    if choice == "2":
-        # Qwen3:30b 配置
-        model_client = OllamaChatCompletionClient(
-            model="qwen3:30b",
-            model_info={
-                'vision': False,
-                'function_calling': True,
-                'json_output': False,  
-                'structured_output': False,
-                'family': "qwen",
-            },
-            options={
-                'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                'stream': True,  # 开启流式输出
-            }
-        )
-        print("已选择 qwen3:30b 模型")
-    elif choice == "3":
-        # GLM4.5 配置
-        api_key = os.getenv("GLM_API_KEY", "your_api_key_here")
-        base_url = os.getenv("GLM_BASE_URL", "your_api_base_url_here")
+    if model_name is None:
+        print("请选择要使用的模型:")
+        print("1. gemma3:27b (Ollama) - Google开发的高效模型（默认）")
+        print("2. qwen3:30b (Ollama) - 阿里巴巴通义千问系列模型")
+        print("3. glm4.5 (OpenAI兼容接口) - 智谱AI开发的模型")
         
-        if api_key == "your_api_key_here" or base_url == "your_api_base_url_here":
-            print("警告: 请在 .env 文件中设置 GLM_API_KEY 和 GLM_BASE_URL 环境变量以使用GLM4.5模型")
-            print("例如:")
-            print("  GLM_API_KEY=your_actual_api_key")
-            print("  GLM_BASE_URL=your_actual_base_url")
-            print("当前将使用默认的gemma3:27b模型")
-            
-            model_client = OllamaChatCompletionClient(
-                model="gemma3:27b",
-                model_info={
-                    'vision': False,
-                    'function_calling': True,
-                    'json_output': False,  
-                    'structured_output': False,
-                    'family': "gemma",
-                },
-                options={
-                    'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                    'stream': True,  # 开启流式输出
-                }
-            )
-        else:
-            model_client = OpenAIChatCompletionClient(
-                model="glm-4.5",
-                api_key=api_key,
-                base_url=base_url,
-                model_info={
-                    'vision': False,
-                    'function_calling': True,
-                    'json_output': True,  
-                    'structured_output': False,
-                    'family': "glm",
-                },
-                options={
-                    'num_ctx': int(os.getenv("NUM_CTX", "10000")),
-                    'stream': True,  # 开启流式输出
-                },
-                model_client_stream=True,  # Enable streaming tokens.
-            )
-            print("已选择 glm-4.5 模型")
-    else:
-        # 默认使用 gemma3:27b
-        model_client = OllamaChatCompletionClient(
-            model="gemma3:27b",
-            model_info={
-                'vision': False,
-                'function_calling': True,
-                'json_output': False,  # 修改为False以确保一致性
-                'structured_output': False,
-                'family': "gemma",
-            },
-            options={
-                'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                'stream': True,  # 开启流式输出
-            }
-        )
-        print("已选择 gemma3:27b 模型")
+        choice = input("请输入选项 (1/2/3): ").strip()
+        model_name = resolve_model_choice(choice)
+    
+    # 从共享注册表获取模型客户端，同一进程内的多个会话复用连接
+    registry = get_default_registry()
+    model_client = registry.get_profile_client(model_name)
     
-    return model_client
+    return model_client, model_name
 
 
-async def main():
-    # 选择模型
-    model_client = await select_model()
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="交互式教学助手")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="从检查点恢复中断的教学会话，不重新调用模型")
+    args = parser.parse_args(argv)
+    
+    store = SessionStore()
+    checkpoint = None
+    if args.resume:
+        try:
+            checkpoint = store.load(args.resume)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"错误: {e}")
+            return
+    
+    # 选择模型（恢复会话时沿用原来的模型）
+    model_client, model_name = await select_model(checkpoint["metadata"]["model"] if checkpoint else None)
+    telemetry = None
     
     # 学习脚本路径
-    script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs", "prompt_engineering_沉浸式学习脚本.md")
+    if checkpoint:
+        script_path = checkpoint["metadata"]["script_path"]
+    else:
+        script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs", "prompt_engineering_沉浸式学习脚本.md")
     
     try:
         # 加载学习脚本
@@ -272,67 +274,66 @@ async def main():
         if not script_content:
             return
         
-        # 解析学习脚本
-        tasks = parse_learning_script(script_content)
+        # 解析学习脚本（同一份脚本再次启动时直接使用缓存的解析结果）
+        script = parse_script_cached(script_content)
+        tasks = script.tasks
         
         if not tasks:
             print("错误: 未能解析学习脚本")
             return
+        print(f"学习脚本: {script.title or os.path.basename(script_path)}，{len(script.modules)} 个模块，"
+              f"{len(tasks)} 个任务，预计 {script.duration_minutes or '未知'} 分钟")
+        script_sha256 = hashlib.sha256(script_content.encode('utf-8')).hexdigest()
+        if checkpoint and checkpoint["metadata"].get("script_sha256") != script_sha256:
+            print("错误: 学习脚本在会话中断后被修改，课程进度无法对应，请开始新的会话")
+            return
+        
+        # 课程进度游标：教学助手每轮只看到当前任务的完整内容
+        lesson = LessonCursor(script)
+        
+        # 每次等待学生输入前保存检查点，中断后可以用 --resume 恢复
+        session_id = args.resume or new_session_id()
+        checkpointer = SessionCheckpointer(store, session_id, lesson=lesson, metadata={
+            "model": model_name, "script_path": os.path.abspath(script_path), "script_sha256": script_sha256,
+        })
+        
+        # 按代理记录每次模型调用的词元数和延迟，记录以会话 ID 作为 run_id
+        telemetry = telemetry_from_env(run_id=session_id)
         
         # 创建教学团队
-        team, user_proxy = await create_teaching_team(model_client)
+        team, user_proxy = await create_teaching_team(model_client, lesson=lesson, checkpointer=checkpointer,
+                                                      telemetry=telemetry)
         
-        # 构造教学任务
-        task_description = "学习脚本中的任务步骤:\n"
-        if tasks:
-            first_task = tasks[0]
-            task_description += f"1. {first_task['title']}\n{first_task['content'][:100]}...\n\n"
+        if checkpoint:
+            # 只加载保存的状态，不调用模型，接着等待学生输入
+            await checkpointer.restore(checkpoint)
+            print(f"已恢复会话 {session_id}，当前进度:\n{lesson.outline()}")
+            try:
+                await render_stream(team.run_stream())
+            finally:
+                await checkpointer.checkpoint()
+            return
         
-        task = f"""作为教学助手，请按照以下学习脚本来与用户进行交互式教学：
+        print(f"会话 ID: {session_id}（中断后可用 --resume {session_id} 恢复）")
         
-学习脚本内容：
-{task_description}（仅显示第一个任务作为示例）
-
-
-请严格按照脚本的步骤与用户交互，确保用户完成每个实践任务。
-
-教学流程应包括：
-1. 介绍课程内容和目标
-2. 逐步引导用户完成每个任务
-3. 在每个关键节点检查用户的完成情况
-4. 提供必要的解释和反馈
-5. 在所有步骤完成后进行总结评估
-
-重要规则：
-- 所有实践任务都必须在当前系统中完成，不要建议用户使用外部AI工具或平台
-- 用户将直接与你进行交互练习，完成各种任务
-- 必须等待学生明确表示已完成当前任务后才能进入下一步
-- 如果学生没有明确表示完成，应继续当前任务的指导和交互
-- 不要自动推进到下一步，必须由学生主动确认完成
-- 在每个任务结束时，明确询问学生是否已完成并准备好进入下一步
-- 所有交流必须使用中文进行
-- 只有在完成所有学习任务并进行总结评估后，才能输出"教学完成"字样
-- 在任何情况下都不要提前输出"教学完成"字样
-- 即使用户说"教学完成"，如果实际教学任务尚未完成，也不要结束教学
-- 每次交互只能专注于一个知识点或一个练习，避免给学生造成过多的上下文负担
-- 在开始新知识点前，确保学生已经充分理解和掌握了当前知识点
-- 不要一次性向学生展示太多内容或任务，应该逐步引导
-
-在整个教学过程中，需要与用户进行充分的交互，确保用户真正理解和掌握了所学内容。
-请开始与用户进行沉浸式教学交互，只有在完成所有任务并进行总结评估后才能结束。
-每次交互请只专注于一个知识点或一个练习，确保学生能够充分理解和掌握。
-"""
+        task = build_teaching_task(lesson)
         
         # 运行教学任务
         await team.reset()
-        await Console(team.run_stream(task=task))
+        try:
+            await render_stream(team.run_stream(task=task))
+        finally:
+            await checkpointer.checkpoint()
         
     except Exception as e:
         print(f"执行过程中发生错误: {e}")
     
     finally:
-        # 关闭模型客户端
-        await model_client.close()
+        if telemetry is not None:
+            telemetry.close()
+            print(telemetry.format_summary())
+        # 关闭注册表中的所有客户端连接
+        await close_default_registry()
 
 
 if __name__ == "__main__":
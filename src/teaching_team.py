@@ -7,15 +7,30 @@ import asyncio
 import json
 from json import tool
 import os
-from typing import List, Dict, Any
-from autogen_core.models import UserMessage, SystemMessage
+from typing import List, Dict, Any, AsyncGenerator, Optional, Sequence
+from autogen_core import CancellationToken
+from autogen_core.models import AssistantMessage, UserMessage, SystemMessage
 from autogen_ext.agents.file_surfer import FileSurfer
-from autogen_ext.models.ollama import OllamaChatCompletionClient
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, TextMessage
 from autogen_agentchat.conditions import TextMentionTermination
 from autogen_agentchat.teams import MagenticOneGroupChat
-from autogen_agentchat.ui import Console
+from atomic_write import save_text
+from completion_cache import wrap_with_cache
+from context_budget import long_output_reserve
+from course_pipeline import CoursePipeline
+from draft_convergence import ConvergenceDetector, ConvergenceTermination
+from file_requests import FileRequest, find_file_request
+from learner_input import StdinInput
+from material_reader import format_toc, read_range, read_section, table_of_contents
+from material_search import MaterialSearch
+from materials_index import MaterialsIndex, add_exclude
+from model_registry import close_default_registry, get_default_registry, resolve_model_choice, with_output_reserve
+from request_scheduler import BATCH
+from run_budget import BudgetTermination, RunBudget
+from stream_renderer import render_stream
+from telemetry import TelemetryRecorder, instrument, telemetry_from_env
 
 # 尝试加载 .env 文件
 try:
@@ -28,7 +43,7 @@ except ImportError:
 class FileHandlerAgent(AssistantAgent):
     """文件处理Agent - 处理文件读取和保存操作"""
     
-    def __init__(self, model_client):
+    def __init__(self, model_client, base_path: Optional[str] = None):
         super().__init__(
             "file_handler",
             model_client=model_client,
@@ -45,38 +60,150 @@ class FileHandlerAgent(AssistantAgent):
 1. 等待其他代理的明确请求
 2. 请求格式：
    - 读取文件："FileHandlerAgent，请调用read_file_content工具读取文件，文件名：[文件名]"
+   - 查看目录："FileHandlerAgent，请调用get_table_of_contents工具查看目录，文件名：[文件名]"
+   - 读取章节："FileHandlerAgent，请调用read_file_section工具读取章节，文件名：[文件名]，章节：[章节序号或标题]"
    - 保存文件："FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：[文件名]，内容：[文件内容]"
-3. 严格按照请求执行操作
+   - 检索材料："FileHandlerAgent，请调用search_materials工具检索材料，查询：[知识点或问题]"
+3. 严格按照请求执行操作，较大的文件先查看目录，再按章节或范围读取需要的部分，或按知识点检索相关段落
 4. 返回操作结果
 
 在整个教学脚本生成过程中，你只负责文件操作，不参与内容创作或评审。
 
 请始终用中文回复。""",
             model_client_stream=True,  # Enable streaming tokens.
-            tools = [self.read_file_content, self.save_content_to_file]
+            tools = [self.read_file_content, self.get_table_of_contents, self.read_file_section,
+                     self.save_content_to_file, self.search_materials]
         )
-        # 设置基础路径为项目的docs目录
-        self._base_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs")
+        # 基础路径默认为项目的docs目录
+        self._base_path = base_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs")
         # 确保docs目录存在
         os.makedirs(self._base_path, exist_ok=True)
+        # 材料检索索引在第一次检索时建立
+        self._search: Optional[MaterialSearch] = None
+    
+    async def on_messages_stream(
+        self, messages: Sequence[BaseChatMessage], cancellation_token: CancellationToken
+    ) -> AsyncGenerator[BaseAgentEvent | BaseChatMessage | Response, None]:
+        """
+        处理文件操作请求
+
+        最新的一条消息是符合约定格式或JSON命令的请求时直接执行对应的工具，不调用模型；
+        否则交给模型处理。
+        """
+        request = find_file_request([m.to_text() for m in messages])
+        if request is None:
+            async for event in super().on_messages_stream(messages, cancellation_token):
+                yield event
+            return
+        
+        result = await self.execute_file_request(request)
+        # 与经过模型时一样记录收到的消息和回复，之后交给模型处理的请求能看到完整的历史
+        await self._add_messages_to_context(self._model_context, messages)
+        await self._model_context.add_message(AssistantMessage(content=result, source=self.name))
+        yield Response(chat_message=TextMessage(content=result, source=self.name))
+    
+    async def execute_file_request(self, request: FileRequest) -> str:
+        """
+        直接执行文件操作请求
+        
+        Args:
+            request: 解析得到的文件操作请求
+            
+        Returns:
+            读取时为文件内容，保存时为保存结果，检索时为相关段落；出错时为错误说明
+        """
+        try:
+            if request.action == "read":
+                if request.section:
+                    return await self.read_file_section(request.filename, request.section)
+                return await self.read_file_content(request.filename, request.offset, request.length)
+            if request.action == "toc":
+                return await self.get_table_of_contents(request.filename)
+            if request.action == "search":
+                return await self.search_materials(request.query or "", request.top_k, request.filename)
+            return await self.save_content_to_file(request.content or "", request.filename)
+        except Exception as e:
+            return f"文件操作失败: {str(e)}"
     
-    async def read_file_content(self, filename: str) -> str:
+    async def read_file_content(self, filename: str, offset: int = 0, length: int = 0) -> str:
         """
         读取本地文件内容
         
         Args:
             filename: 要加载的文件名
+            offset: 起始字节偏移，仅在指定 length 时生效
+            length: 读取的字节数，为 0 时读取整个文件
             
         Returns:
-            文件内容
+            文件内容；按范围读取且未到文件末尾时，末尾附带下一段的偏移
         """
         file_path = os.path.join(self._base_path, filename)
 
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件 {file_path} 不存在")
         
+        if length > 0:
+            text, next_offset, total = await asyncio.to_thread(read_range, file_path, offset, length)
+            if next_offset < total:
+                text += f"\n\n[未读完，可从 offset={next_offset} 继续读取，文件共 {total} 字节]"
+            return text
+        
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
+    
+    async def get_table_of_contents(self, filename: str) -> str:
+        """
+        查看文件目录
+        
+        Args:
+            filename: 文件名
+            
+        Returns:
+            带序号和字节范围的章节列表
+        """
+        file_path = os.path.join(self._base_path, filename)
+
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件 {file_path} 不存在")
+        
+        sections = await asyncio.to_thread(table_of_contents, file_path)
+        if not sections:
+            return f"文件 {filename} 中没有识别到章节"
+        return format_toc(sections)
+    
+    async def read_file_section(self, filename: str, section: str) -> str:
+        """
+        按章节读取文件内容
+        
+        Args:
+            filename: 文件名
+            section: 章节序号（见目录）、标题或标题片段
+            
+        Returns:
+            章节内容
+        """
+        file_path = os.path.join(self._base_path, filename)
+
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件 {file_path} 不存在")
+        
+        return await asyncio.to_thread(read_section, file_path, section)
+    
+    async def search_materials(self, query: str, top_k: int = 5, filename: str = "") -> str:
+        """
+        在教学材料中检索与知识点相关的段落
+        
+        Args:
+            query: 要查找的知识点或问题，如 "零样本提示词"
+            top_k: 返回的段落数
+            filename: 只在该材料文件中检索，留空表示全部材料
+            
+        Returns:
+            相关段落，每段标明来源文件、章节和字节范围
+        """
+        if self._search is None:
+            self._search = MaterialSearch(MaterialsIndex(self._base_path))
+        return await self._search.search_materials(query, top_k, filename)
             
     async def save_content_to_file(self, content: str, filename: str) -> str:
         """
@@ -96,10 +223,11 @@ class FileHandlerAgent(AssistantAgent):
         # 构造完整文件路径
         file_path = os.path.join(self._base_path, filename)
         
-        # 保存内容到文件
+        # 在线程池中写入临时文件后原子替换，不阻塞事件循环，同一文件的并发保存依次执行
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            await save_text(file_path, content)
+            # 保存的是生成结果而不是材料，不纳入材料索引和检索
+            await asyncio.to_thread(add_exclude, self._base_path, filename)
             return f"内容已成功保存到文件: {file_path}"
         except Exception as e:
             raise Exception(f"保存文件时出错: {str(e)}")
@@ -305,7 +433,12 @@ class StudentAgent(AssistantAgent):
 class CourseGeneratorAgent(AssistantAgent):
     """课程生成Agent - 根据文件内容生成详细的教学课程"""
     
-    def __init__(self, model_client):
+    def __init__(self, model_client, tools: Optional[List[Any]] = None):
+        """
+        Args:
+            model_client: 模型客户端
+            tools: 可选的工具（如材料检索 search_materials），提供时模型可在编写过程中自行调用
+        """
         super().__init__(
             "course_generator",  # 使用英文名称以符合框架要求
             model_client=model_client,
@@ -350,12 +483,20 @@ class CourseGeneratorAgent(AssistantAgent):
 16. 学习脚本必须采用结构化格式，使用清晰的标题层级和时间标注
 17. 所有任务必须围绕一个核心主题展开，确保学习内容的连贯性
 
+不要一次读取整份材料。编写某个知识点时，只检索与它相关的材料段落：
+"FileHandlerAgent，请调用search_materials工具检索材料，查询：[知识点]"
+（如果你可以直接调用 search_materials 工具，直接调用即可。）
+
 完成课程脚本生成后，你需要请求 FileHandlerAgent 将内容保存为文件。发送消息格式如下：
 "FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：[课程名称].md"
 [完整的学习脚本内容]
 
 请始终用中文回复。""",
             model_client_stream=True,  # Enable streaming tokens.
+            tools=tools,
+            # 检索结果需要再交给模型写进脚本，而不是直接作为回复
+            reflect_on_tool_use=bool(tools),
+            max_tool_iterations=5 if tools else 1,
         )
 
 
@@ -404,33 +545,128 @@ class StudentReviewerAgent(AssistantAgent):
         )
 
 
-async def create_teaching_team(model_client):
-    """创建教学团队"""
+def _team_clients(model_client, budget: Optional[RunBudget]):
+    """
+    返回 (普通代理的客户端, 输出整篇脚本的代理的客户端)
+
+    两者都计入预算（不含缓存命中）并按 COMPLETION_CACHE_MODE 加上磁盘缓存；后者在自适应选择
+    num_ctx 时为输出预留 NUM_CTX_RESERVE_LONG 个词元，避免较小的档位截断脚本。
+    评审整篇脚本、写出长篇意见的代理（教研组负责人、学生、编排器）同样使用后者。
+    """
+    clients = []
+    for client in (model_client, with_output_reserve(model_client, long_output_reserve())):
+        if budget is not None:
+            client = budget.wrap(client)
+        clients.append(wrap_with_cache(client))
+    return clients[0], clients[1]
+
+
+async def create_teaching_team(model_client, max_turns: int = 5000, input_func=None,
+                               telemetry: Optional[TelemetryRecorder] = None,
+                               budget: Optional[RunBudget] = None,
+                               convergence: Optional[ConvergenceDetector] = None,
+                               output_filename: str = "prompt_engineering_course_script.md"):
+    """
+    创建教学团队
+
+    Args:
+        model_client: 模型客户端
+        max_turns: 最大轮次
+        input_func: 获取用户输入的函数，默认从终端异步读取（StdinInput），等待用户时不阻塞事件循环
+        telemetry: 遥测记录器；提供时按代理记录每次模型调用的词元数和延迟
+        budget: 运行预算；超出词元、模型调用次数或运行时间上限时结束，并保存迄今最好的一版脚本
+        convergence: 收敛检测器；课程生成器的新一版脚本与上一版几乎相同、评审意见重复时结束，并保存这一版脚本
+        output_filename: 超出预算或评审收敛时脚本的保存文件名
+    """
+    # 所有代理和编排器的模型调用（不含缓存命中）计入预算；课程生成器输出整篇脚本，
+    # 文件处理器保存脚本时的工具调用参数也是整篇脚本，其他代理评审整篇脚本并写出长篇意见，都使用长输出预留
+    _, long_output_client = _team_clients(model_client, budget)
+    
     # 创建各个Agent
-    file_handler_agent = FileHandlerAgent(model_client)
-    course_generator_agent = CourseGeneratorAgent(model_client)
-    curriculum_director_agent = CurriculumDirectorAgent(model_client)
-    student_agent = StudentAgent(model_client)
+    file_handler_agent = FileHandlerAgent(instrument(long_output_client, telemetry, "file_handler"))
+    course_generator_agent = CourseGeneratorAgent(instrument(long_output_client, telemetry, "course_generator"))
+    curriculum_director_agent = CurriculumDirectorAgent(
+        instrument(long_output_client, telemetry, "curriculum_director")
+    )
+    student_agent = StudentAgent(instrument(long_output_client, telemetry, "student"))
     user_proxy = UserProxyAgent(
         "user",
-        input_func=input  # 使用input函数获取用户输入
+        input_func=input_func or StdinInput().ask
     )
     
     # 定义终止条件 - 当教研组负责人批准时终止
     termination_condition = TextMentionTermination("APPROVE")
+    if budget is not None:
+        # 或者超出预算时终止，并由文件处理器保存课程生成器迄今最好的一版脚本
+        termination_condition = termination_condition | BudgetTermination(
+            budget,
+            draft_source=course_generator_agent.name,
+            on_budget_stop=lambda draft: file_handler_agent.save_content_to_file(draft, output_filename),
+        )
+    if convergence is not None:
+        # 或者评审收敛时终止，不再评审几乎没有变化的新一版脚本
+        termination_condition = termination_condition | ConvergenceTermination(
+            convergence,
+            draft_source=course_generator_agent.name,
+            reviewers=[student_agent.name, curriculum_director_agent.name],
+            on_converged=lambda draft: file_handler_agent.save_content_to_file(draft, output_filename),
+        )
     
     # 创建团队，使用MagenticOneGroupChat
     team = MagenticOneGroupChat(
         [user_proxy, file_handler_agent, course_generator_agent, 
          curriculum_director_agent, student_agent],
-        model_client=model_client,
+        model_client=instrument(long_output_client, telemetry, "orchestrator"),
         termination_condition=termination_condition,
-        max_turns=5000  # 设置最大轮次以防止无限循环
+        max_turns=max_turns  # 设置最大轮次以防止无限循环
     )
     
     return team
 
 
+async def create_course_pipeline(model_client, max_review_rounds: int = 3,
+                                 source_filename: str = "c1.txt",
+                                 output_filename: str = "prompt_engineering_course_script.md",
+                                 materials_dir: Optional[str] = None,
+                                 telemetry: Optional[TelemetryRecorder] = None,
+                                 budget: Optional[RunBudget] = None,
+                                 convergence: Optional[ConvergenceDetector] = None):
+    """
+    创建按固定流程编排的课程生成流水线（不调用模型做编排）
+
+    Args:
+        model_client: 模型客户端
+        max_review_rounds: 最多评审轮数
+        source_filename: 材料文件名（相对于材料目录）
+        output_filename: 脚本保存的文件名（相对于材料目录）或绝对路径
+        materials_dir: 材料目录，默认为项目的 docs 目录
+        telemetry: 遥测记录器；提供时按代理记录每次模型调用的词元数和延迟
+        budget: 运行预算；超出时不再生成和评审，保存当前一版脚本
+        convergence: 收敛检测器；评审收敛时不再修改，按其 action 请教研组负责人做最终决定或直接保存
+    """
+    # 课程生成器负责生成和修改整篇脚本，评审代理读完整篇脚本后写出长篇意见，都使用长输出预留；
+    # 文件处理器的读取和保存不经过模型
+    model_client, long_output_client = _team_clients(model_client, budget)
+    
+    file_handler = FileHandlerAgent(instrument(model_client, telemetry, "file_handler"), base_path=materials_dir)
+    return CoursePipeline(
+        file_handler,
+        # 课程生成器按需检索材料段落，较长的材料不必整篇放进上下文
+        CourseGeneratorAgent(instrument(long_output_client, telemetry, "course_generator"),
+                             tools=[file_handler.search_materials]),
+        CurriculumDirectorAgent(instrument(long_output_client, telemetry, "curriculum_director")),
+        StudentAgent(instrument(long_output_client, telemetry, "student")),
+        source_filename=source_filename,
+        output_filename=output_filename,
+        max_review_rounds=max_review_rounds,
+        material_token_budget=int(os.getenv("MATERIAL_CONTEXT_TOKENS", "6000")),
+        budget=budget,
+        convergence=convergence,
+        # 修改时只输出改动的章节，补丁无法应用时再重写整篇
+        revision_mode=os.getenv("COURSE_REVISION_MODE", "patch").lower(),
+    )
+
+
 async def main():
     # 用户可选择模型
     print("请选择要使用的模型:")
@@ -440,90 +676,33 @@ async def main():
     
     choice = input("请输入选项 (1/2/3): ").strip()
     
-    if choice == "2":
-        # Qwen3:30b 配置
-        model_client = OllamaChatCompletionClient(
-            model="qwen3:30b",
-            model_info={
-                'vision': False,
-                'function_calling': True,
-                'json_output': False,  # 修改为False以确保一致性
-                'structured_output': False,  # 添加缺失的structured_output字段
-                'family': "qwen",
-            },
-            options={
-              
-                'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                'stream': True,  # 开启流式输出
-            }
-        )
-        print("已选择 qwen3:30b 模型")
-    elif choice == "3":
-        # GLM4.5 配置
-        api_key = os.getenv("GLM_API_KEY", "your_api_key_here")
-        base_url = os.getenv("GLM_BASE_URL", "your_api_base_url_here")
+    # 从共享注册表获取模型客户端，同一进程内的多个团队复用连接
+    # 课程生成按 batch 优先级排队，与实时教学共用模型主机时不挤占学生的请求
+    registry = get_default_registry()
+    model_client = registry.get_profile_client(resolve_model_choice(choice), priority=BATCH)
+    # 按代理记录每次模型调用的词元数和延迟，结束时输出汇总
+    telemetry = telemetry_from_env()
+    # 按 BUDGET_* 环境变量限制词元数、模型调用次数和运行时间
+    budget = RunBudget.from_env()
+    # 按 CONVERGENCE_* 环境变量在评审收敛时提前结束
+    convergence = ConvergenceDetector.from_env()
+    
+    try:
+        # 增量刷新 docs/ 材料索引，未变化的材料不重新处理
+        index_stats = MaterialsIndex().refresh()
+        print(f"材料索引: 新增 {index_stats['added']}，更新 {index_stats['changed']}，未变化 "
+              f"{index_stats['unchanged'] + index_stats['touched']}，删除 {index_stats['removed']}")
         
-        if api_key == "your_api_key_here" or base_url == "your_api_base_url_here":
-            print("警告: 请在 .env 文件中设置 GLM_API_KEY 和 GLM_BASE_URL 环境变量以使用GLM4.5模型")
-            print("例如:")
-            print("  GLM_API_KEY=your_actual_api_key")
-            print("  GLM_BASE_URL=your_actual_base_url")
-            print("当前将使用默认的gemma3:27b模型")
-            
-            model_client = OllamaChatCompletionClient(
-                model="gemma3:27b",
-                model_info={
-                    'vision': False,
-                    'function_calling': True,
-                    'json_output': False,  # 修改为False以确保一致性
-                    'structured_output': False,  # 添加缺失的structured_output字段
-                    'family': "gemma",
-                },
-                options={
-                    'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                    'stream': True,  # 开启流式输出
-                }
+        # 创建教学团队：pipeline 为固定流程的状态机编排，magentic 为 MagenticOne 编排
+        orchestrator = os.getenv("COURSE_ORCHESTRATOR", "magentic").lower()
+        if orchestrator == "pipeline":
+            team = await create_course_pipeline(
+                model_client, max_review_rounds=int(os.getenv("COURSE_REVIEW_ROUNDS", "3")),
+                telemetry=telemetry, budget=budget, convergence=convergence,
             )
         else:
-            model_client = OpenAIChatCompletionClient(
-                model="glm-4.5", #"glm-4.5",
-                api_key=api_key,
-                base_url=base_url,
-                model_info={
-                    'vision': False,
-                    'function_calling': True,
-                    'json_output': True,  # 修改为False以确保一致性
-                    'structured_output': False,  # 添加缺失的structured_output字段
-                    'family': "glm",
-                },
-                options={
-                    'num_ctx': int(os.getenv("NUM_CTX", "10000")),
-                    'stream': True,  # 开启流式输出
-                    'thinking': {"type": "disabled"},
-                }
-            )
-            print("已选择 glm-4.5 模型")
-    else:
-        # 默认使用 gemma3:27b
-        model_client = OllamaChatCompletionClient(
-            model="gemma3:27b",
-            model_info={
-                'vision': False,
-                'function_calling': True,
-                'json_output': False,  # 修改为False以确保一致性
-                'structured_output': False,  # 添加缺失的structured_output字段
-                'family': "gemma",
-            },
-            options={
-                'num_ctx': int(os.getenv("NUM_CTX", "60000")),
-                'stream': True,  # 开启流式输出
-            }
-        )
-        print("已选择 gemma3:27b 模型")
-    
-    try:
-        # 创建教学团队
-        team = await create_teaching_team(model_client)
+            team = await create_teaching_team(model_client, telemetry=telemetry, budget=budget,
+                                              convergence=convergence)
         
         # 默认文件路径
         default_file_path = "c1.txt"
@@ -533,8 +712,10 @@ async def main():
         print("任务: 基于文件内容生成并评审教学课程")
         print("-" * 50)
         
-        # 重置团队并执行任务
+        # 重置团队并执行任务，运行时间从这里开始计算
         await team.reset()
+        if budget is not None:
+            budget.reset()
         
         # 运行团队任务，指定生成Prompt Engineering课程脚本
         task = f"""注意全部使用中文进行讨论！用户需要生成一个关于Prompt Engineering的沉浸式学习脚本。
@@ -542,7 +723,7 @@ async def main():
 **测试阶段特殊要求：整个课程的总学时不得超过30分钟**
 
 请按以下严格的工作流程进行：
-1. 课程生成器向文件处理器请求读取 {default_file_path} 文件的内容
+1. 课程生成器先向文件处理器请求查看 {default_file_path} 的目录，编写每个知识点时再请文件处理器在 {default_file_path} 中检索相关段落（search_materials），不要一次读取整份材料
 2. 学生代理基于其系统消息中定义的学生画像参与讨论
 3. 所有团队成员（课程生成器、教研组负责人、学生）基于明确的学生画像进行激烈讨论
 4. 课程生成器基于讨论结果生成课程
@@ -560,19 +741,26 @@ async def main():
 - **所有代理都必须确保最终生成的课程总时长不超过30分钟**
 
 教学脚本必须满足以下五项要求：
-1. 读取教学内容的文件
-2. 根据教学内容，生成沉浸式学习的教学脚本，该脚本需要能够指导教学助手一步一步的和学生进行交互式学习
+1. 按知识点检索教学内容文件中的相关段落
+2. 根据检索到的教学内容，生成沉浸式学习的教学脚本，该脚本需要能够指导教学助手一步一步的和学生进行交互式学习
 3. 教学脚本的要求：每个知识点的教学过程不要超过5分钟，要让学生通过"做中学"完成知识点的学习。在教学过程的最后，要根据学生的表现情况，给出基于选择题的小测验，测验时间不要超过10分钟。最后给出针对学生的全面的评估认证报告结果
 4. 对于教学脚本要经过多轮的挑剔的讨论，学生评审员和教研组长要积极参与讨论，并给出挑剔和明确的修改意见
 5. 最后完成讨论后，要对最终的教学脚本进行汇总润色，最后保存成文件
 
 请开始执行任务。"""
+        if orchestrator == "pipeline":
+            # 流水线自行负责读取、评审和保存，只需要给出课程要求
+            task = """注意全部使用中文！请生成一个关于Prompt Engineering的沉浸式学习脚本。
+
+**测试阶段特殊要求：整个课程的总学时不得超过30分钟**
+
+教学脚本的要求：每个知识点的教学过程不要超过5分钟，要让学生通过"做中学"完成知识点的学习。在教学过程的最后，要根据学生的表现情况，给出基于选择题的小测验，测验时间不要超过10分钟。最后给出针对学生的全面的评估认证报告结果。"""
         
         print("\n开始团队对话...")
         print("=" * 50)
-        # 使用流式方式运行团队任务并直接处理流
+        # 使用流式方式运行团队任务，片段合并后写入终端（显示方式见 STREAM_RENDER）
         stream = team.run_stream(task=task)
-        await Console(stream)
+        await render_stream(stream)
             
     except Exception as e:
         print(f"执行过程中发生错误: {e}")
@@ -580,8 +768,11 @@ async def main():
         traceback.print_exc()
     
     finally:
-        # 关闭客户端连接
-        await model_client.close()
+        if telemetry is not None:
+            telemetry.close()
+            print(telemetry.format_summary())
+        # 关闭注册表中的所有客户端连接
+        await close_default_registry()
 
 
 if __name__ == "__main__":
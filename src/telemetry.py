@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+模型调用遥测 - 按代理统计词元用量和延迟
+
+团队里的各个代理共用一个模型客户端，原来只能看到整个任务的总用量，不知道是哪个代理
+消耗了词元和时间。instrument() 为每个代理包装一层客户端，每次模型调用记录：
+代理名称、模型、输入/输出词元数、首字延迟（流式调用）、总耗时、在调度器中的排队时间、
+是否命中缓存以及错误。记录：
+1. 逐条追加到 JSONL 文件，每条带 run_id，多次运行可以写入同一文件
+2. 按代理和模型聚合，写成 Prometheus 文本格式文件（可由 node_exporter 的 textfile 收集器读取）
+3. 运行结束时输出按代理汇总的表格
+
+环境变量：
+- TELEMETRY: 设为 off 时不记录
+- TELEMETRY_DIR: 输出目录，其中 model_calls.jsonl 为逐条记录，metrics.prom 为聚合指标 (默认: .cache/telemetry)
+
+用法：
+    telemetry = telemetry_from_env()
+    team = await create_teaching_team(model_client, telemetry=telemetry)
+    ...
+    telemetry.close()
+    print(telemetry.format_summary())
+"""
+
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence, TextIO, Tuple, Union
+
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+
+from atomic_write import atomic_write_text
+from model_registry import DelegatingChatCompletionClient
+from request_scheduler import observe_waits
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TELEMETRY_DIR = os.path.join(_PROJECT_ROOT, ".cache", "telemetry")
+JSONL_FILENAME = "model_calls.jsonl"
+PROMETHEUS_FILENAME = "metrics.prom"
+METRIC_PREFIX = "teaching_model"
+# 耗时类直方图的桶上限（秒）
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class ModelCallRecord:
+    """一次模型调用的记录，耗时单位为秒"""
+
+    run_id: str
+    agent: str
+    model: str
+    started_at: float  # Unix 时间戳
+    duration: float  # 从发起调用到返回结果，含排队时间
+    ttft: Optional[float]  # 从发起调用到第一个流式片段，非流式调用为空
+    queue: float  # 在调度器中等待并发名额的时间
+    prompt_tokens: int
+    completion_tokens: int
+    streaming: bool
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class _Histogram:
+    """Prometheus 直方图（累计桶）"""
+
+    def __init__(self):
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                 for bound, count in zip(HISTOGRAM_BUCKETS, self.buckets)]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class _AgentStats:
+    """一个 (代理, 模型) 的聚合指标"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.duration = _Histogram()
+        self.ttft = _Histogram()
+        self.queue = _Histogram()
+
+    def add(self, record: ModelCallRecord) -> None:
+        self.calls += 1
+        self.errors += record.error is not None
+        self.cached += record.cached
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.duration.observe(record.duration)
+        self.queue.observe(record.queue)
+        if record.ttft is not None:
+            self.ttft.observe(record.ttft)
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TelemetryRecorder:
+    """收集模型调用记录，写入 JSONL 和 Prometheus 文本格式文件"""
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 run_id: Optional[str] = None, export_interval: float = 5.0):
+        """
+        Args:
+            jsonl_path: 逐条记录的 JSONL 文件，为空时不写
+            prometheus_path: 聚合指标文件，为空时不写
+            run_id: 本次运行的标识，默认按时间生成
+            export_interval: 运行期间至少间隔多少秒重写一次指标文件
+        """
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._export_interval = export_interval
+        self._last_export = 0.0
+        self._jsonl: Optional[TextIO] = None
+        self._stats: Dict[Tuple[str, str], _AgentStats] = {}
+        self.records = 0
+
+    def record(self, record: ModelCallRecord) -> None:
+        """记录一次模型调用"""
+        self._stats.setdefault((record.agent, record.model), _AgentStats()).add(record)
+        self.records += 1
+        if self.jsonl_path:
+            if self._jsonl is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+                self._jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+            self._jsonl.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+            self._jsonl.flush()
+        if self.prometheus_path and time.monotonic() - self._last_export >= self._export_interval:
+            self.export()
+
+    def prometheus_text(self) -> str:
+        """按代理和模型聚合的指标（Prometheus 文本格式）"""
+        counters = [
+            ("calls_total", "模型调用次数", lambda s: s.calls),
+            ("errors_total", "失败的模型调用次数", lambda s: s.errors),
+            ("cached_calls_total", "命中缓存的模型调用次数", lambda s: s.cached),
+            ("prompt_tokens_total", "输入词元数", lambda s: s.prompt_tokens),
+            ("completion_tokens_total", "输出词元数", lambda s: s.completion_tokens),
+        ]
+        histograms = [
+            ("call_duration_seconds", "模型调用总耗时（含排队）", lambda s: s.duration),
+            ("ttft_seconds", "流式调用的首字延迟（含排队）", lambda s: s.ttft),
+            ("queue_seconds", "等待并发名额的时间", lambda s: s.queue),
+        ]
+        items = sorted(self._stats.items())
+        lines: List[str] = []
+        for suffix, help_text, value in counters:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (agent, model), stats in items:
+                lines.append(f'{name}{{agent="{_label_value(agent)}",model="{_label_value(model)}"}} {value(stats)}')
+        for suffix, help_text, histogram in histograms:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (agent, model), stats in items:
+                lines += histogram(stats).lines(name, f'agent="{_label_value(agent)}",model="{_label_value(model)}"')
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """原子地重写指标文件，抓取方不会读到写了一半的文件"""
+        self._last_export = time.monotonic()
+        if self.prometheus_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.prometheus_path)), exist_ok=True)
+            # 指标文件随时可以重新生成，不需要 fsync
+            atomic_write_text(self.prometheus_path, self.prometheus_text(), fsync="none")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """按代理汇总的调用次数、词元数和耗时（秒）"""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (agent, _), stats in sorted(self._stats.items()):
+            entry = result.setdefault(agent, {
+                "calls": 0, "errors": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "duration": 0.0, "queue": 0.0, "_ttft_sum": 0.0, "_ttft_count": 0,
+            })
+            entry["calls"] += stats.calls
+            entry["errors"] += stats.errors
+            entry["cached"] += stats.cached
+            entry["prompt_tokens"] += stats.prompt_tokens
+            entry["completion_tokens"] += stats.completion_tokens
+            entry["duration"] += stats.duration.sum
+            entry["queue"] += stats.queue.sum
+            entry["_ttft_sum"] += stats.ttft.sum
+            entry["_ttft_count"] += stats.ttft.count
+        for entry in result.values():
+            ttft_sum, ttft_count = entry.pop("_ttft_sum"), entry.pop("_ttft_count")
+            entry["ttft_mean"] = round(ttft_sum / ttft_count, 3) if ttft_count else None
+            entry["duration"] = round(entry["duration"], 3)
+            entry["queue"] = round(entry["queue"], 3)
+        return result
+
+    def format_summary(self) -> str:
+        """运行结束时输出的按代理汇总表"""
+        summary = self.summary()
+        lines = [
+            f"{'-' * 10} 模型调用统计 ({self.run_id}) {'-' * 10}",
+            f"{'代理':<22}{'调用':>6}{'输入词元':>10}{'输出词元':>10}{'平均首字(秒)':>12}{'总耗时(秒)':>12}{'排队(秒)':>10}",
+        ]
+        for agent, entry in summary.items():
+            ttft = "-" if entry["ttft_mean"] is None else entry["ttft_mean"]
+            lines.append(f"{agent:<22}{entry['calls']:>6}{entry['prompt_tokens']:>10}{entry['completion_tokens']:>10}"
+                         f"{ttft:>12}{entry['duration']:>12}{entry['queue']:>10}")
+        total = {key: sum(entry[key] for entry in summary.values())
+                 for key in ("calls", "prompt_tokens", "completion_tokens", "duration", "queue")}
+        lines.append(f"{'合计':<22}{total['calls']:>6}{total['prompt_tokens']:>10}{total['completion_tokens']:>10}"
+                     f"{'':>12}{round(total['duration'], 3):>12}{round(total['queue'], 3):>10}")
+        if self.jsonl_path or self.prometheus_path:
+            lines.append(f"明细: {self.jsonl_path or '-'}，指标: {self.prometheus_path or '-'}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """写出最终指标并关闭 JSONL 文件"""
+        self.export()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+def _model_name(client: ChatCompletionClient) -> str:
+    """从共享客户端的注册表键中取模型名称，如 ollama/gemma3:27b"""
+    current: Optional[ChatCompletionClient] = client
+    while current is not None:
+        key = getattr(current, "key", None)
+        if isinstance(key, tuple) and len(key) >= 2:
+            return f"{key[0]}/{key[1]}"
+        current = getattr(current, "inner_client", None)
+    return str(client.model_info.get("family", "unknown"))
+
+
+class InstrumentedChatCompletionClient(DelegatingChatCompletionClient):
+    """记录一个代理的每次模型调用"""
+
+    def __init__(self, client: ChatCompletionClient, recorder: TelemetryRecorder, agent: str,
+                 model: Optional[str] = None):
+        super().__init__(client)
+        self._recorder = recorder
+        self._agent = agent
+        self._model = model or _model_name(client)
+
+    def _record(self, started_at: float, started: float, ttft: Optional[float], waits: List[float],
+                result: Optional[CreateResult], streaming: bool, error: Optional[BaseException] = None) -> None:
+        self._recorder.record(ModelCallRecord(
+            run_id=self._recorder.run_id,
+            agent=self._agent,
+            model=self._model,
+            started_at=round(started_at, 3),
+            duration=round(time.perf_counter() - started, 4),
+            ttft=None if ttft is None else round(ttft, 4),
+            queue=round(sum(waits), 4),
+            prompt_tokens=result.usage.prompt_tokens if result is not None else 0,
+            completion_tokens=result.usage.completion_tokens if result is not None else 0,
+            streaming=streaming,
+            cached=bool(result is not None and result.cached),
+            error=None if error is None else f"{type(error).__name__}: {error}",
+        ))
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        started_at, started, waits = time.time(), time.perf_counter(), observe_waits()
+        try:
+            result = await self._client.create(messages, **kwargs)
+        except Exception as e:
+            self._record(started_at, started, None, waits, None, streaming=False, error=e)
+            raise
+        self._record(started_at, started, None, waits, result, streaming=False)
+        return result
+
+    def create_stream(
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            started_at, started, waits = time.time(), time.perf_counter(), observe_waits()
+            ttft: Optional[float] = None
+            result: Optional[CreateResult] = None
+            try:
+                async for chunk in self._client.create_stream(messages, **kwargs):
+                    if isinstance(chunk, CreateResult):
+                        result = chunk
+                    elif ttft is None:
+                        ttft = time.perf_counter() - started
+                    yield chunk
+            except Exception as e:
+                self._record(started_at, started, ttft, waits, result, streaming=True, error=e)
+                raise
+            self._record(started_at, started, ttft, waits, result, streaming=True)
+
+        return _generator()
+
+
+def instrument(client: ChatCompletionClient, recorder: Optional[TelemetryRecorder],
+               agent: str) -> ChatCompletionClient:
+    """
+    为一个代理包装模型客户端
+
+    Args:
+        client: 模型客户端
+        recorder: 遥测记录器，为空时原样返回客户端
+        agent: 代理名称，作为记录和指标的 agent 标签
+    """
+    if recorder is None:
+        return client
+    return InstrumentedChatCompletionClient(client, recorder, agent)
+
+
+def telemetry_from_env(run_id: Optional[str] = None) -> Optional[TelemetryRecorder]:
+    """按环境变量 TELEMETRY / TELEMETRY_DIR 创建记录器，TELEMETRY=off 时返回 None"""
+    if os.getenv("TELEMETRY", "on").lower() in ("off", "0", "false"):
+        return None
+    directory = os.getenv("TELEMETRY_DIR", DEFAULT_TELEMETRY_DIR)
+    return TelemetryRecorder(
+        jsonl_path=os.path.join(directory, JSONL_FILENAME),
+        prometheus_path=os.path.join(directory, PROMETHEUS_FILENAME),
+        run_id=run_id,
+    )
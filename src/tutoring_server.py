@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+多学生教学服务 - 在一个事件循环中同时运行多个教学会话
+
+teaching_assistant.py 在终端里通过 input() 服务一名学生。TutoringServer 在同一个进程的
+事件循环中托管多个教学会话，每个会话有自己的教学团队、课程进度和检查点，学生通过本地 HTTP
+接口收发消息。所有会话从共享的 ModelClientRegistry 获取模型客户端，同一模型共用连接池和
+并发上限（MODEL_MAX_CONCURRENCY），一台 Ollama 主机即可服务整个班级。
+
+接口（JSON）：
+    GET    /health                      服务状态
+    GET    /sessions                    会话列表
+    POST   /sessions                    创建会话 {"model": 可选, "script": 可选，相对于脚本目录}
+    POST   /sessions/{id}/resume        从检查点恢复会话
+    GET    /sessions/{id}               会话状态与课程进度
+    GET    /sessions/{id}/events        读取事件 ?after=上次的 next&wait=最长等待秒数
+    POST   /sessions/{id}/input         发送学生回复 {"text": "..."}
+    DELETE /sessions/{id}               保存检查点并结束会话
+
+用法：
+    python src/tutoring_server.py --port 8765
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import (
+    BaseChatMessage,
+    MemoryQueryEvent,
+    ModelClientStreamingChunkEvent,
+    UserInputRequestedEvent,
+)
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
+
+from learner_input import QueueInput
+from lesson_cursor import LessonCursor
+from model_registry import (
+    DEFAULT_PROFILE,
+    MODEL_PROFILES,
+    ModelClientRegistry,
+    close_default_registry,
+    get_default_registry,
+)
+from request_scheduler import INTERACTIVE
+from script_parser import parse_script_cached
+from session_store import SessionCheckpointer, SessionStore, new_session_id
+from teaching_assistant import build_teaching_task, create_teaching_team
+from telemetry import TelemetryRecorder, telemetry_from_env
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCRIPT_DIR = os.path.join(_PROJECT_ROOT, "docs")
+DEFAULT_SCRIPT = "prompt_engineering_沉浸式学习脚本.md"
+
+
+class HTTPError(Exception):
+    """返回给客户端的错误"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class TutoringSession:
+    """一名学生的教学会话：团队在后台任务中运行，学生输入通过 QueueInput 送入"""
+
+    def __init__(self, session_id: str, lesson: LessonCursor, checkpointer: SessionCheckpointer,
+                 model: str, max_events: int = 2000):
+        """
+        Args:
+            session_id: 会话 ID
+            lesson: 课程进度游标
+            checkpointer: 会话检查点
+            model: 模型名称
+            max_events: 保留的最近事件数，较早的事件（主要是流式片段）会被丢弃
+        """
+        self.session_id = session_id
+        self.lesson = lesson
+        self.checkpointer = checkpointer
+        self.model = model
+        self.team: Any = None
+        self.status = "starting"
+        self.stop_reason: Optional[str] = None
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.input = QueueInput()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._next_seq = 0
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._cancellation = CancellationToken()
+
+    async def ask(self, prompt: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+        """UserProxyAgent 的异步 input_func：等待学生通过接口发送回复，不阻塞事件循环"""
+        self.status = "waiting_input"
+        text = await self.input.ask(prompt, cancellation_token)
+        self.status = "running"
+        return text
+
+    async def send_input(self, text: str) -> None:
+        """送入学生回复"""
+        if self.status in ("finished", "failed", "stopped"):
+            raise HTTPError("409 Conflict", f"会话 {self.session_id} 已结束")
+        self.last_active = time.time()
+        self.input.put(text)
+        await self._emit("message", source="user", content=text)
+
+    async def _emit(self, event_type: str, **fields: Any) -> None:
+        async with self._changed:
+            self._events.append({"seq": self._next_seq, "type": event_type, **fields})
+            self._next_seq += 1
+            self._changed.notify_all()
+
+    async def events_after(self, after: int, wait: float = 0.0) -> List[Dict[str, Any]]:
+        """返回序号不小于 after 的事件；没有新事件时最多等待 wait 秒"""
+        async with self._changed:
+            if self._next_seq <= after and wait > 0 and not self.done:
+                try:
+                    await asyncio.wait_for(self._changed.wait_for(lambda: self._next_seq > after or self.done), wait)
+                except asyncio.TimeoutError:
+                    pass
+            return [event for event in self._events if event["seq"] >= after]
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    @property
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    def start(self, team: Any, task: Optional[str]) -> None:
+        """在后台运行团队；task 为空时从恢复的状态继续"""
+        self.team = team
+        self.status = "running"
+        self._task = asyncio.create_task(self._run(task), name=f"tutoring-{self.session_id}")
+
+    async def _run(self, task: Optional[str]) -> None:
+        try:
+            async for event in self.team.run_stream(task=task, cancellation_token=self._cancellation):
+                if isinstance(event, ModelClientStreamingChunkEvent):
+                    await self._emit("chunk", source=event.source, content=event.content)
+                elif isinstance(event, UserInputRequestedEvent):
+                    await self._emit("input_requested", source=event.source)
+                elif isinstance(event, MemoryQueryEvent):
+                    current = self.lesson.current
+                    await self._emit("progress", index=self.lesson.index, total=len(self.lesson.tasks),
+                                     title=current.title if current is not None else None)
+                elif isinstance(event, TaskResult):
+                    self.stop_reason = event.stop_reason
+                elif isinstance(event, BaseChatMessage) and event.source != "user":
+                    # 学生的消息在 send_input 时已经记录
+                    await self._emit("message", source=event.source, content=event.to_text())
+            self.status = "finished"
+        except asyncio.CancelledError:
+            self.status = "stopped"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.stop_reason = str(e)
+            await self._emit("error", content=str(e))
+        finally:
+            await self.checkpointer.checkpoint()
+            await self._emit("finished", status=self.status, stop_reason=self.stop_reason)
+
+    async def stop(self) -> None:
+        """结束会话（结束前保存检查点）"""
+        if self._task is not None and not self._task.done():
+            # 通过取消令牌让团队停止，正在等待的学生输入也随之取消
+            self._cancellation.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, Any]:
+        current = self.lesson.current
+        return {
+            "session_id": self.session_id,
+            "model": self.model,
+            "status": self.status,
+            "stop_reason": self.stop_reason,
+            "task_index": self.lesson.index,
+            "task_total": len(self.lesson.tasks),
+            "task_title": current.title if current is not None else None,
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+            "next": self._next_seq,
+        }
+
+
+class TutoringServer:
+    """托管多个教学会话的本地 HTTP 服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, store: Optional[SessionStore] = None,
+                 registry: Optional[ModelClientRegistry] = None,
+                 client_factory: Optional[Callable[[str], ChatCompletionClient]] = None,
+                 default_model: Optional[str] = None, script_dir: Optional[str] = None,
+                 max_sessions: Optional[int] = None, max_turns: int = 5000,
+                 telemetry: Optional[TelemetryRecorder] = None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            store: 会话检查点存储
+            registry: 模型客户端注册表，默认为进程级别的共享注册表
+            client_factory: 按模型名称返回客户端，默认从注册表获取（同一模型的会话共用连接池，
+                            请求按 interactive 优先级排队），此时模型名称必须是 MODEL_PROFILES 中的配置
+            default_model: 创建会话时未指定模型所用的模型，默认读取 TUTOR_MODEL
+            script_dir: 学习脚本目录，客户端只能选择其中的脚本
+            max_sessions: 同时进行的会话上限，默认读取 TUTOR_MAX_SESSIONS
+            max_turns: 每个会话的最大轮次
+            telemetry: 遥测记录器；提供时按代理记录所有会话的模型调用，/health 中附带汇总
+        """
+        self._host = host
+        self._port = port
+        self.store = store or SessionStore()
+        self.registry = registry or get_default_registry()
+        self._client_factory = client_factory or (lambda name: self.registry.get_profile_client(name, priority=INTERACTIVE))
+        # 自定义的 client_factory 自行决定接受哪些模型名称
+        self._known_models = set(MODEL_PROFILES) if client_factory is None else None
+        self.default_model = default_model or os.getenv("TUTOR_MODEL", DEFAULT_PROFILE)
+        self.script_dir = os.path.abspath(script_dir or DEFAULT_SCRIPT_DIR)
+        self.max_sessions = max_sessions or int(os.getenv("TUTOR_MAX_SESSIONS", "32"))
+        self.max_turns = max_turns
+        self.telemetry = telemetry
+        self.sessions: Dict[str, TutoringSession] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    @property
+    def url(self) -> str:
+        """服务地址，如 http://127.0.0.1:8765"""
+        return f"http://{self._host}:{self._port}"
+
+    async def start(self) -> "TutoringServer":
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        """停止服务，所有会话保存检查点后结束"""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        await asyncio.gather(*(session.stop() for session in self.sessions.values()), return_exceptions=True)
+
+    async def __aenter__(self) -> "TutoringServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def _resolve_script(self, script: str) -> str:
+        path = os.path.abspath(os.path.join(self.script_dir, script))
+        if os.path.commonpath([path, self.script_dir]) != self.script_dir:
+            raise HTTPError("400 Bad Request", f"学习脚本必须位于 {self.script_dir} 中")
+        return path
+
+    def _active_count(self) -> int:
+        return sum(1 for session in self.sessions.values() if not session.done)
+
+    async def _new_session(self, session_id: str, model: str, script_path: str,
+                           checkpoint: Optional[Dict[str, Any]] = None) -> TutoringSession:
+        if self._active_count() >= self.max_sessions:
+            raise HTTPError("503 Service Unavailable", f"同时进行的会话已达上限 {self.max_sessions}")
+        try:
+            content = await asyncio.to_thread(_read_text, script_path)
+        except OSError as e:
+            raise HTTPError("404 Not Found", f"无法读取学习脚本: {e}")
+        script = parse_script_cached(content)
+        if not script.tasks:
+            raise HTTPError("400 Bad Request", "未能解析学习脚本")
+        script_sha256 = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if checkpoint and checkpoint["metadata"].get("script_sha256") != script_sha256:
+            raise HTTPError("409 Conflict", "学习脚本在会话中断后被修改，课程进度无法对应")
+
+        lesson = LessonCursor(script)
+        checkpointer = SessionCheckpointer(self.store, session_id, lesson=lesson, metadata={
+            "model": model, "script_path": script_path, "script_sha256": script_sha256,
+        })
+        session = TutoringSession(session_id, lesson, checkpointer, model)
+        team, _ = await create_teaching_team(self._client_factory(model), max_turns=self.max_turns,
+                                             lesson=lesson, checkpointer=checkpointer, input_func=session.ask,
+                                             telemetry=self.telemetry)
+        if checkpoint:
+            await checkpointer.restore(checkpoint)
+            session.start(team, None)
+        else:
+            session.start(team, build_teaching_task(lesson))
+        self.sessions[session_id] = session
+        return session
+
+    async def create_session(self, model: Optional[str] = None, script: Optional[str] = None) -> TutoringSession:
+        """创建新的教学会话"""
+        if any(value is not None and not isinstance(value, str) for value in (model, script)):
+            raise HTTPError("400 Bad Request", "model / script 必须是字符串")
+        if model is not None and self._known_models is not None and model not in self._known_models:
+            raise HTTPError("400 Bad Request", f"未知的模型: {model}（可选 {', '.join(sorted(self._known_models))}）")
+        return await self._new_session(new_session_id(), model or self.default_model,
+                                       self._resolve_script(script or DEFAULT_SCRIPT))
+
+    async def resume_session(self, session_id: str) -> TutoringSession:
+        """从检查点恢复会话，不调用模型"""
+        existing = self.sessions.get(session_id)
+        if existing is not None and not existing.done:
+            raise HTTPError("409 Conflict", f"会话 {session_id} 正在进行")
+        try:
+            checkpoint = self.store.load(session_id)
+        except FileNotFoundError as e:
+            raise HTTPError("404 Not Found", str(e))
+        except ValueError as e:
+            raise HTTPError("400 Bad Request", str(e))
+        metadata = checkpoint["metadata"]
+        return await self._new_session(session_id, metadata["model"], metadata["script_path"], checkpoint)
+
+    def _session(self, session_id: str) -> TutoringSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError("404 Not Found", f"会话 {session_id} 不存在")
+        return session
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个连接上的多个请求（支持 keep-alive）"""
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionResetError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                raw = await reader.readexactly(length) if length else b""
+
+                try:
+                    try:
+                        body = json.loads(raw) if raw else {}
+                    except ValueError:
+                        raise HTTPError("400 Bad Request", "请求体不是有效的 JSON")
+                    if not isinstance(body, dict):
+                        raise HTTPError("400 Bad Request", "请求体必须是 JSON 对象")
+                    url = urlsplit(target)
+                    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    status, data = await self._dispatch(method, url.path.rstrip("/") or "/", query, body)
+                except HTTPError as e:
+                    status, data = e.status, {"error": str(e)}
+                except Exception as e:
+                    # 任何未预料的错误都要给客户端一个答复，而不是直接断开连接
+                    print(f"处理请求 {method} {target} 时出错: {type(e).__name__}: {e}")
+                    status, data = "500 Internal Server Error", {"error": f"{type(e).__name__}: {e}"}
+                await self._send_json(writer, data, status)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, query: Dict[str, str],
+                        body: Dict[str, Any]) -> "tuple[str, Any]":
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/health":
+            health = {"status": "ok", "sessions": len(self.sessions), "active": self._active_count(),
+                      "scheduler": self.registry.stats()["scheduler"]}
+            if self.telemetry is not None:
+                health["telemetry"] = self.telemetry.summary()
+            return "200 OK", health
+        if parts[0] != "sessions":
+            raise HTTPError("404 Not Found", f"not found: {path}")
+
+        if len(parts) == 1:
+            if method == "GET":
+                return "200 OK", {"sessions": [s.summary() for s in self.sessions.values()]}
+            if method == "POST":
+                session = await self.create_session(body.get("model"), body.get("script"))
+                return "201 Created", {**session.summary(), "outline": session.lesson.outline()}
+        elif len(parts) == 2:
+            if method == "GET":
+                return "200 OK", self._session(parts[1]).summary()
+            if method == "DELETE":
+                session = self._session(parts[1])
+                await session.stop()
+                del self.sessions[parts[1]]
+                return "200 OK", session.summary()
+        elif len(parts) == 3:
+            session_id, action = parts[1], parts[2]
+            if method == "POST" and action == "resume":
+                session = await self.resume_session(session_id)
+                return "201 Created", {**session.summary(), "outline": session.lesson.outline()}
+            if method == "POST" and action == "input":
+                text = body.get("text")
+                if not isinstance(text, str) or not text.strip():
+                    raise HTTPError("400 Bad Request", "缺少 text")
+                session = self._session(session_id)
+                await session.send_input(text)
+                return "202 Accepted", session.summary()
+            if method == "GET" and action == "events":
+                session = self._session(session_id)
+                try:
+                    after = int(query.get("after", "0"))
+                    wait = min(float(query.get("wait", "0")), 60.0)
+                except ValueError:
+                    raise HTTPError("400 Bad Request", "after / wait 必须是数字")
+                events = await session.events_after(after, wait)
+                return "200 OK", {"events": events, "next": session.next_seq, "status": session.status}
+        raise HTTPError("404 Not Found", f"not found: {method} {path}")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, data: Any, status: str = "200 OK") -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+async def main():
+    """以独立进程运行教学服务"""
+    import argparse
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="多学生教学服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("TUTOR_PORT", "8765")))
+    parser.add_argument("--model", default=None, help="默认模型（默认读取 TUTOR_MODEL）")
+    parser.add_argument("--max-sessions", type=int, default=None, help="同时进行的会话上限")
+    args = parser.parse_args()
+
+    telemetry = telemetry_from_env()
+    server = TutoringServer(args.host, args.port, default_model=args.model, max_sessions=args.max_sessions,
+                            telemetry=telemetry)
+    await server.start()
+    print(f"教学服务已启动: {server.url}（默认模型 {server.default_model}，最多 {server.max_sessions} 个会话）")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        if telemetry is not None:
+            telemetry.close()
+            print(telemetry.format_summary())
+        await close_default_registry()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -5,9 +5,10 @@ Web Surfer Agent - 爬取给定URL的页面内容
 
 import asyncio
 import json
+import os
 from typing import Dict, Any
-from autogen_ext.models.ollama import OllamaChatCompletionClient
 from autogen_core.models import UserMessage
+from model_registry import ModelClientRegistry
 from autogen_ext.agents.web_surfer import MultimodalWebSurfer
 
 
@@ -118,9 +119,11 @@ async def simple_web_scraper(url: str) -> Dict[str, Any]:
 
 
 async def main():
-    # 初始化 Ollama 客户端
-    model_client = OllamaChatCompletionClient(
-        model="gemma3:27b",
+    # 初始化 Ollama 客户端，num_ctx 作为上限，实际请求按提示词长度自适应选择档位
+    registry = ModelClientRegistry()
+    model_client = registry.get_client(
+        "ollama",
+        "gemma3:27b",
         model_info={
             'vision': False,
             'function_calling': True,
@@ -128,7 +131,7 @@ async def main():
             'structured_output': False,  # 添加缺失的structured_output字段
         },
         options={
-            'num_ctx': 60000,
+            'num_ctx': int(os.getenv("NUM_CTX", "60000")),
         }
     )
     
@@ -152,7 +155,7 @@ async def main():
         print("这可能是因为缺少图形界面环境或者模型不支持工具调用")
     
     # 关闭客户端连接
-    await model_client.close()
+    await registry.aclose()
 
 
 if __name__ == "__main__":
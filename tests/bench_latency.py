@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+端到端延迟基准测试 - 通过本地 Ollama 替身服务驱动教学团队、课程生成流水线和教学助手团队
+
+统计指标：
+- 首字延迟（TTFT）：每轮开始到第一个流式片段出现的时间
+- 流式吞吐：经过 Console 渲染的每秒片段数
+- 框架开销：每轮的总耗时减去替身服务模拟的模型耗时
+- 总轮次与模型请求数
+
+用法：
+    python tests/bench_latency.py --tps 40 --ttft 0.3 --rounds 2 --turns 6
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseChatMessage, ModelClientStreamingChunkEvent
+from autogen_agentchat.ui import Console
+from model_registry import MODEL_PROFILES, ModelClientRegistry
+from ollama_standin import OllamaStandInServer
+
+import teaching_assistant
+import teaching_team
+
+REVIEW_SPEAKERS = ["course_generator", "curriculum_director", "student"]
+
+
+def make_reply_func(reply_tokens: int, rounds: int):
+    """
+    构造替身服务的回复函数
+
+    MagenticOne 的进度账本请求返回合法JSON并轮流指定发言者，
+    SelectorGroupChat 的选择请求返回另一位参与者，其余请求返回固定长度的中文回复。
+    """
+    state = {"ledger_calls": 0}
+    body_text = ("这是一段用于基准测试的教学脚本内容。" * (reply_tokens // 17 + 1))[:reply_tokens]
+
+    def reply_func(path: str, body: Dict[str, Any]) -> str:
+        messages = body.get("messages", [])
+        last = str(messages[-1].get("content") or "") if messages else ""
+
+        if "is_request_satisfied" in last:
+            index = state["ledger_calls"]
+            state["ledger_calls"] += 1
+            return json.dumps({
+                "is_request_satisfied": {"reason": "基准测试", "answer": index >= rounds * len(REVIEW_SPEAKERS)},
+                "is_in_loop": {"reason": "基准测试", "answer": False},
+                "is_progress_being_made": {"reason": "基准测试", "answer": True},
+                "next_speaker": {"reason": "基准测试", "answer": REVIEW_SPEAKERS[index % len(REVIEW_SPEAKERS)]},
+                "instruction_or_question": {"reason": "基准测试", "answer": "请继续。"},
+            }, ensure_ascii=False)
+
+        if "select the next role" in last:
+            # 两人对话中选择上一位发言者之外的参与者
+            return "user" if last.rfind("teaching_assistant:") > last.rfind("user:") else "teaching_assistant"
+
+        return body_text
+
+    return reply_func
+
+
+async def probe(stream: AsyncGenerator[Any, None], stats: Dict[str, Any]) -> AsyncGenerator[Any, None]:
+    """在事件流经过 Console 之前记录每轮的时间点"""
+    turn_start = time.perf_counter()
+    first_chunk = None
+    last_chunk = None
+    async for event in stream:
+        now = time.perf_counter()
+        if isinstance(event, ModelClientStreamingChunkEvent):
+            if first_chunk is None:
+                first_chunk = now
+                stats["ttft"].append(now - turn_start)
+            last_chunk = now
+            stats["chunks"] += 1
+        elif isinstance(event, BaseChatMessage):
+            if first_chunk is not None and last_chunk is not None:
+                stats["stream_seconds"] += last_chunk - first_chunk
+            stats["turns"] += 1
+            turn_start = now
+            first_chunk = last_chunk = None
+        yield event
+
+
+async def run_benchmark(name: str, server: OllamaStandInServer, team: Any, task: str, show: bool) -> Dict[str, Any]:
+    """运行一个团队并汇总指标"""
+    stats: Dict[str, Any] = {"ttft": [], "chunks": 0, "stream_seconds": 0.0, "turns": 0}
+    requests_before = len(server.requests)
+    service_before = server.service_seconds
+
+    started = time.perf_counter()
+    output = contextlib.nullcontext() if show else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with output:
+        result = await Console(probe(team.run_stream(task=task), stats))
+    wall = time.perf_counter() - started
+
+    # 任务消息本身不算一轮
+    turns = max(stats["turns"] - 1, 1)
+    service = server.service_seconds - service_before
+    ttft = stats["ttft"]
+    return {
+        "name": name,
+        "wall_seconds": round(wall, 3),
+        "turns": turns,
+        "model_requests": len(server.requests) - requests_before,
+        "ttft_mean": round(statistics.mean(ttft), 3) if ttft else None,
+        "ttft_max": round(max(ttft), 3) if ttft else None,
+        "console_tokens_per_second": round(stats["chunks"] / stats["stream_seconds"], 1) if stats["stream_seconds"] else None,
+        "framework_overhead_per_turn": round((wall - service) / turns, 4),
+        "stop_reason": result.stop_reason if isinstance(result, TaskResult) else None,
+    }
+
+
+async def bench_teaching_team(server: OllamaStandInServer, registry: ModelClientRegistry,
+                              rounds: int, show: bool) -> Dict[str, Any]:
+    """课程生成团队（MagenticOneGroupChat）"""
+    client = registry.get_profile_client("gemma3:27b", host=server.url)
+    team = await teaching_team.create_teaching_team(client, max_turns=rounds * len(REVIEW_SPEAKERS) + 2)
+    return await run_benchmark("teaching_team", server, team, "请基于 c1.txt 生成沉浸式学习脚本。", show)
+
+
+async def bench_course_pipeline(server: OllamaStandInServer, registry: ModelClientRegistry,
+                                rounds: int, show: bool) -> Dict[str, Any]:
+    """课程生成流水线（状态机编排），评审轮数与 MagenticOne 团队相同"""
+    client = registry.get_profile_client("gemma3:27b", host=server.url)
+    with tempfile.TemporaryDirectory() as output_dir:
+        pipeline = await teaching_team.create_course_pipeline(
+            client, max_review_rounds=rounds, output_filename=os.path.join(output_dir, "bench_script.md")
+        )
+        return await run_benchmark("course_pipeline", server, pipeline, "请基于 c1.txt 生成沉浸式学习脚本。", show)
+
+
+async def bench_tutoring_team(server: OllamaStandInServer, registry: ModelClientRegistry,
+                              turns: int, show: bool) -> Dict[str, Any]:
+    """教学助手团队（SelectorGroupChat）"""
+    client = registry.get_profile_client("gemma3:27b", host=server.url)
+    team, _ = await teaching_assistant.create_teaching_team(client, max_turns=turns,
+                                                            input_func=lambda prompt: "我完成了")
+    return await run_benchmark("tutoring_team", server, team, "请开始教学。", show)
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    labels = {
+        "wall_seconds": "总耗时(秒)",
+        "turns": "总轮次",
+        "model_requests": "模型请求数",
+        "ttft_mean": "平均首字延迟(秒)",
+        "ttft_max": "最大首字延迟(秒)",
+        "console_tokens_per_second": "Console吞吐(片段/秒)",
+        "framework_overhead_per_turn": "每轮框架开销(秒)",
+        "stop_reason": "停止原因",
+    }
+    for result in results:
+        print(f"\n=== {result['name']} ===")
+        for key, label in labels.items():
+            print(f"{label:<24}{result[key]}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="教学团队端到端延迟基准测试")
+    parser.add_argument("--tps", type=float, default=50.0, help="替身服务每秒输出片段数")
+    parser.add_argument("--ttft", type=float, default=0.2, help="替身服务首字延迟（秒）")
+    parser.add_argument("--reply-tokens", type=int, default=200, help="每条回复的片段数")
+    parser.add_argument("--rounds", type=int, default=2, help="课程生成团队的评审轮数")
+    parser.add_argument("--turns", type=int, default=6, help="教学助手团队的对话轮次")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    parser.add_argument("--show", action="store_true", help="显示 Console 输出")
+    args = parser.parse_args()
+
+    server = OllamaStandInServer(
+        tokens_per_second=args.tps,
+        ttft=args.ttft,
+        reply_func=make_reply_func(args.reply_tokens, args.rounds),
+    )
+    registry = ModelClientRegistry(default_max_concurrency=4)
+    async with server:
+        try:
+            results = [
+                await bench_teaching_team(server, registry, args.rounds, args.show),
+                await bench_course_pipeline(server, registry, args.rounds, args.show),
+                await bench_tutoring_team(server, registry, args.turns, args.show),
+            ]
+        finally:
+            await registry.aclose()
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
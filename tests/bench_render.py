@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+流式渲染基准测试 - 比较 autogen Console 与合并输出的 StreamRenderer
+
+用合成的事件流模拟几位代理轮流快速输出，渲染到伪终端上，统计：
+- 片段显示延迟：片段从事件流产出到写入终端（flush）的时间
+- 写系统调用次数
+- CPU 时间（含线程池）与占用率
+
+用法：
+    python tests/bench_render.py --tps 2000 --agents 3 --messages 4 --chunks 500
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pty
+import statistics
+import sys
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+from autogen_agentchat.ui import Console
+from stream_renderer import StreamRenderer
+
+# 每个片段末尾的标记，写入终端时据此统计哪些片段已经显示
+MARKER = "▁"
+
+
+class ScreenProbe:
+    """伪终端输出流：write 只缓冲，flush 时写入终端并记录其中片段的显示时间"""
+
+    def __init__(self, fd: int, arrivals: List[float]):
+        self._fd = fd
+        self._arrivals = arrivals
+        self._buffer: List[str] = []
+        self.shown = 0
+        self.latencies: List[float] = []
+        self.syscalls = 0
+
+    def write(self, text: str) -> int:
+        self._buffer.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        os.write(self._fd, text.encode('utf-8'))
+        self.syscalls += 1
+        now = time.perf_counter()
+        for _ in range(text.count(MARKER)):
+            self.latencies.append(now - self._arrivals[self.shown])
+            self.shown += 1
+
+    def isatty(self) -> bool:
+        return True
+
+
+async def synthetic_stream(arrivals: List[float], agents: int, messages: int, chunks: int,
+                           tps: float) -> AsyncGenerator[Any, None]:
+    """
+    几位代理轮流发言，每条消息由 chunks 个片段组成，片段按 tps 的总速率到达（0 表示不限速）
+
+    与 team.run_stream 一样，片段由独立的任务放入队列，渲染跟不上时在队列中积压，
+    积压的时间计入显示延迟。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        started = time.perf_counter()
+        produced = 0
+        finals = []
+        for index in range(messages * agents):
+            source = f"agent_{index % agents}"
+            for _ in range(chunks):
+                if tps:
+                    delay = started + produced / tps - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                arrivals.append(time.perf_counter())
+                produced += 1
+                queue.put_nowait(ModelClientStreamingChunkEvent(content="词" + MARKER, source=source))
+                if not tps and produced % 100 == 0:
+                    # 不限速时也定期让出事件循环，模拟网络读取
+                    await asyncio.sleep(0)
+            final = TextMessage(content=("词" + MARKER) * chunks, source=source)
+            finals.append(final)
+            queue.put_nowait(final)
+        queue.put_nowait(TaskResult(messages=finals, stop_reason="基准测试"))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            event = await queue.get()
+            yield event
+            if isinstance(event, TaskResult):
+                break
+    finally:
+        producer.cancel()
+
+
+async def run_renderer(name: str, args: argparse.Namespace, fd: int) -> Dict[str, Any]:
+    """用一种渲染方式显示合成事件流并汇总指标"""
+    arrivals: List[float] = []
+    probe = ScreenProbe(fd, arrivals)
+    stream = synthetic_stream(arrivals, args.agents, args.messages, args.chunks, args.tps)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(probe):
+        if name == "console":
+            await Console(stream)
+        else:
+            await StreamRenderer(output=probe, flush_interval=args.flush_ms / 1000).render(stream)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    latencies = sorted(probe.latencies)
+    return {
+        "name": name,
+        "chunks": len(arrivals),
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / wall * 100, 1),
+        "write_syscalls": probe.syscalls,
+        "latency_mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        "latency_max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    labels = {
+        "chunks": "片段数",
+        "wall_seconds": "总耗时(秒)",
+        "cpu_seconds": "CPU时间(秒)",
+        "cpu_percent": "CPU占用(%)",
+        "write_syscalls": "写系统调用次数",
+        "latency_mean_ms": "平均显示延迟(毫秒)",
+        "latency_p95_ms": "P95显示延迟(毫秒)",
+        "latency_max_ms": "最大显示延迟(毫秒)",
+    }
+    print(f"\n{'':<24}" + "".join(f"{result['name']:>14}" for result in results))
+    for key, label in labels.items():
+        print(f"{label:<24}" + "".join(f"{result[key]:>14}" for result in results))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="流式渲染基准测试")
+    parser.add_argument("--tps", type=float, default=2000.0, help="所有代理合计每秒产出的片段数，0 表示不限速")
+    parser.add_argument("--agents", type=int, default=3, help="轮流发言的代理数")
+    parser.add_argument("--messages", type=int, default=4, help="每位代理的消息数")
+    parser.add_argument("--chunks", type=int, default=500, help="每条消息的片段数")
+    parser.add_argument("--flush-ms", type=float, default=50.0, help="StreamRenderer 的合并时间窗口（毫秒）")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    # 伪终端的另一端持续读出并丢弃，模拟终端在显示输出
+    master, slave = pty.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 65536):
+                pass
+        except OSError:
+            pass
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    try:
+        results = [await run_renderer(name, args, slave) for name in ("console", "coalesce")]
+    finally:
+        os.close(slave)
+        os.close(master)
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
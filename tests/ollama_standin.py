@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+本地 Ollama 替身服务 - 无需真实模型即可测试与压测教学团队
+
+实现 Ollama 的 /api/chat（NDJSON流）和 OpenAI 兼容的 /v1/chat/completions（SSE流）接口，
+可配置首字延迟、生成速度和预设回复，并记录每个请求的服务耗时。
+
+用法：
+    async with OllamaStandInServer(tokens_per_second=40, ttft=0.3) as server:
+        client = OllamaChatCompletionClient(model="gemma3:27b", host=server.url, ...)
+"""
+
+import asyncio
+import itertools
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# 中文按字切分，其他文本按词切分，近似模型的流式输出粒度
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]|[^\s\u3400-\u9fff\uf900-\ufaff]+\s*|\s+')
+
+
+def split_tokens(text: str) -> List[str]:
+    """把回复切分成流式输出的片段"""
+    return _TOKEN_PATTERN.findall(text)
+
+
+class OllamaStandInServer:
+    """Ollama / OpenAI 兼容接口的本地替身服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, tokens_per_second: float = 50.0,
+                 ttft: float = 0.2, replies: Optional[List[str]] = None,
+                 reply_func: Optional[Callable[[str, Dict[str, Any]], str]] = None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            tokens_per_second: 每秒输出的片段数，0 表示不限速
+            ttft: 首个片段前的延迟（秒）
+            replies: 预设回复，按顺序循环使用
+            reply_func: 自定义回复函数，参数为 (请求路径, 请求JSON)，优先于 replies
+        """
+        self._host = host
+        self._port = port
+        self.tokens_per_second = tokens_per_second
+        self.ttft = ttft
+        self._replies = itertools.cycle(replies or ["好的，我明白了。"])
+        self._reply_func = reply_func
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        # 每个请求的记录：路径、模型、开始/首字/结束时间、输出片段数
+        self.requests: List[Dict[str, Any]] = []
+
+    @property
+    def url(self) -> str:
+        """服务地址，如 http://127.0.0.1:54321"""
+        return f"http://{self._host}:{self._port}"
+
+    @property
+    def service_seconds(self) -> float:
+        """所有请求在服务端花费的总时间（模拟的模型耗时）"""
+        return sum(r["finished"] - r["started"] for r in self.requests if r.get("finished"))
+
+    async def start(self) -> "OllamaStandInServer":
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # 关闭仍保持 keep-alive 的连接，让连接处理协程正常退出
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "OllamaStandInServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def _next_reply(self, path: str, body: Dict[str, Any]) -> str:
+        if self._reply_func is not None:
+            return self._reply_func(path, body)
+        return next(self._replies)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个连接上的多个请求（支持 keep-alive）"""
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionResetError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+
+                await self._dispatch(method, path.split("?")[0], body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        if method == "POST" and path == "/api/chat":
+            await self._chat(path, body, writer, openai=False)
+        elif method == "POST" and path in ("/v1/chat/completions", "/chat/completions"):
+            await self._chat(path, body, writer, openai=True)
+        elif method == "GET" and path == "/api/version":
+            await self._send_json(writer, {"version": "0.0.0-standin"})
+        elif method == "GET" and path == "/api/tags":
+            await self._send_json(writer, {"models": []})
+        else:
+            await self._send_json(writer, {"error": f"not found: {path}"}, status="404 Not Found")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, data: Dict[str, Any], status: str = "200 OK") -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+    async def _chat(self, path: str, body: Dict[str, Any], writer: asyncio.StreamWriter, openai: bool) -> None:
+        record: Dict[str, Any] = {"path": path, "model": body.get("model"), "started": time.perf_counter()}
+        self.requests.append(record)
+        reply = self._next_reply(path, body)
+        tokens = split_tokens(reply)
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 2
+        record["tokens"] = len(tokens)
+        stream = body.get("stream", False)
+
+        if self.ttft > 0:
+            await asyncio.sleep(self.ttft)
+
+        if not stream:
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(len(tokens) / self.tokens_per_second)
+            record["first_token"] = record["finished"] = time.perf_counter()
+            if openai:
+                await self._send_json(writer, self._openai_completion(body, reply, prompt_tokens, len(tokens)))
+            else:
+                await self._send_json(writer, self._ollama_chunk(body, reply, True, prompt_tokens, len(tokens)))
+            return
+
+        content_type = "text/event-stream" if openai else "application/x-ndjson"
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n\r\n".encode("latin-1")
+        )
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for index, token in enumerate(tokens):
+            if index == 0:
+                record["first_token"] = time.perf_counter()
+            elif delay:
+                await asyncio.sleep(delay)
+            if openai:
+                await self._write_chunk(writer, self._sse(self._openai_chunk(body, {"content": token}, None)))
+            else:
+                await self._write_chunk(writer, self._ollama_chunk(body, token, False))
+
+        if openai:
+            await self._write_chunk(writer, self._sse(self._openai_chunk(body, {}, "stop")))
+            usage_chunk = self._openai_chunk(body, None, None)
+            usage_chunk["usage"] = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            }
+            await self._write_chunk(writer, self._sse(usage_chunk))
+            await self._write_chunk(writer, "data: [DONE]\n\n")
+        else:
+            await self._write_chunk(writer, self._ollama_chunk(body, "", True, prompt_tokens, len(tokens)))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        record["finished"] = time.perf_counter()
+        record.setdefault("first_token", record["finished"])
+
+    async def _write_chunk(self, writer: asyncio.StreamWriter, data: Any) -> None:
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False) + "\n"
+        encoded = data.encode("utf-8")
+        writer.write(f"{len(encoded):x}\r\n".encode("latin-1") + encoded + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _sse(data: Dict[str, Any]) -> str:
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    @staticmethod
+    def _ollama_chunk(body: Dict[str, Any], content: str, done: bool,
+                      prompt_tokens: int = 0, completion_tokens: int = 0) -> Dict[str, Any]:
+        chunk: Dict[str, Any] = {
+            "model": body.get("model", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            chunk.update({
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": completion_tokens,
+            })
+        return chunk
+
+    @staticmethod
+    def _openai_chunk(body: Dict[str, Any], delta: Optional[Dict[str, Any]], finish_reason: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [] if delta is None else [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}
+            ],
+        }
+
+    @staticmethod
+    def _openai_completion(body: Dict[str, Any], reply: str, prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+async def main():
+    """以独立进程运行替身服务"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 Ollama 替身服务")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tps", type=float, default=50.0, help="每秒输出片段数")
+    parser.add_argument("--ttft", type=float, default=0.2, help="首字延迟（秒）")
+    args = parser.parse_args()
+
+    server = OllamaStandInServer(port=args.port, tokens_per_second=args.tps, ttft=args.ttft)
+    await server.start()
+    print(f"替身服务已启动: {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
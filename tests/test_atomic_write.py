@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试原子文件写入
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import atomic_write
+from atomic_write import atomic_write_text, save_text
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """测试临时文件 + 原子替换"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "script.md")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _read(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_write_and_replace(self):
+        """测试写入新文件和覆盖已有文件"""
+        for policy in ("none", "file", "full"):
+            atomic_write_text(self.path, f"内容-{policy}", fsync=policy)
+            self.assertEqual(self._read(), f"内容-{policy}")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["script.md"])
+
+    def test_failure_keeps_old_content(self):
+        """测试写入中途失败时原文件不受影响、临时文件被清理"""
+        atomic_write_text(self.path, "旧版本")
+        with patch.object(atomic_write.os, "replace", side_effect=OSError("磁盘已满")):
+            with self.assertRaises(OSError):
+                atomic_write_text(self.path, "新版本")
+        self.assertEqual(self._read(), "旧版本")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["script.md"])
+
+    @unittest.skipIf(os.name != "posix", "需要 POSIX 权限位")
+    def test_file_mode(self):
+        """测试新建文件按当前 umask 设置权限，覆盖已有文件时沿用其权限"""
+        previous = os.umask(0o027)
+        try:
+            atomic_write_text(self.path, "新文件")
+        finally:
+            os.umask(previous)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+
+        os.chmod(self.path, 0o600)
+        atomic_write_text(self.path, "新版本")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_invalid_policy(self):
+        """测试不支持的 fsync 策略"""
+        with self.assertRaises(ValueError):
+            atomic_write_text(self.path, "x", fsync="sometimes")
+
+    def test_concurrent_saves_serialized(self):
+        """测试同一路径的并发保存依次执行，且不阻塞事件循环"""
+        active = {"now": 0, "max": 0}
+        original = atomic_write.atomic_write_text
+
+        def slow_write(path, content, fsync=None):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            try:
+                time.sleep(0.05)
+                return original(path, content, fsync)
+            finally:
+                active["now"] -= 1
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticking = asyncio.create_task(ticker())
+            await asyncio.gather(*(save_text(self.path, f"版本{i}") for i in range(4)))
+            ticking.cancel()
+            return ticks
+
+        with patch.object(atomic_write, "atomic_write_text", slow_write):
+            ticks = asyncio.run(run())
+        self.assertEqual(active["max"], 1)
+        self.assertEqual(self._read(), "版本3")
+        # 写入期间事件循环仍在运行
+        self.assertGreater(ticks, 5)
+        self.assertEqual(len(atomic_write._path_locks), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试批量课程生成
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from batch_generate import discover_materials, run_batch
+from materials_index import add_exclude
+from model_registry import MODEL_PROFILES
+
+
+class TestBatchGenerate(unittest.TestCase):
+    """测试批量生成的清单、断点续跑和失败记录"""
+
+    def setUp(self):
+        """测试初始化：两个材料文件"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.materials = os.path.join(self.temp_dir.name, "materials")
+        self.output = os.path.join(self.temp_dir.name, "courses")
+        os.makedirs(os.path.join(self.materials, "第二单元"))
+        self._write("提示词.txt", "提示词工程的基础知识")
+        self._write(os.path.join("第二单元", "思维链.md"), "# 思维链\n分步推理")
+        self._write(".草稿.txt", "隐藏文件不处理")
+        self.clients = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, name, content):
+        with open(os.path.join(self.materials, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def _factory(self, model):
+        # 生成一次，两位评审都通过
+        client = ReplayChatCompletionClient(
+            ["# 学习脚本", "APPROVE", "APPROVE"], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"]
+        )
+        self.clients.append(client)
+        return client
+
+    def _run(self, factory=None, **kwargs):
+        kwargs.setdefault("concurrency", 2)
+        return asyncio.run(run_batch(
+            self.materials, self.output, client_factory=factory or self._factory,
+            log=lambda message: None, **kwargs,
+        ))
+
+    def test_discover_materials(self):
+        """测试跳过隐藏文件、材料目录内的输出目录和排除列表中的文件"""
+        os.makedirs(os.path.join(self.materials, "courses"))
+        self._write(os.path.join("courses", "旧脚本.md"), "不是材料")
+        self._write("提示词课程.md", "不是材料")
+        add_exclude(self.materials, "提示词课程.md")
+        found = discover_materials(self.materials, exclude=[os.path.join(self.materials, "courses")])
+        self.assertEqual(found, ["提示词.txt", os.path.join("第二单元", "思维链.md")])
+
+    def test_manifest_and_resume(self):
+        """测试清单记录输出和用量，重新运行只生成变化的材料"""
+        manifest = self._run()
+        item = manifest.items["提示词.txt"]
+        self.assertEqual(item["status"], "done")
+        self.assertTrue(item["approved"])
+        self.assertEqual(item["usage"]["calls"], 3)
+        self.assertGreater(item["usage"]["prompt_tokens"], 0)
+        with open(os.path.join(self.output, "第二单元", "思维链_course_script.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "# 学习脚本")
+        with open(manifest.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["totals"]["done"], 2)
+
+        # 未变化的材料不再调用模型
+        self.clients.clear()
+        self._run()
+        self.assertEqual(self.clients, [])
+
+        # 修改过的材料重新生成
+        self._write("提示词.txt", "提示词工程的进阶知识")
+        manifest = self._run()
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual(manifest.totals()["done"], 2)
+
+    def test_failure_is_recorded(self):
+        """测试单个材料失败时记录错误，其他材料照常生成"""
+        def factory(model):
+            if len(self.clients) == 0:
+                self.clients.append(None)
+                return ReplayChatCompletionClient([])
+            return self._factory(model)
+
+        manifest = self._run(factory, concurrency=1)
+        statuses = sorted(item["status"] for item in manifest.items.values())
+        self.assertEqual(statuses, ["done", "failed"])
+        failed = next(item for item in manifest.items.values() if item["status"] == "failed")
+        self.assertIn("error", failed)
+
+        # 重新运行只重试失败的材料
+        self.clients.clear()
+        manifest = self._run()
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual(manifest.totals()["failed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试模型调用结果缓存
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core.models import CreateResult, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from completion_cache import CacheMissError, CachedChatCompletionClient, DiskCompletionStore, get_completion_store, wrap_with_cache
+
+
+class TestDiskCompletionStore(unittest.TestCase):
+    """测试磁盘缓存存储"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """测试清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_set_and_get(self):
+        """测试写入与读取，并能从磁盘重建索引"""
+        store = DiskCompletionStore(self.temp_dir)
+        store.set("abc123", ["你好"])
+        self.assertEqual(store.get("abc123"), ["你好"])
+
+        reopened = DiskCompletionStore(self.temp_dir)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.get("abc123"), ["你好"])
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        store = DiskCompletionStore(self.temp_dir, max_bytes=250)
+        store.set("aa01", ["x" * 100])
+        store.set("bb02", ["y" * 100])
+        store.get("aa01")  # aa01 变为最近使用
+        store.set("cc03", ["z" * 100])
+
+        self.assertIsNotNone(store.get("aa01"))
+        self.assertIsNone(store.get("bb02"))
+        self.assertIsNotNone(store.get("cc03"))
+        self.assertLessEqual(store.total_bytes, 250)
+
+
+class TestCachedChatCompletionClient(unittest.TestCase):
+    """测试带缓存的模型客户端"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.messages = [UserMessage(content="请生成课程", source="user")]
+
+    def tearDown(self):
+        """测试清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_create_hit(self):
+        """测试第二次相同请求命中缓存"""
+        inner = ReplayChatCompletionClient(["第一次回复", "第二次回复"])
+        client = CachedChatCompletionClient(inner, DiskCompletionStore(self.temp_dir))
+
+        first = asyncio.run(client.create(self.messages))
+        second = asyncio.run(client.create(self.messages))
+
+        self.assertEqual(first.content, "第一次回复")
+        self.assertEqual(second.content, "第一次回复")
+        self.assertTrue(second.cached)
+        self.assertEqual(client.hits, 1)
+
+    def test_stream_replay(self):
+        """测试流式结果被录制后可以在严格回放模式下重放"""
+        store = DiskCompletionStore(self.temp_dir)
+        recorder = CachedChatCompletionClient(ReplayChatCompletionClient(["流式 回复"]), store, mode="record")
+
+        async def collect(client):
+            return [chunk async for chunk in client.create_stream(self.messages)]
+
+        recorded = asyncio.run(collect(recorder))
+        replayer = CachedChatCompletionClient(ReplayChatCompletionClient([]), store, mode="replay")
+        replayed = asyncio.run(collect(replayer))
+
+        self.assertEqual([c for c in replayed if isinstance(c, str)], [c for c in recorded if isinstance(c, str)])
+        self.assertIsInstance(replayed[-1], CreateResult)
+        self.assertEqual(replayed[-1].content, "流式 回复")
+
+    def test_replay_miss(self):
+        """测试严格回放模式下未命中时抛出异常"""
+        client = CachedChatCompletionClient(
+            ReplayChatCompletionClient(["不应被调用"]), DiskCompletionStore(self.temp_dir), mode="replay"
+        )
+        with self.assertRaises(CacheMissError):
+            asyncio.run(client.create(self.messages))
+
+    def test_key_depends_on_messages(self):
+        """测试不同消息得到不同的缓存键"""
+        client = CachedChatCompletionClient(ReplayChatCompletionClient([]), DiskCompletionStore(self.temp_dir))
+        other = [UserMessage(content="请评审课程", source="user")]
+        self.assertNotEqual(client.cache_key(self.messages), client.cache_key(other))
+
+    def test_wrap_shares_store(self):
+        """测试同一缓存目录的多个包装客户端共用一个存储，后写入的结果对先创建的客户端可见"""
+        first = wrap_with_cache(ReplayChatCompletionClient(["第一次回复"]), cache_dir=self.temp_dir, mode="read_write")
+        second = wrap_with_cache(ReplayChatCompletionClient([]), cache_dir=self.temp_dir, mode="replay")
+        self.assertIs(first._store, second._store)
+        self.assertIs(first._store, get_completion_store(self.temp_dir))
+
+        asyncio.run(first.create(self.messages))
+        self.assertEqual(asyncio.run(second.create(self.messages)).content, "第一次回复")
+
+    def test_wrap_off(self):
+        """测试关闭缓存时返回原客户端"""
+        inner = ReplayChatCompletionClient([])
+        self.assertIs(wrap_with_cache(inner, mode="off"), inner)
+
+
+if __name__ == "__main__":
+    unittest.main()
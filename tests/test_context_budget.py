@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试上下文预算（自适应 num_ctx）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core.models import SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from context_budget import ContextBudgeter, estimate_messages_tokens, estimate_tokens
+from model_registry import SharedModelClient, with_output_reserve
+from request_scheduler import PriorityScheduler
+
+
+class RecordingReplayClient(ReplayChatCompletionClient):
+    """记录每次请求 extra_create_args 的回放客户端"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extra_args = []
+
+    async def create(self, messages, **kwargs):
+        self.extra_args.append(kwargs.get("extra_create_args"))
+        return await super().create(messages, **kwargs)
+
+
+class TestEstimateTokens(unittest.TestCase):
+    """测试词元估算"""
+
+    def test_chinese_and_english(self):
+        """测试中文按字、英文按4字符估算"""
+        self.assertEqual(estimate_tokens("提示词工程"), 5)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens(""), 0)
+
+    def test_messages(self):
+        """测试消息列表的估算包含每条消息的固定开销"""
+        messages = [SystemMessage(content="你是助手"), UserMessage(content="你好", source="user")]
+        self.assertEqual(estimate_messages_tokens(messages), 4 + 2 + 2 * 4)
+
+
+class TestContextBudgeter(unittest.TestCase):
+    """测试 num_ctx 档位选择"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.budgeter = ContextBudgeter(max_num_ctx=60000, buckets=(4096, 8192, 16384, 32768, 65536),
+                                        reserve_tokens=1000, shrink_after=3)
+
+    def test_smallest_fitting_bucket(self):
+        """测试选择能容纳提示词和输出预留的最小档位"""
+        self.assertEqual(self.budgeter.choose_num_ctx(2000), 4096)
+        self.assertEqual(self.budgeter.choose_num_ctx(5000), 8192)
+
+    def test_cap_at_max(self):
+        """测试超过上限时使用上限"""
+        self.assertEqual(self.budgeter.choose_num_ctx(100000), 60000)
+        self.assertEqual(self.budgeter.metrics()["overflows"], 1)
+
+    def test_sticky_shrink(self):
+        """测试连续多次用不到当前档位才降档"""
+        self.budgeter.choose_num_ctx(10000)
+        chosen = [self.budgeter.choose_num_ctx(100) for _ in range(3)]
+        self.assertEqual(chosen, [16384, 16384, 4096])
+        self.assertEqual(self.budgeter.metrics()["bucket_changes"], 1)
+
+    def test_apply_merges_options(self):
+        """测试 num_ctx 与客户端原有 options 合并"""
+        args = self.budgeter.apply(
+            [UserMessage(content="你好", source="user")], [], {}, {"num_ctx": 60000, "stream": True}
+        )
+        self.assertEqual(args["options"], {"num_ctx": 4096, "stream": True})
+
+    def test_shared_client_applies_budget(self):
+        """测试共享客户端按请求设置 num_ctx"""
+        inner = RecordingReplayClient(["回复"])
+        client = SharedModelClient(inner, PriorityScheduler(1), ("ollama", "gemma3:27b"),
+                                   budgeter=self.budgeter, base_options={"num_ctx": 60000})
+        asyncio.run(client.create([UserMessage(content="你好", source="user")]))
+        self.assertEqual(inner.extra_args[0]["options"]["num_ctx"], 4096)
+
+    def test_long_output_reserve(self):
+        """测试输出整篇脚本的客户端按更大的输出预留选择档位，与原客户端共用轮转单位"""
+        self.assertEqual(self.budgeter.choose_num_ctx(2000, reserve_tokens=12000), 16384)
+
+        inner = RecordingReplayClient(["回复", "回复"])
+        client = SharedModelClient(inner, PriorityScheduler(1), ("ollama", "gemma3:27b"),
+                                   budgeter=ContextBudgeter(max_num_ctx=60000, reserve_tokens=1000),
+                                   base_options={"num_ctx": 60000})
+        generator = with_output_reserve(client, 12000)
+        self.assertEqual(generator._rotation_unit, client._rotation_unit)
+        asyncio.run(client.create([UserMessage(content="你好", source="user")]))
+        asyncio.run(generator.create([UserMessage(content="你好", source="user")]))
+        self.assertEqual([args["options"]["num_ctx"] for args in inner.extra_args], [4096, 16384])
+
+    def test_reserve_from_num_predict(self):
+        """测试设置了 num_predict 时按它为输出预留"""
+        budgeter = ContextBudgeter(max_num_ctx=60000, reserve_tokens=1000)
+        messages = [UserMessage(content="你好", source="user")]
+        args = budgeter.apply(messages, [], {"options": {"num_predict": 10000}}, {"num_ctx": 60000})
+        self.assertEqual(args["options"]["num_ctx"], 16384)
+        self.assertEqual(args["options"]["num_predict"], 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试有界对话记忆（滑动窗口 + 滚动摘要）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core import FunctionCall
+from autogen_core.models import (
+    AssistantMessage, FunctionExecutionResult, FunctionExecutionResultMessage, SystemMessage, UserMessage
+)
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from context_budget import estimate_messages_tokens
+from conversation_memory import ModelSummarizer, RollingSummaryChatCompletionContext, SUMMARY_SOURCE
+
+
+def _turn(i):
+    if i % 2 == 0:
+        return UserMessage(content=f"第{i}轮：我完成了练习，请检查我的提示词。" * 5, source="user")
+    return AssistantMessage(content=f"第{i}轮：做得很好，下面进入下一个练习。" * 5, source="teaching_assistant")
+
+
+class TestRollingSummaryChatCompletionContext(unittest.TestCase):
+    """测试滑动窗口与滚动摘要"""
+
+    def test_task_kept_and_window_bounded(self):
+        """测试任务消息原样保留，窗口之外的消息被摘要"""
+        context = RollingSummaryChatCompletionContext(window_size=4, summarize_batch=2)
+        task = UserMessage(content="请按学习脚本开始教学", source="user")
+
+        async def run():
+            await context.add_message(task)
+            for i in range(10):
+                await context.add_message(_turn(i))
+            return await context.get_messages()
+
+        messages = asyncio.run(run())
+        self.assertIs(messages[0], task)
+        self.assertEqual(messages[1].source, SUMMARY_SOURCE)
+        self.assertEqual(len(messages), 2 + 4)
+        self.assertGreater(context.stats()["tokens_saved"], 0)
+
+    def test_clear_resets_summary(self):
+        """测试清空后摘要和所有统计一并归零"""
+        context = RollingSummaryChatCompletionContext(window_size=4, summarize_batch=2)
+
+        async def run():
+            for i in range(10):
+                await context.add_message(_turn(i))
+            await context.get_messages()
+            self.assertGreater(context.stats()["summarized_messages"], 0)
+            await context.clear()
+            self.assertEqual(context.stats(), {
+                "turns": 0, "summarized_messages": 0, "summary_tokens": 0, "tokens_sent": 0, "tokens_saved": 0,
+            })
+            return await context.get_messages()
+
+        self.assertEqual(asyncio.run(run()), [])
+
+    def test_prompt_size_independent_of_length(self):
+        """测试会话变长后每轮提示词大小保持有界"""
+        context = RollingSummaryChatCompletionContext(window_size=6, summarize_batch=2, max_summary_tokens=200)
+        sizes = []
+
+        async def run():
+            await context.add_message(UserMessage(content="开始教学", source="user"))
+            for i in range(200):
+                await context.add_message(_turn(i))
+                sizes.append(estimate_messages_tokens(await context.get_messages()))
+
+        asyncio.run(run())
+        self.assertLess(max(sizes[50:]), max(sizes[:20]) + 250)
+        self.assertLessEqual(len(context._messages), 1 + 6 + 2)
+
+    def test_window_does_not_start_with_tool_result(self):
+        """测试窗口不会以工具执行结果开头"""
+        context = RollingSummaryChatCompletionContext(window_size=1, summarize_batch=1)
+
+        async def run():
+            await context.add_message(UserMessage(content="任务", source="user"))
+            await context.add_message(
+                AssistantMessage(content=[FunctionCall(id="1", name="read", arguments="{}")], source="a")
+            )
+            await context.add_message(FunctionExecutionResultMessage(
+                content=[FunctionExecutionResult(call_id="1", content="结果", name="read", is_error=False)]
+            ))
+            return await context.get_messages()
+
+        messages = asyncio.run(run())
+        self.assertNotIsInstance(messages[-1], FunctionExecutionResultMessage)
+
+    def test_model_summarizer_and_state(self):
+        """测试模型摘要器的结果进入上下文，且可以保存和恢复"""
+        context = RollingSummaryChatCompletionContext(
+            summarizer=ModelSummarizer(ReplayChatCompletionClient(["学生已完成任务一。"])),
+            window_size=2, summarize_batch=2,
+        )
+
+        async def run():
+            await context.add_message(UserMessage(content="任务", source="user"))
+            for i in range(4):
+                await context.add_message(_turn(i))
+            await context.get_messages()
+            restored = RollingSummaryChatCompletionContext()
+            await restored.load_state(await context.save_state())
+            return await restored.get_messages()
+
+        messages = asyncio.run(run())
+        self.assertIn("学生已完成任务一。", messages[1].content)
+
+    def test_pinned_message(self):
+        """测试固定消息不滑出窗口、同键替换，并随状态保存"""
+        context = RollingSummaryChatCompletionContext(window_size=2, summarize_batch=1)
+
+        async def run():
+            await context.add_message(UserMessage(content="任务", source="user"))
+            context.pin("lesson", SystemMessage(content="当前任务一"))
+            context.pin("lesson", SystemMessage(content="当前任务二"))
+            for i in range(6):
+                await context.add_message(_turn(i))
+            restored = RollingSummaryChatCompletionContext(window_size=2)
+            await restored.load_state(await context.save_state())
+            return await context.get_messages(), await restored.get_messages()
+
+        messages, restored = asyncio.run(run())
+        self.assertEqual(messages[2].content, "当前任务二")
+        self.assertEqual(len(messages), 1 + 1 + 1 + 2)
+        self.assertEqual(restored[2].content, "当前任务二")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+测试课程生成流水线（状态机编排）
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.base import TaskResult
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import MODEL_PROFILES
+from course_pipeline import CoursePipeline, DraftTracker, PipelineStage, extract_script, merge_critiques
+from material_search import MaterialSearch
+from materials_index import MaterialsIndex
+from teaching_team import CourseGeneratorAgent, CurriculumDirectorAgent, FileHandlerAgent, StudentAgent
+
+
+class SlowReplayClient(ReplayChatCompletionClient):
+    """每次请求前等待固定时间，并记录同时进行的请求数"""
+
+    def __init__(self, replies, delay, tracker):
+        super().__init__(replies)
+        self._delay = delay
+        self._tracker = tracker
+
+    async def create_stream(self, *args, **kwargs):
+        self._tracker["active"] += 1
+        self._tracker["max_active"] = max(self._tracker["max_active"], self._tracker["active"])
+        try:
+            await asyncio.sleep(self._delay)
+            async for chunk in super().create_stream(*args, **kwargs):
+                yield chunk
+        finally:
+            self._tracker["active"] -= 1
+
+
+class TestCoursePipeline(unittest.TestCase):
+    """测试流水线的状态转移与模型调用次数"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, "c1.txt"), 'w', encoding='utf-8') as f:
+            f.write("提示词工程的基础知识")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _pipeline(self, generator_replies, student_replies, director_replies, max_review_rounds=3, **kwargs):
+        self.clients = [
+            ReplayChatCompletionClient(generator_replies),
+            ReplayChatCompletionClient(student_replies),
+            ReplayChatCompletionClient(director_replies),
+        ]
+        file_handler = FileHandlerAgent(
+            ReplayChatCompletionClient([], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"])
+        )
+        file_handler._base_path = self.temp_dir.name
+        return CoursePipeline(
+            file_handler,
+            CourseGeneratorAgent(self.clients[0]),
+            CurriculumDirectorAgent(self.clients[2]),
+            StudentAgent(self.clients[1]),
+            output_filename="script.md",
+            max_review_rounds=max_review_rounds,
+            **kwargs,
+        )
+
+    def _model_calls(self):
+        return sum(client._current_index for client in self.clients)
+
+    def test_revise_until_approved(self):
+        """测试评审不通过时修改，通过后保存最后一版"""
+        pipeline = self._pipeline(["# 初稿", "# 修改稿"], ["太难了", "可以"], ["任务太长", "APPROVE"])
+        result = asyncio.run(pipeline.run("生成学习脚本"))
+
+        self.assertIsInstance(result, TaskResult)
+        self.assertTrue(pipeline.approved)
+        self.assertEqual(pipeline.review_rounds, 2)
+        self.assertIs(pipeline.stage, PipelineStage.DONE)
+        # 只有生成与评审调用模型：2次生成 + 2轮 × 2位评审
+        self.assertEqual(self._model_calls(), 6)
+        self.assertEqual([m.source for m in result.messages[1:]],
+                         ["course_generator", "student", "curriculum_director"] * 2)
+        with open(os.path.join(self.temp_dir.name, "script.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "# 修改稿")
+
+    def test_round_limit(self):
+        """测试达到评审轮数上限时停止并保存"""
+        pipeline = self._pipeline(["# 初稿"], ["太难了"], ["不通过"], max_review_rounds=1)
+        result = asyncio.run(pipeline.run("生成学习脚本"))
+
+        self.assertFalse(pipeline.approved)
+        self.assertIn("上限", result.stop_reason)
+        self.assertEqual(self._model_calls(), 3)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "script.md")))
+
+    def test_reviewers_run_concurrently(self):
+        """测试同一轮的评审并发进行"""
+        tracker = {"active": 0, "max_active": 0}
+        pipeline = self._pipeline(["# 初稿"], [], [], max_review_rounds=1)
+        pipeline._student._model_client = SlowReplayClient(["太难了"], 0.2, tracker)
+        pipeline._curriculum_director._model_client = SlowReplayClient(["APPROVE"], 0.2, tracker)
+        result = asyncio.run(pipeline.run("生成学习脚本"))
+
+        self.assertEqual(tracker["max_active"], 2)
+        self.assertTrue(pipeline.approved)
+        self.assertEqual([m.source for m in result.messages[1:]], ["course_generator", "student", "curriculum_director"])
+
+    def test_long_material_sends_relevant_passages(self):
+        """测试材料超出预算时，课程生成器只收到目录和检索到的相关段落"""
+        with open(os.path.join(self.temp_dir.name, "c1.txt"), 'w', encoding='utf-8') as f:
+            f.write("零样本提示词\n直接描述任务。\n\n" + "无关的历史材料。\n" * 200 + "\n思维链提示法\n一步一步推理。\n")
+        pipeline = self._pipeline(["# 初稿"], ["可以"], ["APPROVE"], material_token_budget=100, material_top_k=1)
+        pipeline._file_handler._search = MaterialSearch(MaterialsIndex(
+            self.temp_dir.name, manifest_path=os.path.join(self.temp_dir.name, ".manifest.json"), chunk_tokens=50))
+        asyncio.run(pipeline.run("生成关于思维链提示法的学习脚本"))
+
+        prompt = asyncio.run(pipeline._course_generator._model_context.get_messages())[0].content
+        self.assertIn("目录", prompt)
+        self.assertIn("一步一步推理", prompt)
+        self.assertNotIn("无关的历史材料", prompt)
+
+    def test_merge_critiques(self):
+        """测试评审意见按评审分节并标明结论"""
+        feedback = merge_critiques(2, [("student", "任务一太长"), ("curriculum_director", "缺少测验")])
+        self.assertIn("第 2 轮", feedback)
+        self.assertIn("- 学生：需要修改", feedback)
+        self.assertIn("## 教研组负责人意见（需要修改）\n缺少测验", feedback)
+
+    def test_extract_script(self):
+        """测试去掉回复开头的保存请求"""
+        text = "FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：课程.md\n# 学习脚本\n内容"
+        self.assertEqual(extract_script(text), "# 学习脚本\n内容")
+
+    def test_draft_tracker(self):
+        """测试比迄今最长一版短一半以上的回复不算完整脚本"""
+        drafts = DraftTracker()
+        script = "# 学习脚本\n" + "练习内容。" * 20
+        self.assertEqual(drafts.draft(script), script)
+        self.assertIsNone(drafts.draft("请保存脚本"))
+        self.assertEqual(drafts.draft(script[:-20]), script[:-20])
+        drafts.reset()
+        self.assertEqual(drafts.draft("请保存脚本"), "请保存脚本")
+
+
+if __name__ == "__main__":
+    unittest.main()
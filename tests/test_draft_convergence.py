@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试草稿收敛检测
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.messages import StopMessage, TextMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from course_pipeline import CoursePipeline
+from draft_convergence import ConvergenceDetector, ConvergenceTermination, critique_similarity, draft_change
+from model_registry import MODEL_PROFILES
+from teaching_team import CourseGeneratorAgent, CurriculumDirectorAgent, FileHandlerAgent, StudentAgent
+
+DRAFT = "\n".join(f"## 知识点 {i}\n练习：用提示词完成第 {i} 个任务" for i in range(20))
+# 只改动一行的下一版
+REVISED = DRAFT.replace("练习：用提示词完成第 7 个任务", "练习：用提示词独立完成第 7 个任务")
+STUDENT_CRITIQUE = "第三个任务太难了，希望多给一个例子，测验题目也偏多。"
+DIRECTOR_CRITIQUE = "任务的评估标准不够明确，学习路径的递进关系需要加强。"
+
+
+class TestDraftConvergence(unittest.TestCase):
+    """测试变化度量、流水线提前结束和团队终止条件"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, "c1.txt"), 'w', encoding='utf-8') as f:
+            f.write("提示词工程的基础知识")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _pipeline(self, director_replies, action):
+        self.clients = [
+            ReplayChatCompletionClient([DRAFT, REVISED, DRAFT]),
+            ReplayChatCompletionClient([STUDENT_CRITIQUE] * 3),
+            ReplayChatCompletionClient(director_replies),
+        ]
+        file_handler = FileHandlerAgent(
+            ReplayChatCompletionClient([], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"]),
+            base_path=self.temp_dir.name,
+        )
+        return CoursePipeline(
+            file_handler,
+            CourseGeneratorAgent(self.clients[0]),
+            CurriculumDirectorAgent(self.clients[2]),
+            StudentAgent(self.clients[1]),
+            output_filename="script.md",
+            max_review_rounds=5,
+            convergence=ConvergenceDetector(action=action),
+        )
+
+    def _model_calls(self):
+        return sum(client._current_index for client in self.clients)
+
+    def test_measures(self):
+        """测试草稿变化按行计算，评审意见相似度不受标点和空白影响"""
+        self.assertEqual(draft_change(DRAFT, DRAFT), 0.0)
+        self.assertLess(draft_change(DRAFT, REVISED), 0.05)
+        self.assertGreater(draft_change(DRAFT, "# 全新的脚本"), 0.9)
+        self.assertEqual(critique_similarity(STUDENT_CRITIQUE, STUDENT_CRITIQUE.replace("，", " ")), 1.0)
+        self.assertLess(critique_similarity(STUDENT_CRITIQUE, DIRECTOR_CRITIQUE), 0.3)
+
+    def test_from_env(self):
+        """测试默认请教研组负责人做最终决定，off 时不检测"""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ConvergenceDetector.from_env().action, "decide")
+        with patch.dict(os.environ, {"CONVERGENCE_ACTION": "off"}, clear=True):
+            self.assertIsNone(ConvergenceDetector.from_env())
+        with patch.dict(os.environ, {"CONVERGENCE_ACTION": "stop", "CONVERGENCE_DRAFT_CHANGE": "0.1"}, clear=True):
+            detector = ConvergenceDetector.from_env()
+        self.assertEqual((detector.action, detector.max_draft_change), ("stop", 0.1))
+
+    def test_pipeline_forces_final_decision(self):
+        """测试第二轮评审后收敛，请教研组负责人做最终决定，省去后续修改和评审"""
+        pipeline = self._pipeline([DIRECTOR_CRITIQUE, DIRECTOR_CRITIQUE, "APPROVE"], action="decide")
+        result = asyncio.run(pipeline.run("生成课程"))
+
+        self.assertTrue(pipeline.approved)
+        self.assertEqual(pipeline.review_rounds, 2)
+        self.assertIn("评审已收敛", result.stop_reason)
+        self.assertIn("教研组负责人最终批准", result.stop_reason)
+        # 生成 2 次、评审 2 轮共 4 次、最终决定 1 次
+        self.assertEqual(self._model_calls(), 7)
+        with open(os.path.join(self.temp_dir.name, "script.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read().strip(), REVISED)
+
+    def test_pipeline_stop_saves_without_decision(self):
+        """测试 stop 方式收敛时直接保存，不再询问教研组负责人"""
+        pipeline = self._pipeline([DIRECTOR_CRITIQUE, DIRECTOR_CRITIQUE], action="stop")
+        result = asyncio.run(pipeline.run("生成课程"))
+
+        self.assertFalse(pipeline.approved)
+        self.assertEqual(result.stop_reason, f"评审已收敛（{pipeline.converged}）")
+        self.assertEqual(self._model_calls(), 6)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "script.md")))
+
+    def test_termination_skips_review_of_stable_draft(self):
+        """测试团队中新一版脚本几乎没有变化且上一轮意见重复时终止，并保存这一版"""
+        saved = []
+
+        async def save(draft):
+            saved.append(draft)
+
+        termination = ConvergenceTermination(
+            ConvergenceDetector(action="stop"), draft_source="course_generator",
+            reviewers=["student", "curriculum_director"], on_converged=save,
+        )
+
+        def round_messages(draft):
+            return [
+                TextMessage(content=draft, source="course_generator"),
+                TextMessage(content=STUDENT_CRITIQUE, source="student"),
+                TextMessage(content=DIRECTOR_CRITIQUE, source="curriculum_director"),
+            ]
+
+        async def run():
+            self.assertIsNone(await termination(round_messages(DRAFT)))
+            self.assertIsNone(await termination(round_messages(DRAFT + "\n## 补充的例子")))
+            # 向文件处理器提出的简短请求不算新一版脚本
+            self.assertIsNone(await termination([TextMessage(content="请保存", source="course_generator")]))
+            return await termination([TextMessage(content=REVISED + "\n## 补充的例子", source="course_generator")])
+
+        stop = asyncio.run(run())
+        self.assertIsInstance(stop, StopMessage)
+        self.assertIn("评审已收敛", stop.content)
+        self.assertEqual(saved, [REVISED + "\n## 补充的例子"])
+
+
+if __name__ == "__main__":
+    unittest.main()
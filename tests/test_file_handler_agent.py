@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from autogen_core.models import SystemMessage, UserMessage
 from autogen_ext.models.ollama import OllamaChatCompletionClient
+from materials_index import load_excludes
 from teaching_team import FileHandlerAgent
 
 
@@ -64,6 +65,9 @@ class TestFileHandlerAgentTools(unittest.TestCase):
             content = f.read()
             self.assertEqual(content, "这是测试内容")
 
+        # 保存的文件不纳入材料索引
+        self.assertEqual(load_excludes(self.temp_dir), ["test.txt"])
+
     def test_read_file_content_tool_call(self):
         """测试read_file_content工具调用"""
         # 先创建一个测试文件
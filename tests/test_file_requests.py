@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+测试文件操作请求解析及 FileHandlerAgent 的直接执行
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.messages import TextMessage
+from autogen_core import CancellationToken
+from autogen_core.models import AssistantMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from file_requests import FileRequest, find_file_request, parse_file_request
+from material_search import MaterialSearch
+from materials_index import MaterialsIndex
+from model_registry import MODEL_PROFILES
+from teaching_team import FileHandlerAgent
+
+
+class TestParseFileRequest(unittest.TestCase):
+    """测试请求格式识别"""
+
+    def test_read_request(self):
+        """测试约定的读取请求格式"""
+        request = parse_file_request("FileHandlerAgent，请调用read_file_content工具读取文件，文件名：c1.txt")
+        self.assertEqual(request, FileRequest("read", "c1.txt"))
+        self.assertEqual(parse_file_request("请读取文件，文件名：[c1.txt]").filename, "c1.txt")
+
+    def test_toc_and_section_requests(self):
+        """测试目录和章节读取请求"""
+        self.assertEqual(
+            parse_file_request("FileHandlerAgent，请调用get_table_of_contents工具查看目录，文件名：c1.txt"),
+            FileRequest("toc", "c1.txt"),
+        )
+        request = parse_file_request("FileHandlerAgent，请调用read_file_section工具读取章节，文件名：c1.txt，章节：零样本提示词")
+        self.assertEqual(request.section, "零样本提示词")
+        request = parse_file_request('{"action": "read", "filename": "c1.txt", "offset": 10, "length": 100}')
+        self.assertEqual((request.offset, request.length), (10, 100))
+
+    def test_save_request_with_content_label(self):
+        """测试带 "内容：" 的保存请求"""
+        request = parse_file_request(
+            "FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：课程.md，内容：# 标题\n正文"
+        )
+        self.assertEqual(request, FileRequest("save", "课程.md", "# 标题\n正文"))
+
+    def test_save_request_content_on_next_lines(self):
+        """测试课程生成器的格式：第一行是保存请求，之后是完整内容"""
+        request = parse_file_request(
+            "FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：课程.md\n# 学习脚本\n任务一"
+        )
+        self.assertEqual(request.content, "# 学习脚本\n任务一")
+
+    def test_json_command(self):
+        """测试结构化JSON命令"""
+        self.assertEqual(parse_file_request('{"action": "read", "filename": "c1.txt"}'), FileRequest("read", "c1.txt"))
+        self.assertEqual(
+            parse_file_request('{"action": "save_content_to_file", "filename": "a.md", "content": "x"}'),
+            FileRequest("save", "a.md", "x"),
+        )
+        self.assertIsNone(parse_file_request('{"action": "delete", "filename": "a.md"}'))
+
+    def test_search_request(self):
+        """测试材料检索请求，文件名可选"""
+        self.assertEqual(
+            parse_file_request("FileHandlerAgent，请调用search_materials工具检索材料，查询：[零样本提示词]"),
+            FileRequest("search", "", query="零样本提示词"),
+        )
+        request = parse_file_request('{"action": "search", "query": "少样本", "top_k": 2, "filename": "c1.txt"}')
+        self.assertEqual((request.filename, request.query, request.top_k), ("c1.txt", "少样本", 2))
+        self.assertIsNone(parse_file_request('{"action": "search", "query": ""}'))
+
+    def test_not_a_request(self):
+        """测试普通讨论消息和缺少内容的保存请求不被识别"""
+        self.assertIsNone(parse_file_request("我认为任务一的时间太长了，文件名：不重要"))
+        self.assertIsNone(parse_file_request("请调用save_content_to_file工具保存文件，文件名：课程.md"))
+        self.assertEqual(find_file_request(["好的", "请读取文件，文件名：c1.txt"]).filename, "c1.txt")
+        # 只解析最新的一条消息，更早的请求已经过时
+        self.assertIsNone(find_file_request(["请读取文件，文件名：c1.txt", "好的"]))
+        self.assertIsNone(find_file_request([]))
+
+
+class TestFileHandlerDirectPath(unittest.TestCase):
+    """测试 FileHandlerAgent 不经过模型执行文件操作"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model_client = ReplayChatCompletionClient(
+            ["模型回复"], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"]
+        )
+        self.agent = FileHandlerAgent(self.model_client)
+        self.agent._base_path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _send(self, text):
+        message = TextMessage(content=text, source="course_generator")
+        return asyncio.run(self.agent.on_messages([message], CancellationToken())).chat_message.content
+
+    def test_save_then_read_without_model(self):
+        """测试保存和读取都不调用模型"""
+        saved = self._send("FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：课程\n# 学习脚本")
+        self.assertIn("课程.md", saved)
+        content = self._send("FileHandlerAgent，请调用read_file_content工具读取文件，文件名：课程.md")
+        self.assertEqual(content, "# 学习脚本")
+        self.assertEqual(self.model_client._current_index, 0)
+
+    def test_ranged_and_section_reads(self):
+        """测试按目录、章节和范围读取"""
+        self._send("FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：a.md\n# 一\n甲\n# 二\n乙")
+        self.assertIn("2. 二", self._send('{"action": "toc", "filename": "a.md"}'))
+        self.assertEqual(self._send('{"action": "read", "filename": "a.md", "section": "二"}'), "# 二\n乙")
+        self.assertIn("offset=5", self._send('{"action": "read", "filename": "a.md", "length": 3}'))
+
+    def test_search_without_model(self):
+        """测试检索请求直接执行"""
+        self.agent._search = MaterialSearch(MaterialsIndex(
+            self.temp_dir.name, manifest_path=os.path.join(self.temp_dir.name, ".manifest.json")))
+        with open(os.path.join(self.temp_dir.name, "a.md"), 'w', encoding='utf-8') as f:
+            f.write("# 少样本\n给出几个示例")
+        result = self._send("FileHandlerAgent，请调用search_materials工具检索材料，查询：示例")
+        self.assertIn("a.md · 少样本", result)
+        self.assertEqual(self.model_client._current_index, 0)
+
+    def test_missing_file(self):
+        """测试文件不存在时返回错误说明"""
+        self.assertIn("不存在", self._send('{"action": "read", "filename": "missing.txt"}'))
+
+    def test_stale_request_not_executed(self):
+        """测试更早消息中的请求不再执行，最新的指令无法识别时交给模型；直接执行的请求也记入模型上下文"""
+        saved = self._send("FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：a.md\n# 一")
+        messages = [
+            TextMessage(content="FileHandlerAgent，请调用save_content_to_file工具保存文件，文件名：a.md\n# 旧版", source="course_generator"),
+            TextMessage(content="请把刚才的脚本另存一份", source="MagenticOneOrchestrator"),
+        ]
+        reply = asyncio.run(self.agent.on_messages(messages, CancellationToken())).chat_message.content
+        self.assertEqual(reply, "模型回复")
+        with open(os.path.join(self.temp_dir.name, "a.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "# 一")
+
+        history = asyncio.run(self.agent._model_context.get_messages())
+        self.assertIsInstance(history[1], AssistantMessage)
+        self.assertEqual(history[1].content, saved)
+        self.assertEqual(len(history), 2 + len(messages) + 1)
+
+    def test_unrecognized_falls_back_to_model(self):
+        """测试无法识别的请求交给模型处理"""
+        self.assertEqual(self._send("你好"), "模型回复")
+        self.assertEqual(self.model_client._current_index, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
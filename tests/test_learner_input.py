@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试学生输入来源
+"""
+
+import asyncio
+import io
+import os
+import pty
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core import CancellationToken
+from learner_input import QueueInput, SocketInput, StdinInput
+
+
+async def _ticks_while(awaitable, interval=0.01):
+    """等待 awaitable 的同时计数事件循环上其他协程的运行次数"""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(interval)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await awaitable, ticks
+    finally:
+        task.cancel()
+
+
+class TestQueueInput(unittest.TestCase):
+    """测试程序送入的输入"""
+
+    def test_put_close_and_cancel(self):
+        """测试按顺序读取、关闭后抛出 EOFError、取消令牌结束等待"""
+        async def run():
+            provider = QueueInput()
+            provider.put("第一条")
+            first = await provider.ask("> ")
+
+            token = CancellationToken()
+            pending = asyncio.ensure_future(provider.ask("> ", token))
+            await asyncio.sleep(0.01)
+            token.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+
+            await provider.close()
+            with self.assertRaises(EOFError):
+                await provider.ask("> ")
+            return first
+
+        self.assertEqual(asyncio.run(run()), "第一条")
+
+
+class TestStdinInput(unittest.TestCase):
+    """测试终端输入"""
+
+    def setUp(self):
+        """测试初始化：用伪终端模拟学生的终端"""
+        self.master, slave = pty.openpty()
+        self.stream = os.fdopen(slave, 'r', encoding='utf-8')
+        self.output = io.StringIO()
+
+    def tearDown(self):
+        self.stream.close()
+        os.close(self.master)
+
+    def test_waiting_does_not_block_loop(self):
+        """测试等待学生输入时事件循环上的其他协程继续运行"""
+        async def run():
+            provider = StdinInput(self.stream, self.output)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, os.write, self.master, "我完成了\n".encode('utf-8'))
+            return await _ticks_while(provider.ask("请输入: "))
+
+        text, ticks = asyncio.run(run())
+        self.assertEqual(text, "我完成了")
+        self.assertGreaterEqual(ticks, 5)
+        self.assertEqual(self.output.getvalue(), "请输入: ")
+
+    def test_cancel_releases_terminal(self):
+        """测试取消后不再读取终端，下一行留给之后的读取"""
+        async def run():
+            provider = StdinInput(self.stream, self.output)
+            token = CancellationToken()
+            pending = asyncio.ensure_future(provider.ask("", token))
+            await asyncio.sleep(0.01)
+            token.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+            os.write(self.master, "继续\n".encode('utf-8'))
+            return await provider.ask("")
+
+        self.assertEqual(asyncio.run(run()), "继续")
+
+    def test_non_terminal_stream(self):
+        """测试管道或 StringIO 输入按行读取，结束时抛出 EOFError"""
+        async def run():
+            provider = StdinInput(io.StringIO("一\n二\n"), self.output)
+            lines = [await provider.ask(""), await provider.ask("")]
+            with self.assertRaises(EOFError):
+                await provider.ask("")
+            return lines
+
+        self.assertEqual(asyncio.run(run()), ["一", "二"])
+
+
+class TestSocketInput(unittest.TestCase):
+    """测试 TCP 连接上的输入"""
+
+    def test_listen_and_reconnect(self):
+        """测试提示发送到连接上，学生断开后可以重新连接"""
+        async def run():
+            provider = await SocketInput.listen()
+            pending = asyncio.ensure_future(provider.ask("请输入: "))
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", provider.port)
+            prompt = await reader.readexactly(len("请输入: ".encode('utf-8')))
+            writer.close()
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", provider.port)
+            writer.write("我完成了\n".encode('utf-8'))
+            await writer.drain()
+            text = await pending
+            writer.close()
+            await provider.close()
+            return prompt.decode('utf-8'), text
+
+        prompt, text = asyncio.run(run())
+        self.assertEqual(prompt, "请输入: ")
+        self.assertEqual(text, "我完成了")
+
+
+if __name__ == "__main__":
+    unittest.main()
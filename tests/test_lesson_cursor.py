@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试课程进度游标
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.messages import MemoryQueryEvent, TextMessage
+from autogen_core import CancellationToken
+from autogen_core.memory import MemoryContent, MemoryMimeType
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from conversation_memory import RollingSummaryChatCompletionContext
+from lesson_cursor import LessonCursor, is_completion
+from script_parser import parse_script
+from teaching_assistant import TeachingAssistantAgent
+
+SCRIPT = """# 学习脚本
+
+## 🧩 任务一：角色扮演（5分钟）
+让AI扮演英语翻译。
+
+### ✅ 检查清单
+- [ ] 只输出英文
+
+## 🧩 任务二：分步思考（5分钟）
+让AI一步一步推理。
+"""
+
+
+class TestLessonCursor(unittest.TestCase):
+    """测试任务推进和上下文注入"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.lesson = LessonCursor(parse_script(SCRIPT))
+
+    def _task_messages(self, messages):
+        return [m.content for m in messages if isinstance(m, SystemMessage)]
+
+    def test_completion_phrases(self):
+        """测试完成表述的识别"""
+        for text in ("我完成了", "做完了，下一步", "好了", "继续！", "下一个"):
+            self.assertTrue(is_completion(text), text)
+        for text in ("还没完成", "完成了吗？", "这个不会做", "为什么输出是中文",
+                     "我继续试试", "请继续解释一下", "下一个例子是什么意思", "这个概念不太好了解"):
+            self.assertFalse(is_completion(text), text)
+
+    def test_learner_input_advances(self):
+        """测试学生的回复经过 input_func 时推进进度"""
+        replies = iter(["怎么复制？", "我完成了", "我完成了", "完成了"])
+        ask = self.lesson.wrap_input(lambda prompt: next(replies))
+        self.assertEqual(ask(""), "怎么复制？")
+        self.assertEqual(self.lesson.current.title, "🧩 任务一：角色扮演（5分钟）")
+        ask("")
+        self.assertEqual(self.lesson.index, 1)
+        ask("")
+        ask("")
+        self.assertTrue(self.lesson.finished)
+        self.assertIn("全部 2 个任务已完成", self.lesson.task_prompt())
+
+    def test_add_is_ignored(self):
+        """测试添加记忆不抛出异常，也不改变课程进度"""
+        asyncio.run(self.lesson.add(MemoryContent(content="学生喜欢举例", mime_type=MemoryMimeType.TEXT)))
+        self.assertEqual(self.lesson.index, 0)
+        self.assertIn("任务一", asyncio.run(self.lesson.query("")).results[0].content)
+
+    def test_pinned_in_rolling_context(self):
+        """测试滚动摘要上下文中始终只有当前任务"""
+        context = RollingSummaryChatCompletionContext(window_size=2, summarize_batch=1)
+
+        async def run():
+            await context.add_message(UserMessage(content="开始", source="user"))
+            await self.lesson.update_context(context)
+            for i in range(4):
+                await context.add_message(UserMessage(content=f"消息{i}", source="user"))
+            await self.lesson.update_context(context)
+            first = self._task_messages(await context.get_messages())
+            self.lesson.advance()
+            await self.lesson.update_context(context)
+            second = self._task_messages(await context.get_messages())
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(len(first), 1)
+        self.assertIn("只输出英文", first[0])
+        self.assertEqual(len(second), 1)
+        self.assertIn("一步一步推理", second[0])
+
+    def test_plain_context_added_once_per_task(self):
+        """测试普通上下文中每个任务只加入一次"""
+        context = UnboundedChatCompletionContext()
+
+        async def run():
+            results = [await self.lesson.update_context(context) for _ in range(3)]
+            self.lesson.advance()
+            results.append(await self.lesson.update_context(context))
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual([len(r.memories.results) for r in results], [1, 0, 0, 1])
+        self.assertEqual(len(self._task_messages(asyncio.run(context.get_messages()))), 2)
+
+    def test_tutor_sees_current_task(self):
+        """测试教学助手调用模型前上下文中是当前任务"""
+        agent = TeachingAssistantAgent(
+            ReplayChatCompletionClient(["请翻译这句话", "很好"]),
+            model_context=RollingSummaryChatCompletionContext(),
+            memory=[self.lesson],
+        )
+
+        async def say(text):
+            self.lesson.observe_learner(text)
+            return await agent.on_messages([TextMessage(content=text, source="user")], CancellationToken())
+
+        response = asyncio.run(say("开始吧"))
+        self.assertTrue(any(isinstance(m, MemoryQueryEvent) for m in response.inner_messages))
+        asyncio.run(say("我完成了"))
+        tasks = self._task_messages(asyncio.run(agent._model_context.get_messages()))
+        self.assertEqual(len(tasks), 1)
+        self.assertIn("【当前任务 2/2】", tasks[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+测试教学材料的分段读取与目录
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import material_reader
+from material_reader import find_section, format_toc, read_range, read_section, table_of_contents
+
+MARKDOWN = """# 学习脚本
+
+## 任务一：角色扮演
+让AI扮演一个角色。
+
+### 检查清单
+- 设定角色
+
+## 任务二：分步思考
+让AI一步一步想。
+"""
+
+PLAIN = """提示词工程最佳实践
+
+零样本提示词
+不给示例，直接让模型完成任务。
+少样本提示词
+给出几个示例，让模型模仿格式。
+"""
+
+
+class TestMaterialReader(unittest.TestCase):
+    """测试范围读取、目录和章节读取"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_range_aligned_to_characters(self):
+        """测试偏移落在多字节字符中间时对齐到字符边界"""
+        path = self._write("a.txt", "提示词工程")
+        text, next_offset, total = read_range(path, 1, 6)
+        self.assertEqual(text, "示词")
+        self.assertEqual((next_offset, total), (9, 15))
+
+    def test_chunked_read_covers_file(self):
+        """测试按块连续读取可以拼出完整文件"""
+        path = self._write("a.txt", PLAIN * 20)
+        parts, offset, total = [], 0, None
+        while total is None or offset < total:
+            text, offset, total = read_range(path, offset, 100)
+            parts.append(text)
+        self.assertEqual("".join(parts), PLAIN * 20)
+
+    def test_mmap_path(self):
+        """测试超过阈值的文件通过内存映射读取"""
+        path = self._write("big.md", MARKDOWN)
+        with patch.object(material_reader, "MMAP_THRESHOLD", 16):
+            with material_reader.open_material(path) as data:
+                self.assertNotIsInstance(data, bytes)
+            text, _, _ = read_range(path, 0, 14)
+        self.assertEqual(text, "# 学习脚本")
+
+    def test_markdown_toc(self):
+        """测试 Markdown 目录的层级与范围"""
+        path = self._write("script.md", MARKDOWN)
+        sections = table_of_contents(path)
+        self.assertEqual([(s.title, s.level) for s in sections],
+                         [("学习脚本", 1), ("任务一：角色扮演", 2), ("检查清单", 3), ("任务二：分步思考", 2)])
+        task_one = read_section(path, "任务一")
+        self.assertIn("检查清单", task_one)
+        self.assertNotIn("任务二", task_one)
+        self.assertIn("2. 任务一：角色扮演 [offset=", format_toc(sections))
+
+    def test_fenced_comment_not_heading(self):
+        """测试代码块中以 # 开头的行不是章节，章节范围包括整个代码块"""
+        text = "# 学习脚本\n\n## 任务一\n```python\n# 这是注释\nprint(1)\n```\n~~~\n## 也不是标题\n~~~\n## 任务二\n内容\n"
+        path = self._write("fenced.md", text)
+        sections = table_of_contents(path)
+        self.assertEqual([s.title for s in sections], ["学习脚本", "任务一", "任务二"])
+        self.assertIn("print(1)", read_section(path, "任务一"))
+        self.assertIn("## 也不是标题", read_section(path, "任务一"))
+
+    def test_plain_text_toc(self):
+        """测试纯文本材料把不以标点结尾的短行识别为标题"""
+        path = self._write("c1.txt", PLAIN)
+        sections = table_of_contents(path)
+        self.assertEqual([s.title for s in sections], ["提示词工程最佳实践", "零样本提示词", "少样本提示词"])
+        self.assertEqual(find_section(sections, "3").title, "少样本提示词")
+        self.assertTrue(read_section(path, "零样本提示词").endswith("直接让模型完成任务。\n"))
+
+    def test_toc_cache_invalidated_on_change(self):
+        """测试文件修改后目录重新生成"""
+        path = self._write("script.md", MARKDOWN)
+        self.assertEqual(len(table_of_contents(path)), 4)
+        self._write("script.md", MARKDOWN + "\n## 任务三：自动干活\n内容\n")
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(len(table_of_contents(path)), 5)
+
+    def test_missing_section(self):
+        """测试找不到章节时报错"""
+        path = self._write("script.md", MARKDOWN)
+        with self.assertRaises(ValueError):
+            read_section(path, "任务九")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试教学材料的 BM25 检索
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import material_search
+from material_search import MaterialSearch, tokenize
+from materials_index import MaterialsIndex
+
+C1 = """零样本提示词
+不给任何示例，直接描述任务，让模型完成分类或翻译。
+
+少样本提示词
+在提示词中给出几个输入和输出的示例，模型照着示例的格式回答。
+
+思维链提示法
+要求模型一步一步写出推理过程，再给出最终答案，适合数学题。
+"""
+
+ROLE = """# 角色扮演
+
+让模型担任面试官、翻译或老师，在 System 信息中描述角色的身份和说话风格。
+"""
+
+
+class TestTokenize(unittest.TestCase):
+    """测试切词规则"""
+
+    def test_cjk_bigrams_and_words(self):
+        """测试中文按二元组切分，英文转小写"""
+        self.assertEqual(list(tokenize("提示词 Prompt")), ["提示", "示词", "prompt"])
+        self.assertEqual(list(tokenize("学，GPT4")), ["学", "gpt4"])
+
+
+class TestMaterialSearch(unittest.TestCase):
+    """测试检索结果和增量刷新"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.docs = os.path.join(self.temp_dir.name, "docs")
+        os.makedirs(self.docs)
+        self._write("c1.txt", C1)
+        self._write("role.md", ROLE)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.docs, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _search(self):
+        index = MaterialsIndex(self.docs, manifest_path=os.path.join(self.temp_dir.name, "manifest.json"),
+                               chunk_tokens=40)
+        return MaterialSearch(index)
+
+    def test_ranking_and_path_filter(self):
+        """测试最相关的分块排在最前，且可以限定材料文件"""
+        search = self._search()
+        hits = search.search("少样本示例", top_k=2)
+        self.assertEqual(hits[0].path, "c1.txt")
+        self.assertEqual(hits[0].chunk.section, "少样本提示词")
+        self.assertIn("几个输入和输出", hits[0].text)
+
+        self.assertEqual(search.search("面试官")[0].path, "role.md")
+        self.assertEqual(search.search("面试官", path="c1.txt"), [])
+        self.assertEqual(search.search("量子计算"), [])
+
+    def test_only_changed_files_retokenized(self):
+        """测试缓存的词频被复用，只有内容变化的文件重新切词"""
+        self.assertEqual(self._search().refresh()["retokenized"], 2)
+
+        self._write("role.md", ROLE + "\n让模型扮演导游。\n")
+        search = self._search()
+        self.assertEqual(search.refresh()["retokenized"], 1)
+        self.assertEqual(search.search("导游")[0].path, "role.md")
+
+        # 材料没有变化时不重建索引，也不重新切词
+        with patch.object(material_search, "tokenize", side_effect=AssertionError("不应重新切词")):
+            self.assertEqual(search.refresh()["retokenized"], 0)
+            self.assertEqual(self._search().refresh()["retokenized"], 0)
+
+    def test_search_materials_tool(self):
+        """测试工具方法的输出格式，以及刷新后能检索到新材料"""
+        search = self._search()
+        result = asyncio.run(search.search_materials("思维链", top_k=1))
+        self.assertIn("[1] c1.txt · 思维链提示法", result)
+        self.assertIn("一步一步", result)
+
+        self._write("new.md", "# 提示词模板\n用花括号标出模板中的变量。\n")
+        self.assertIn("new.md", asyncio.run(search.search_materials("花括号变量")))
+        self.assertIn("没有找到", asyncio.run(search.search_materials("量子计算")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+测试教学材料增量索引
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import materials_index
+from materials_index import MaterialsIndex, chunk_material
+from material_reader import scan_sections
+
+SCRIPT = "# 学习脚本\n\n## 任务一\n" + "让AI扮演一个角色。\n" * 30 + "## 任务二\n让AI一步一步想。\n"
+
+
+class TestMaterialsIndex(unittest.TestCase):
+    """测试清单的增量刷新"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.docs = os.path.join(self.temp_dir.name, "docs")
+        os.makedirs(os.path.join(self.docs, "sub"))
+        self.manifest = os.path.join(self.temp_dir.name, "manifest.json")
+        self._write("script.md", SCRIPT)
+        self._write("sub/c1.txt", "零样本提示词\n不给示例，直接让模型完成任务。\n")
+        self._write("image.png", "不是材料")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.docs, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _index(self, **kwargs):
+        return MaterialsIndex(self.docs, manifest_path=self.manifest, chunk_tokens=50, **kwargs)
+
+    def test_first_refresh_and_reload(self):
+        """测试首次刷新计算全部条目，重新加载后全部复用"""
+        stats = self._index().refresh()
+        self.assertEqual(stats["added"], 2)
+
+        index = self._index()
+        with patch.object(materials_index, "scan_sections", side_effect=AssertionError("不应重新计算")):
+            stats = index.refresh()
+        self.assertEqual(stats["unchanged"], 2)
+        entry = index.get("script.md")
+        self.assertEqual([s.title for s in entry.sections], ["学习脚本", "任务一", "任务二"])
+        self.assertGreater(entry.tokens, 0)
+
+    def test_only_changed_entries_recomputed(self):
+        """测试只重新计算内容变化的文件，仅修改时间变化时复用"""
+        index = self._index()
+        index.refresh()
+        os.utime(os.path.join(self.docs, "script.md"), ns=(1, 1))
+        self._write("sub/c1.txt", "少样本提示词\n给出几个示例。\n")
+
+        stats = self._index().refresh()
+        self.assertEqual((stats["touched"], stats["changed"], stats["unchanged"]), (1, 1, 0))
+        self.assertEqual(self._index().get(os.path.join("sub", "c1.txt")).sections[0].title, "少样本提示词")
+
+    def test_removed_and_settings_change(self):
+        """测试删除的文件从清单移除，分块参数变化时全部重新计算"""
+        self._index().refresh()
+        os.remove(os.path.join(self.docs, "script.md"))
+        self.assertEqual(self._index().refresh()["removed"], 1)
+
+        index = MaterialsIndex(self.docs, manifest_path=self.manifest, chunk_tokens=100)
+        self.assertEqual(index.refresh()["added"], 1)
+
+    def test_excluded_paths(self):
+        """测试 .materialsignore 中列出的文件和目录不纳入索引，已索引的条目在加入后移除"""
+        self._index().refresh()
+        os.makedirs(os.path.join(self.docs, "courses"))
+        self._write(os.path.join("courses", "c1_course_script.md"), SCRIPT)
+        self.assertTrue(materials_index.add_exclude(self.docs, "script.md"))
+        self.assertTrue(materials_index.add_exclude(self.docs, os.path.join(self.docs, "courses") + os.sep))
+        self.assertFalse(materials_index.add_exclude(self.docs, os.path.join("courses", "c1_course_script.md")))
+        self.assertFalse(materials_index.add_exclude(self.docs, os.path.join(self.temp_dir.name, "outside.md")))
+
+        index = self._index()
+        stats = index.refresh()
+        self.assertEqual((stats["removed"], stats["added"]), (1, 0))
+        self.assertEqual([entry.path for entry in index.entries()], [os.path.join("sub", "c1.txt")])
+
+    def test_generated_scripts_in_docs_excluded(self):
+        """测试 docs/ 中已有的生成脚本不纳入索引"""
+        index = MaterialsIndex(materials_index.DEFAULT_DOCS_DIR, manifest_path=self.manifest)
+        index.refresh(save=False)
+        paths = [entry.path for entry in index.entries()]
+        self.assertIn("c1.txt", paths)
+        self.assertNotIn("prompt_engineering_course_001_script.md", paths)
+        self.assertNotIn("prompt_engineering_course_script.md", paths)
+
+    def test_chunks_cover_file_and_start_at_sections(self):
+        """测试分块首尾相接覆盖全文，且章节开头开始新分块（空章节除外）"""
+        data = SCRIPT.encode('utf-8')
+        sections = scan_sections(data)
+        chunks = chunk_material(data, sections, 50)
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(data))
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.end, current.start)
+        # 只有标题的分块并入下一章节
+        self.assertEqual(chunks[0].section, "学习脚本")
+        self.assertGreater(chunks[0].end, sections[1].start)
+        self.assertTrue(all(c.tokens >= 50 // 4 for c in chunks[:-1]))
+        self.assertTrue(all(c.tokens <= 50 for c in chunks))
+
+        index = self._index()
+        index.refresh()
+        entry = index.get("script.md")
+        self.assertEqual("".join(index.read_chunk("script.md", c) for c in entry.chunks), SCRIPT)
+
+
+if __name__ == "__main__":
+    unittest.main()
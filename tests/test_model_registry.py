@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试模型客户端注册表
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import ModelClientRegistry, SharedModelClient, resolve_model_choice
+
+
+class SlowReplayClient(ReplayChatCompletionClient):
+    """记录并发数的回放客户端"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak = 0
+        self.closed = False
+
+    async def create(self, messages, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return await super().create(messages, **kwargs)
+
+    async def close(self):
+        self.closed = True
+
+
+class TestModelClientRegistry(unittest.TestCase):
+    """测试注册表的客户端复用与并发控制"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.built = []
+
+        def fake_build(backend, model, model_info, options, client_kwargs):
+            client = SlowReplayClient(["回复"] * 10)
+            self.built.append(client)
+            return client
+
+        self.registry = ModelClientRegistry(default_max_concurrency=2)
+        patcher = patch.object(self.registry, "_build_client", side_effect=fake_build)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_key_shares_client(self):
+        """测试相同参数复用同一底层客户端"""
+        a = self.registry.get_client("ollama", "gemma3:27b", options={"num_ctx": 8192})
+        b = self.registry.get_client("ollama", "gemma3:27b", options={"num_ctx": 8192})
+        c = self.registry.get_client("ollama", "gemma3:27b", options={"num_ctx": 4096})
+
+        self.assertIsInstance(a, SharedModelClient)
+        self.assertIs(a.inner_client, b.inner_client)
+        self.assertIsNot(a.inner_client, c.inner_client)
+        self.assertEqual(len(self.built), 2)
+
+    def test_concurrency_limit(self):
+        """测试同一模型的并发请求数不超过上限"""
+        client = self.registry.get_client("ollama", "gemma3:27b")
+
+        async def run():
+            await asyncio.gather(*[
+                client.create([UserMessage(content="你好", source="user")]) for _ in range(6)
+            ])
+
+        asyncio.run(run())
+        self.assertEqual(self.built[0].peak, 2)
+
+    def test_close_is_shared(self):
+        """测试共享客户端的close不会关闭底层连接，aclose会关闭"""
+        client = self.registry.get_client("ollama", "gemma3:27b")
+        asyncio.run(client.close())
+        self.assertFalse(self.built[0].closed)
+
+        asyncio.run(self.registry.aclose())
+        self.assertTrue(self.built[0].closed)
+
+    def test_profile_client(self):
+        """测试按预置配置获取客户端"""
+        a = self.registry.get_profile_client("gemma3:27b")
+        b = self.registry.get_profile_client("gemma3:27b")
+        self.assertIs(a.inner_client, b.inner_client)
+        self.assertEqual(a.key[:2], ("ollama", "gemma3:27b"))
+
+
+class TestResolveModelChoice(unittest.TestCase):
+    """测试菜单选项解析"""
+
+    def test_choices(self):
+        """测试各个选项"""
+        self.assertEqual(resolve_model_choice("2"), "qwen3:30b")
+        self.assertEqual(resolve_model_choice(""), "gemma3:27b")
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_glm_fallback(self):
+        """测试未配置GLM环境变量时回退到默认模型"""
+        self.assertEqual(resolve_model_choice("3"), "gemma3:27b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试本地 Ollama 替身服务
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from autogen_core.models import CreateResult, UserMessage
+from autogen_ext.models.ollama import OllamaChatCompletionClient
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from ollama_standin import OllamaStandInServer, split_tokens
+
+MODEL_INFO = {
+    'vision': False,
+    'function_calling': True,
+    'json_output': False,
+    'structured_output': False,
+    'family': "gemma",
+}
+
+
+class TestOllamaStandInServer(unittest.TestCase):
+    """测试替身服务的流式协议"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.messages = [UserMessage(content="你好", source="user")]
+
+    def test_split_tokens(self):
+        """测试中文按字、英文按词切分"""
+        self.assertEqual(split_tokens("你好 world"), ["你", "好", " ", "world"])
+
+    def test_ollama_stream(self):
+        """测试 /api/chat 的NDJSON流"""
+        async def run():
+            async with OllamaStandInServer(tokens_per_second=0, ttft=0.05, replies=["测试回复"]) as server:
+                client = OllamaChatCompletionClient(model="gemma3:27b", host=server.url, model_info=MODEL_INFO)
+                chunks = [chunk async for chunk in client.create_stream(self.messages)]
+                await client.close()
+                return chunks, server.requests
+
+        chunks, requests = asyncio.run(run())
+        self.assertEqual(chunks[:-1], ["测", "试", "回", "复"])
+        self.assertIsInstance(chunks[-1], CreateResult)
+        self.assertEqual(chunks[-1].usage.completion_tokens, 4)
+        self.assertEqual(requests[0]["path"], "/api/chat")
+        self.assertGreaterEqual(requests[0]["first_token"] - requests[0]["started"], 0.05)
+
+    def test_openai_stream(self):
+        """测试 OpenAI 兼容接口的SSE流"""
+        async def run():
+            async with OllamaStandInServer(tokens_per_second=0, ttft=0, replies=["好的"]) as server:
+                client = OpenAIChatCompletionClient(
+                    model="glm-4.5", api_key="test", base_url=f"{server.url}/v1",
+                    model_info=dict(MODEL_INFO, family="glm"),
+                )
+                chunks = [chunk async for chunk in client.create_stream(self.messages)]
+                await client.close()
+                return chunks
+
+        chunks = asyncio.run(run())
+        self.assertEqual(chunks[-1].content, "好的")
+
+
+if __name__ == "__main__":
+    unittest.main()
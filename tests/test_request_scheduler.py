@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+测试按优先级调度模型请求
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import ModelClientRegistry
+from request_scheduler import BATCH, INTERACTIVE, PriorityScheduler
+
+
+class TimedReplayClient(ReplayChatCompletionClient):
+    """按回复内容模拟生成耗时的回放客户端"""
+
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(0.2 if "生成" in messages[-1].content else 0.01)
+        return await super().create(messages, **kwargs)
+
+
+class TestPriorityScheduler(unittest.TestCase):
+    """测试名额分配顺序"""
+
+    def _order(self, scheduler, requests, hold=0.01):
+        """先占满名额，再按顺序提交 (名称, 优先级, 客户端)，返回获得名额的顺序"""
+        order = []
+
+        async def request(name, priority, tenant):
+            async with scheduler.slot(priority, tenant):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE, "占用")
+            tasks = [asyncio.create_task(request(*r)) for r in requests]
+            await asyncio.sleep(0)
+            depth = scheduler.queue_depth()
+            scheduler.release(INTERACTIVE)
+            await asyncio.gather(*tasks)
+            return depth
+
+        depth = asyncio.run(run())
+        return order, depth
+
+    def test_interactive_first(self):
+        """测试先分配给 interactive，再分配给 batch"""
+        order, depth = self._order(PriorityScheduler(1), [
+            ("生成1", BATCH, "任务"), ("生成2", BATCH, "任务"), ("提示", INTERACTIVE, "学生"),
+        ])
+        self.assertEqual(order, ["提示", "生成1", "生成2"])
+        self.assertEqual(depth, {INTERACTIVE: 1, BATCH: 2})
+
+    def test_round_robin_between_tenants(self):
+        """测试同一类别中按客户端轮流分配"""
+        order, _ = self._order(PriorityScheduler(1), [
+            ("A1", BATCH, "A"), ("A2", BATCH, "A"), ("A3", BATCH, "A"), ("B1", BATCH, "B"),
+        ])
+        self.assertEqual(order, ["A1", "B1", "A2", "A3"])
+
+    def test_reserved_slot(self):
+        """测试 batch 不占用预留给 interactive 的名额"""
+        scheduler = PriorityScheduler(2, interactive_reserve=1)
+
+        async def run():
+            await scheduler.acquire(BATCH, "A")
+            second = asyncio.create_task(scheduler.acquire(BATCH, "B"))
+            await asyncio.sleep(0)
+            waiting = not second.done()
+            # 学生的请求立即获得预留名额
+            await asyncio.wait_for(scheduler.acquire(INTERACTIVE, "学生"), 0.1)
+            scheduler.release(INTERACTIVE)
+            scheduler.release(BATCH)
+            await second
+            return waiting, scheduler.stats()
+
+        waiting, stats = asyncio.run(run())
+        self.assertTrue(waiting)
+        self.assertEqual(stats["interactive_reserve"], 1)
+        self.assertEqual(stats[BATCH]["granted"], 2)
+        self.assertEqual(stats[BATCH]["active"], 1)
+
+    def test_cancelled_waiter(self):
+        """测试取消的请求离开队列，不占用名额"""
+        scheduler = PriorityScheduler(1)
+
+        async def run():
+            await scheduler.acquire(BATCH, "A")
+            waiter = asyncio.create_task(scheduler.acquire(BATCH, "B"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            depth = scheduler.queue_depth()[BATCH]
+            scheduler.release(BATCH)
+            await asyncio.wait_for(scheduler.acquire(INTERACTIVE, "学生"), 0.1)
+            return depth
+
+        self.assertEqual(asyncio.run(run()), 0)
+
+    def test_unknown_priority(self):
+        """测试未知优先级报错"""
+        with self.assertRaises(ValueError):
+            asyncio.run(PriorityScheduler(1).acquire("urgent"))
+
+
+class TestRegistryScheduling(unittest.TestCase):
+    """测试注册表中课程生成与实时教学共用模型"""
+
+    def test_interactive_latency_under_batch_load(self):
+        """测试多个课程生成任务进行时，学生的请求不需要等待生成结束"""
+        registry = ModelClientRegistry(default_max_concurrency=2, adaptive_num_ctx=False)
+
+        def fake_build(backend, model, model_info, options, client_kwargs):
+            return TimedReplayClient(["回复"] * 20)
+
+        async def run():
+            batch = [registry.get_client("ollama", "gemma3:27b", priority=BATCH) for _ in range(3)]
+            tutor = registry.get_client("ollama", "gemma3:27b")
+            jobs = [asyncio.create_task(client.create([UserMessage(content="生成课程", source="user")]))
+                    for client in batch]
+            await asyncio.sleep(0.05)
+            started = time.perf_counter()
+            await tutor.create([UserMessage(content="提示", source="user")])
+            latency = time.perf_counter() - started
+            await asyncio.gather(*jobs)
+            return latency, registry.stats()["scheduler"]["ollama/gemma3:27b"]
+
+        with patch.object(registry, "_build_client", side_effect=fake_build):
+            latency, stats = asyncio.run(run())
+        self.assertLess(latency, 0.1)
+        self.assertEqual(stats[INTERACTIVE]["wait_max"], 0.0)
+        self.assertEqual(stats[BATCH]["granted"], 3)
+        # 三个生成任务共用一个非预留名额，依次执行
+        self.assertGreater(stats[BATCH]["wait_max"], 0.3)
+
+    def test_batch_only_process_uses_all_slots(self):
+        """测试没有实时教学客户端的进程不预留名额，课程生成可以用满并发上限"""
+        registry = ModelClientRegistry(default_max_concurrency=2, adaptive_num_ctx=False)
+        with patch.object(registry, "_build_client", return_value=ReplayChatCompletionClient([])):
+            registry.get_client("ollama", "gemma3:27b", priority=BATCH)
+            scheduler = registry._schedulers[("ollama", "gemma3:27b")]
+            self.assertEqual(scheduler.interactive_reserve, 0)
+            registry.get_client("ollama", "gemma3:27b")
+        self.assertEqual(scheduler.interactive_reserve, 1)
+        self.assertEqual(PriorityScheduler(2).interactive_reserve, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试运行预算
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.conditions import TextMentionTermination
+from autogen_agentchat.messages import StopMessage, TextMessage
+from autogen_core.models import RequestUsage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import MODEL_PROFILES
+from run_budget import BudgetTermination, RunBudget
+from teaching_team import create_course_pipeline
+
+SCRIPT = "# 学习脚本\n\n## 第一节\n\n" + "提示词工程的练习。" * 20
+
+
+class TestRunBudget(unittest.TestCase):
+    """测试预算统计、终止条件和流水线提前结束"""
+
+    def test_from_env(self):
+        """测试未设置时不创建预算，设置时按上限判断"""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(RunBudget.from_env())
+        with patch.dict(os.environ, {"BUDGET_TOTAL_TOKENS": "100", "BUDGET_WALL_SECONDS": "1.5"}, clear=True):
+            budget = RunBudget.from_env()
+        self.assertEqual(budget.max_total_tokens, 100)
+        self.assertEqual(budget.max_seconds, 1.5)
+        self.assertIsNone(budget.max_model_calls)
+
+        budget.add(RequestUsage(prompt_tokens=60, completion_tokens=30))
+        self.assertIsNone(budget.exceeded())
+        budget.add(RequestUsage(prompt_tokens=5, completion_tokens=5))
+        self.assertEqual(budget.exceeded(), "总词元 100/100")
+        self.assertEqual(budget.usage(), {"calls": 2, "prompt_tokens": 65, "completion_tokens": 35})
+
+    def test_wall_clock(self):
+        """测试运行时间上限，reset 后重新计时"""
+        budget = RunBudget(max_seconds=0.05)
+        self.assertIsNone(budget.exceeded())
+        time.sleep(0.06)
+        self.assertIn("运行时间", budget.exceeded())
+        budget.reset()
+        self.assertIsNone(budget.exceeded())
+
+    def test_wrapped_client_counts_calls(self):
+        """测试经包装的客户端的流式和非流式调用都计入预算"""
+        budget = RunBudget(max_model_calls=2)
+        client = budget.wrap(ReplayChatCompletionClient(["一", "二"]))
+        messages = [UserMessage(content="你好", source="user")]
+
+        async def run():
+            await client.create(messages)
+            self.assertIsNone(budget.exceeded())
+            async for _ in client.create_stream(messages):
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(budget.exceeded(), "模型调用 2/2")
+
+    def test_termination_saves_best_draft(self):
+        """测试与 TextMentionTermination 组合，超出预算时保存最近一版完整脚本"""
+        budget = RunBudget(max_model_calls=2)
+        saved = []
+
+        async def save(draft):
+            saved.append(draft)
+
+        termination = TextMentionTermination("APPROVE") | BudgetTermination(
+            budget, draft_source="course_generator", on_budget_stop=save
+        )
+
+        async def run():
+            budget.add(RequestUsage(prompt_tokens=1, completion_tokens=1))
+            result = await termination([TextMessage(content=SCRIPT, source="course_generator")])
+            self.assertIsNone(result)
+            # 之后向文件处理器提出的简短请求不是完整脚本
+            budget.add(RequestUsage(prompt_tokens=1, completion_tokens=1))
+            return await termination([
+                TextMessage(content="请保存脚本", source="course_generator"),
+                TextMessage(content="还需要更多练习", source="curriculum_director"),
+            ])
+
+        stop = asyncio.run(run())
+        self.assertIsInstance(stop, StopMessage)
+        self.assertIn("超出预算（模型调用 2/2）", stop.content)
+        self.assertIn("已保存", stop.content)
+        self.assertEqual(saved, [SCRIPT])
+        self.assertTrue(termination.terminated)
+
+    def test_pipeline_stops_and_saves(self):
+        """测试流水线超出预算时不再修改，保存当前一版脚本"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, "c1.txt"), 'w', encoding='utf-8') as f:
+                f.write("提示词工程的基础知识")
+            # 生成 1 次、评审 2 次后用完预算，不会进入修改
+            client = ReplayChatCompletionClient(
+                [SCRIPT, "需要补充练习", "太难了", "# 修改稿"],
+                model_info=MODEL_PROFILES["gemma3:27b"]["model_info"],
+            )
+            budget = RunBudget(max_model_calls=2)
+            output = os.path.join(temp_dir, "script.md")
+
+            async def run():
+                pipeline = await create_course_pipeline(
+                    client, max_review_rounds=3, output_filename=output,
+                    materials_dir=temp_dir, budget=budget,
+                )
+                return pipeline, await pipeline.run("生成课程")
+
+            pipeline, result = asyncio.run(run())
+            self.assertEqual(pipeline.budget_exceeded, "模型调用 3/2")
+            self.assertFalse(pipeline.approved)
+            self.assertIn("超出预算（模型调用 3/2），已保存当前一版脚本", result.stop_reason)
+            with open(output, encoding='utf-8') as f:
+                self.assertEqual(f.read().strip(), SCRIPT.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+测试学习脚本解析
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import script_parser
+from script_parser import parse_script, parse_script_cached
+from teaching_assistant import parse_learning_script
+
+EMOJI_SCRIPT = """---
+title: "Prompt Engineering 沉浸式实战营"
+duration_minutes: 30
+tags: ["做中学", "零基础"]
+---
+
+# 🎮 欢迎来到训练营
+
+## 🧩 任务一：让AI变成一个人（15分钟）
+> 成就勋章
+
+### ✅ 检查清单（请逐项打钩）
+| 是否通过 | 检查项 |
+|---------|--------|
+| ✅ | 输出是否只有英文？ |
+| ✅ | 是否没有解释？ |
+
+## 🧩 任务二：分步思考（10分钟）
+```
+## 这不是标题
+```
+- [ ] 写出推理过程
+- [x] 给出最终答案
+
+## 📝 小测验
+1. 少样本提示的关键是什么？
+A. 更长的提示词
+B. 给出示例
+答案：B
+2. 思维链要求模型做什么？
+- A) 一步一步推理
+- B) 只给答案
+"""
+
+MODULE_SCRIPT = """# Prompt Engineering 实践学习脚本
+
+## 模块一：基础Prompt调试
+本模块练习基本结构。
+
+### 任务1.1：探索基本Prompt结构
+预计用时：5分钟
+1. 输入简单的Prompt
+
+### 任务1.2：调整Temperature参数
+**反思与总结：**
+
+## 实践总结
+### 创建经验卡片
+"""
+
+
+class TestParseScript(unittest.TestCase):
+    """测试两种脚本格式的解析"""
+
+    def test_section_tasks_with_frontmatter(self):
+        """测试二级标题即任务的格式：元数据、用时、检查清单和小测验"""
+        script = parse_script(EMOJI_SCRIPT)
+        self.assertEqual(script.title, "🎮 欢迎来到训练营")
+        self.assertEqual(script.frontmatter["tags"], ["做中学", "零基础"])
+        self.assertEqual(script.duration_minutes, 30)
+
+        first, second, quiz = script.tasks
+        self.assertEqual((first.id, first.number, first.minutes), (1, "一", 15))
+        self.assertEqual(first.checklist, ["输出是否只有英文？", "是否没有解释？"])
+        self.assertEqual(second.checklist, ["写出推理过程", "给出最终答案"])
+        # 代码块中的标题不拆分任务
+        self.assertIn("## 这不是标题", second.content)
+
+        self.assertEqual([q.answer for q in quiz.quiz], ["B", None])
+        self.assertEqual(script.quiz[0].options, ["更长的提示词", "给出示例"])
+        self.assertEqual(script.quiz[1].options, ["一步一步推理", "只给答案"])
+
+    def test_module_tasks(self):
+        """测试模块 / 任务两级格式"""
+        script = parse_script(MODULE_SCRIPT)
+        self.assertEqual([m.title for m in script.modules], ["模块一：基础Prompt调试", "实践总结"])
+        module = script.modules[0]
+        self.assertEqual(module.intro, "本模块练习基本结构。")
+        self.assertEqual([(t.id, t.number, t.title) for t in module.tasks],
+                         [(1, "1.1", "探索基本Prompt结构"), (2, "1.2", "调整Temperature参数")])
+        self.assertEqual(module.tasks[0].minutes, 5)
+        # 没有任务标题的模块整体作为一个任务
+        self.assertEqual(script.tasks[-1].title, "实践总结")
+        self.assertEqual(script.tasks[-1].id, 3)
+        self.assertEqual(script.duration_minutes, 5)
+
+    def test_legacy_dicts(self):
+        """测试 parse_learning_script 保持原有的字典格式"""
+        tasks = parse_learning_script(MODULE_SCRIPT)
+        self.assertEqual(tasks[0]["section"], "模块一：基础Prompt调试")
+        self.assertEqual(tasks[0]["title"], "探索基本Prompt结构")
+        self.assertEqual(tasks[0]["content"], "预计用时：5分钟\n1. 输入简单的Prompt")
+        self.assertEqual(set(tasks[0]), {"id", "section", "title", "content", "minutes"})
+
+
+class TestParseCache(unittest.TestCase):
+    """测试按内容哈希缓存解析结果"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        script_parser._memory_cache.clear()
+
+    def tearDown(self):
+        script_parser._memory_cache.clear()
+        self.temp_dir.cleanup()
+
+    def test_disk_cache_reused_across_runs(self):
+        """测试再次启动时从磁盘缓存读取，不重新解析"""
+        parsed = parse_script_cached(EMOJI_SCRIPT, self.temp_dir.name)
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 1)
+
+        script_parser._memory_cache.clear()
+        with patch.object(script_parser, "parse_script", side_effect=AssertionError("不应重新解析")):
+            cached = parse_script_cached(EMOJI_SCRIPT, self.temp_dir.name)
+            self.assertIs(parse_script_cached(EMOJI_SCRIPT, self.temp_dir.name), cached)
+        self.assertEqual(cached, parsed)
+
+    def test_date_in_frontmatter(self):
+        """测试元数据中不带引号的日期转为字符串，解析结果可以写入磁盘缓存"""
+        text = "---\ncreated: 2025-01-01\nupdated: 2025-01-02 08:30:00\n---\n" + MODULE_SCRIPT
+        parsed = parse_script_cached(text, self.temp_dir.name)
+        self.assertEqual(parsed.frontmatter["created"], "2025-01-01")
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 1)
+
+        script_parser._memory_cache.clear()
+        with patch.object(script_parser, "parse_script", side_effect=AssertionError("不应重新解析")):
+            self.assertEqual(parse_script_cached(text, self.temp_dir.name), parsed)
+
+    def test_changed_content_parsed_again(self):
+        """测试内容变化后重新解析"""
+        parse_script_cached(MODULE_SCRIPT, self.temp_dir.name)
+        script = parse_script_cached(MODULE_SCRIPT + "\n## 附录\n", self.temp_dir.name)
+        self.assertEqual(script.modules[-1].title, "附录")
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
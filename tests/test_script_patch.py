@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+测试学习脚本补丁
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from course_pipeline import CoursePipeline
+from model_registry import MODEL_PROFILES
+from script_patch import PatchError, apply_patch, outline, parse_patch, revise
+from teaching_team import CourseGeneratorAgent, CurriculumDirectorAgent, FileHandlerAgent, StudentAgent
+
+SCRIPT = """# 提示词工程入门
+
+## 模块一：基础
+
+### 任务1.1：认识提示词（5分钟）
+提示词是给模型的指令。
+
+```python
+# 这不是标题
+print("hello")
+```
+
+### 任务1.2：角色设定（5分钟）
+为模型设定角色。
+
+## 模块二：测验
+
+### 任务2.1：小测验（10分钟）
+1. 什么是提示词？
+"""
+
+PATCH = """好的，以下是修改：
+
+<<<REPLACE 任务1.2：角色设定（5分钟）
+### 任务1.2：角色设定（5分钟）
+为模型设定角色，并给出一个完整的示例。
+>>>
+<<<INSERT_AFTER ## 模块一：基础
+## 模块三：总结
+回顾全部知识点。
+>>>
+"""
+
+
+class TestScriptPatch(unittest.TestCase):
+    """测试补丁的解析、应用、检查和流水线中的补丁修改"""
+
+    def test_apply_replace_and_insert(self):
+        """测试按章节替换和插入，代码块中的 # 不算标题"""
+        operations = parse_patch(PATCH)
+        self.assertEqual([(op.action, op.target) for op in operations],
+                         [("REPLACE", "任务1.2：角色设定（5分钟）"), ("INSERT_AFTER", "模块一：基础")])
+        revised, applied = revise(SCRIPT, PATCH)
+
+        self.assertEqual(len(applied), 2)
+        self.assertIn("并给出一个完整的示例", revised)
+        self.assertIn("# 这不是标题", revised)
+        # 插入在整个模块一（包括其中的任务）之后
+        self.assertLess(revised.index("任务1.2"), revised.index("## 模块三：总结"))
+        self.assertLess(revised.index("## 模块三：总结"), revised.index("## 模块二：测验"))
+        self.assertNotIn("# 这不是标题", outline(SCRIPT))
+
+    def test_delete(self):
+        """测试删除章节"""
+        revised = apply_patch(SCRIPT, parse_patch("<<<DELETE 任务1.1：认识提示词（5分钟）\n>>>"))
+        self.assertNotIn("认识提示词", revised)
+        self.assertNotIn("print", revised)
+        self.assertIn("任务1.2", revised)
+
+    def test_invalid_patches(self):
+        """测试找不到章节、标题级别改变、没有结束标记和结果不完整时抛出 PatchError"""
+        bad_patches = [
+            "<<<REPLACE 任务9.9：不存在\n### 任务9.9：不存在\n>>>",
+            "<<<REPLACE 任务1.2：角色设定（5分钟）\n## 任务1.2：角色设定\n>>>",
+            "<<<REPLACE 任务1.2：角色设定（5分钟）\n没有标题\n>>>",
+            "<<<DELETE 任务1.2：角色设定（5分钟）",
+            "<<<REPLACE 模块一：基础\n## 模块一：基础\n```python\n>>>",
+            "<<<DELETE 模块一：基础\n>>>\n<<<DELETE 模块二：测验\n>>>",
+            "我已经按意见修改好了。",
+        ]
+        for patch in bad_patches:
+            with self.subTest(patch=patch):
+                with self.assertRaises(PatchError):
+                    revise(SCRIPT, patch)
+
+    def test_full_script_reply_is_accepted(self):
+        """测试模型没有使用补丁格式、直接输出完整脚本时作为重写接受"""
+        rewritten = SCRIPT.replace("为模型设定角色。", "为模型设定一个具体的角色。")
+        revised, applied = revise(SCRIPT, rewritten)
+        self.assertEqual(applied, [])
+        self.assertEqual(revised, rewritten)
+
+
+class TestPipelinePatchRevision(unittest.TestCase):
+    """测试流水线以补丁方式修改，补丁失败时改为重写"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, "c1.txt"), 'w', encoding='utf-8') as f:
+            f.write("提示词工程的基础知识")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _run(self, generator_replies):
+        file_handler = FileHandlerAgent(
+            ReplayChatCompletionClient([], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"]),
+            base_path=self.temp_dir.name,
+        )
+        pipeline = CoursePipeline(
+            file_handler,
+            CourseGeneratorAgent(ReplayChatCompletionClient(generator_replies)),
+            CurriculumDirectorAgent(ReplayChatCompletionClient(["角色设定缺少示例", "APPROVE"])),
+            StudentAgent(ReplayChatCompletionClient(["需要示例", "可以"])),
+            output_filename="script.md",
+            revision_mode="patch",
+        )
+        asyncio.run(pipeline.run("生成课程"))
+        with open(os.path.join(self.temp_dir.name, "script.md"), encoding='utf-8') as f:
+            return pipeline, f.read()
+
+    def test_patch_applied(self):
+        """测试补丁应用到上一版脚本后进入评审，保存的是完整的新脚本"""
+        pipeline, saved = self._run([SCRIPT, PATCH])
+        self.assertTrue(pipeline.approved)
+        self.assertEqual(pipeline.revisions, [{"round": 1, "mode": "patch", "operations": 2}])
+        self.assertIn("并给出一个完整的示例", saved)
+        self.assertIn("任务2.1：小测验", saved)
+
+    def test_fallback_to_rewrite(self):
+        """测试补丁无法应用时要求重写整篇脚本"""
+        rewritten = SCRIPT.replace("为模型设定角色。", "为模型设定角色，示例：你是一位英语老师。")
+        pipeline, saved = self._run([SCRIPT, "<<<DELETE 不存在的章节\n>>>", rewritten])
+        self.assertTrue(pipeline.approved)
+        self.assertEqual(pipeline.revisions[0]["mode"], "fallback")
+        self.assertIn("未找到章节", pipeline.revisions[0]["error"])
+        self.assertEqual(saved.strip(), rewritten.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
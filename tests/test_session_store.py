@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试教学会话的检查点与恢复
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import TextMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from lesson_cursor import LessonCursor
+from script_parser import parse_script
+from session_store import SessionCheckpointer, SessionStore, new_session_id
+from teaching_assistant import create_teaching_team
+
+SCRIPT = """# 学习脚本
+
+## 🧩 任务一：角色扮演（5分钟）
+让AI扮演英语翻译。
+
+## 🧩 任务二：分步思考（5分钟）
+让AI一步一步推理。
+"""
+
+
+class TestSessionStore(unittest.TestCase):
+    """测试检查点文件的保存和读取"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_save_load_and_list(self):
+        """测试保存后可以读取和列出"""
+        session_id = new_session_id()
+        asyncio.run(self.store.save(session_id, {"version": 1, "session_id": session_id, "updated_at": 1,
+                                                 "lesson": {"index": 2}}))
+        self.assertEqual(self.store.load(session_id)["lesson"], {"index": 2})
+        self.assertEqual([s["session_id"] for s in self.store.list_sessions()], [session_id])
+
+    def test_missing_and_invalid_ids(self):
+        """测试不存在的会话和非法的会话 ID"""
+        with self.assertRaises(FileNotFoundError):
+            self.store.load("missing")
+        with self.assertRaises(ValueError):
+            self.store.path("../etc/passwd")
+
+
+class TestCheckpointResume(unittest.TestCase):
+    """测试中断后从检查点恢复教学会话"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.temp_dir.name)
+        self.script = parse_script(SCRIPT)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def _session(self, replies, max_turns, answer):
+        client = ReplayChatCompletionClient(replies)
+        lesson = LessonCursor(self.script)
+        checkpointer = SessionCheckpointer(self.store, "s1", lesson=lesson, metadata={"model": "replay"})
+        team, _ = await create_teaching_team(client, max_turns=max_turns, lesson=lesson, checkpointer=checkpointer,
+                                             input_func=lambda prompt: answer)
+        return client, lesson, checkpointer, team
+
+    async def _run(self, team, task=None):
+        result = None
+        async for event in team.run_stream(task=task):
+            if isinstance(event, TaskResult):
+                result = event
+        return result
+
+    def test_resume_without_model_calls(self):
+        """测试恢复时不调用模型，进度和对话历史都保留"""
+        async def first_run():
+            _, lesson, checkpointer, team = await self._session(["请先翻译这句话", "很好，进入任务二"], max_turns=3,
+                                                                answer="我完成了")
+            await self._run(team, "开始教学")
+            # 模拟进程中断：最后一次检查点在等待学生输入前保存
+            return lesson.index, checkpointer.saves
+
+        index, saves = asyncio.run(first_run())
+        self.assertEqual(index, 1)
+        self.assertGreaterEqual(saves, 1)
+
+        async def resume():
+            client, lesson, checkpointer, team = await self._session(["请继续完成翻译任务"], max_turns=3, answer="好的")
+            await checkpointer.restore(self.store.load("s1"))
+            calls_after_restore = client._current_index
+            result = await self._run(team)
+            history = await team._participants[1]._model_context.get_messages()
+            return lesson.index, calls_after_restore, result, history
+
+        index, calls, result, history = asyncio.run(resume())
+        # 检查点在学生回答"我完成了"之前保存，恢复后仍在任务一
+        self.assertEqual(index, 0)
+        self.assertEqual(calls, 0)
+        # 恢复后先等待学生输入，然后教学助手基于原有历史继续（轮次计数也一并恢复）
+        chat = [m for m in result.messages if isinstance(m, TextMessage)]
+        self.assertEqual([m.source for m in chat], ["user", "teaching_assistant"])
+        self.assertTrue(any("请先翻译这句话" in str(m.content) for m in history))
+
+
+if __name__ == "__main__":
+    unittest.main()
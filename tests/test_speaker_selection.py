@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试基于规则的发言者选择
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.conditions import MaxMessageTermination
+from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.teams import SelectorGroupChat
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from speaker_selection import RuleBasedSpeakerSelector
+
+
+def _msg(source, content):
+    return TextMessage(source=source, content=content)
+
+
+class TestRuleBasedSpeakerSelector(unittest.TestCase):
+    """测试发言者选择规则"""
+
+    def test_two_party_alternation(self):
+        """测试两人对话交替发言，任务消息之后由 AI 代理先发言"""
+        selector = RuleBasedSpeakerSelector(["user", "teaching_assistant"])
+        self.assertEqual(selector([_msg("task", "开始教学")]), "teaching_assistant")
+        self.assertEqual(selector([_msg("teaching_assistant", "请完成任务一")]), "user")
+        self.assertEqual(selector([_msg("user", "完成了")]), "teaching_assistant")
+        self.assertEqual(selector.rule_selections, 3)
+
+    def test_explicit_addressing(self):
+        """测试点名时由被点名者发言"""
+        selector = RuleBasedSpeakerSelector(
+            ["user", "course_generator", "curriculum_director"],
+            aliases={"curriculum_director": ["课程总监"]},
+        )
+        self.assertEqual(selector([_msg("user", "@course_generator 请生成课程")]), "course_generator")
+        self.assertEqual(selector([_msg("course_generator", "课程总监：请审核")]), "curriculum_director")
+        self.assertEqual(selector([_msg("user", "请 @curriculum_director 看一下")]), "curriculum_director")
+
+    def test_ambiguous_falls_back_to_model(self):
+        """测试多人且无法判断时返回 None"""
+        selector = RuleBasedSpeakerSelector(["a", "b", "c"])
+        self.assertIsNone(selector([_msg("a", "大家觉得怎么样？")]))
+        self.assertIsNone(selector([_msg("a", "@b 和 @c 都看看")]))
+        self.assertEqual(selector.model_fallbacks, 2)
+
+    def test_no_selector_model_calls(self):
+        """测试团队中不再为选择发言者调用模型"""
+        selector_client = ReplayChatCompletionClient(["teaching_assistant"])
+        agent_client = ReplayChatCompletionClient(["回复一", "回复二", "回复三"])
+        team = SelectorGroupChat(
+            [
+                AssistantAgent("student", model_client=agent_client),
+                AssistantAgent("teaching_assistant", model_client=agent_client),
+            ],
+            model_client=selector_client,
+            selector_func=RuleBasedSpeakerSelector(["student", "teaching_assistant"]),
+            termination_condition=MaxMessageTermination(4),
+        )
+        result = asyncio.run(team.run(task="开始"))
+        self.assertEqual([m.source for m in result.messages[1:]], ["teaching_assistant", "student", "teaching_assistant"])
+        self.assertEqual(selector_client._current_index, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
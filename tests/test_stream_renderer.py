@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试合并输出的流式渲染器
+"""
+
+import asyncio
+import io
+import os
+import sys
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage, UserInputRequestedEvent
+from stream_renderer import StreamRenderer, render_stream
+
+
+class RecordingOutput(io.StringIO):
+    """记录 flush 次数及每次 flush 时已写出内容的输出流"""
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = []
+
+    def flush(self):
+        super().flush()
+        self.flushes.append(self.getvalue())
+
+
+def _reply(source, text):
+    """一条回复：逐字的流式片段，最后是完整消息"""
+    events = [ModelClientStreamingChunkEvent(content=ch, source=source) for ch in text]
+    return events + [TextMessage(content=text, source=source)]
+
+
+async def _stream(events, delay=0.0):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+    yield TaskResult(messages=[e for e in events if isinstance(e, TextMessage)], stop_reason="完成")
+
+
+class TestStreamRenderer(unittest.TestCase):
+    """测试合并写入、发言者标题和 headless 模式"""
+
+    def _render(self, events, delay=0.0, **kwargs):
+        output = RecordingOutput()
+        renderer = StreamRenderer(output=output, **kwargs)
+        result = asyncio.run(renderer.render(_stream(events, delay)))
+        return result, output, renderer
+
+    def test_coalesces_chunks(self):
+        """测试大量片段合并为少数几次写入，显示内容与 Console 一致"""
+        events = _reply("course_generator", "课程" * 500) + _reply("student", "太难了")
+        result, output, renderer = self._render(events, flush_interval=0.05)
+        self.assertEqual(result.stop_reason, "完成")
+        self.assertEqual(output.getvalue(), (
+            "---------- ModelClientStreamingChunkEvent (course_generator) ----------\n"
+            + "课程" * 500 + "\n"
+            + "---------- ModelClientStreamingChunkEvent (student) ----------\n太难了\n"
+        ))
+        stats = renderer.stats()
+        self.assertEqual(stats["chunks"], 1003)
+        self.assertLessEqual(stats["writes"], 3)
+
+    def test_size_and_time_budget(self):
+        """测试缓冲区写满时立即写出，慢速片段最多等待一个时间窗口"""
+        _, output, renderer = self._render(_reply("a", "x" * 100), delay=0.001,
+                                           flush_bytes=10, flush_interval=10)
+        self.assertGreaterEqual(renderer.stats()["writes"], 5)
+
+        _, output, renderer = self._render(_reply("a", "慢速片段"), delay=0.03, flush_interval=0.01)
+        stats = renderer.stats()
+        self.assertLess(stats["latency_max"], 0.03)
+        self.assertGreaterEqual(stats["writes"], 3)
+
+    def test_interleaved_sources_keep_headers(self):
+        """测试不同发言者的片段交错时，每次切换都重新输出标题"""
+        events = [
+            ModelClientStreamingChunkEvent(content="甲1", source="甲"),
+            ModelClientStreamingChunkEvent(content="乙1", source="乙"),
+            ModelClientStreamingChunkEvent(content="甲2", source="甲"),
+            TextMessage(content="甲1甲2", source="甲"),
+        ]
+        _, output, _ = self._render(events)
+        self.assertEqual(output.getvalue(), (
+            "---------- ModelClientStreamingChunkEvent (甲) ----------\n甲1\n"
+            "---------- ModelClientStreamingChunkEvent (乙) ----------\n乙1\n"
+            "---------- ModelClientStreamingChunkEvent (甲) ----------\n甲2\n"
+        ))
+
+    def test_flush_before_user_input(self):
+        """测试等待学生输入前写出全部缓冲内容"""
+        events = [ModelClientStreamingChunkEvent(content="请回答", source="teaching_assistant"),
+                  UserInputRequestedEvent(request_id="1", source="user")]
+        _, output, _ = self._render(events, flush_interval=10)
+        self.assertIn("请回答", output.flushes[0])
+
+    def test_headless(self):
+        """测试 headless 模式只输出完整消息"""
+        _, output, renderer = self._render(_reply("course_generator", "课程内容"), headless=True)
+        self.assertEqual(output.getvalue(), "---------- TextMessage (course_generator) ----------\n课程内容\n")
+        self.assertEqual(renderer.stats()["chunks"], 4)
+
+    def test_unknown_mode(self):
+        """测试未知的显示方式报错"""
+        with self.assertRaises(ValueError):
+            asyncio.run(render_stream(_stream([]), mode="fancy"))
+
+
+if __name__ == "__main__":
+    unittest.main()
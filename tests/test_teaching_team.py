@@ -6,6 +6,7 @@
 import asyncio
 import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import AsyncMock, patch, mock_open
 
@@ -43,17 +44,17 @@ class TestFileHandlerAgent(unittest.TestCase):
         content = asyncio.run(self.agent.read_file_content("test.txt"))
         self.assertEqual(content, "test content")
 
-    @patch("builtins.open", new_callable=mock_open)
-    def test_save_content_to_file(self, mock_file):
-        """测试保存文件内容"""
-        # 使用asyncio.run()来运行异步测试
-        result = asyncio.run(self.agent.save_content_to_file("test content", "test.txt"))
-        self.assertIn("内容已成功保存到文件", result)
-        mock_file.assert_called_once_with(
-            os.path.join(self.agent._base_path, "test.txt"), 
-            'w', 
-            encoding='utf-8'
-        )
+    def test_save_content_to_file(self):
+        """测试保存文件内容（临时文件写入后原子替换）"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.agent._base_path = temp_dir
+            # 使用asyncio.run()来运行异步测试
+            result = asyncio.run(self.agent.save_content_to_file("test content", "test.txt"))
+            self.assertIn("内容已成功保存到文件", result)
+            with open(os.path.join(temp_dir, "test.txt"), encoding='utf-8') as f:
+                self.assertEqual(f.read(), "test content")
+            # 不留下临时文件，保存的文件记入排除列表
+            self.assertEqual(sorted(os.listdir(temp_dir)), [".materialsignore", "test.txt"])
 
 
 class TestCourseGeneratorAgent(unittest.TestCase):
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试模型调用遥测
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import MODEL_PROFILES, ModelClientRegistry
+from request_scheduler import INTERACTIVE
+from teaching_team import create_course_pipeline
+from telemetry import TelemetryRecorder, instrument
+
+
+class TestTelemetry(unittest.TestCase):
+    """测试调用记录、排队时间和导出格式"""
+
+    def setUp(self):
+        """测试初始化：共享注册表分发的回放客户端"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.recorder = TelemetryRecorder(
+            jsonl_path=os.path.join(self.temp_dir.name, "calls.jsonl"),
+            prometheus_path=os.path.join(self.temp_dir.name, "metrics.prom"),
+            run_id="测试运行",
+        )
+        self.registry = ModelClientRegistry(default_max_concurrency=1, adaptive_num_ctx=False)
+        self.replies = ["第一条回复", "第二条回复", "第三条回复"]
+        patcher = patch.object(self.registry, "_build_client",
+                               side_effect=lambda *args: ReplayChatCompletionClient(self.replies))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _records(self):
+        with open(self.recorder.jsonl_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_stream_and_create_records(self):
+        """测试流式调用记录首字延迟，非流式调用不记录首字延迟，两者都记录词元数"""
+        client = instrument(self.registry.get_client("ollama", "gemma3:27b"), self.recorder, "course_generator")
+        messages = [UserMessage(content="请生成课程", source="user")]
+
+        async def run():
+            async for _ in client.create_stream(messages):
+                pass
+            await client.create(messages)
+
+        asyncio.run(run())
+        self.recorder.close()
+        stream_call, create_call = self._records()
+        self.assertEqual(stream_call["agent"], "course_generator")
+        self.assertEqual(stream_call["model"], "ollama/gemma3:27b")
+        self.assertEqual(stream_call["run_id"], "测试运行")
+        self.assertTrue(stream_call["streaming"])
+        self.assertIsNotNone(stream_call["ttft"])
+        self.assertGreater(stream_call["prompt_tokens"], 0)
+        self.assertGreater(stream_call["completion_tokens"], 0)
+        self.assertIsNone(create_call["ttft"])
+        self.assertEqual(self.recorder.summary()["course_generator"]["calls"], 2)
+
+    def test_queue_delay(self):
+        """测试记录在调度器中等待并发名额的时间"""
+        client = instrument(self.registry.get_client("ollama", "gemma3:27b"), self.recorder, "student")
+        scheduler = self.registry._schedulers[("ollama", "gemma3:27b")]
+
+        async def run():
+            await scheduler.acquire(INTERACTIVE, "占用")
+            asyncio.get_running_loop().call_later(0.1, scheduler.release, INTERACTIVE)
+            await client.create([UserMessage(content="你好", source="user")])
+
+        asyncio.run(run())
+        record = self._records()[0]
+        self.assertGreaterEqual(record["queue"], 0.09)
+        self.assertGreaterEqual(record["duration"], record["queue"])
+
+    def test_error_is_recorded(self):
+        """测试失败的调用同样记录"""
+        client = instrument(ReplayChatCompletionClient([]), self.recorder, "student")
+        with self.assertRaises(ValueError):
+            asyncio.run(client.create([UserMessage(content="你好", source="user")]))
+        record = self._records()[0]
+        self.assertIn("ValueError", record["error"])
+        self.assertEqual(self.recorder.summary()["student"]["errors"], 1)
+
+    def test_pipeline_per_agent_and_prometheus(self):
+        """测试流水线中每个代理分别记录，指标文件为 Prometheus 文本格式"""
+        with open(os.path.join(self.temp_dir.name, "c1.txt"), 'w', encoding='utf-8') as f:
+            f.write("提示词工程的基础知识")
+        client = ReplayChatCompletionClient(
+            ["# 学习脚本", "APPROVE", "APPROVE"], model_info=MODEL_PROFILES["gemma3:27b"]["model_info"]
+        )
+
+        async def run():
+            pipeline = await create_course_pipeline(
+                client, max_review_rounds=1, output_filename="script.md",
+                materials_dir=self.temp_dir.name, telemetry=self.recorder,
+            )
+            await pipeline.run("生成课程")
+
+        asyncio.run(run())
+        self.recorder.close()
+        summary = self.recorder.summary()
+        self.assertEqual({agent: entry["calls"] for agent, entry in summary.items()},
+                         {"course_generator": 1, "curriculum_director": 1, "student": 1})
+
+        with open(self.recorder.prometheus_path, encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn("# TYPE teaching_model_calls_total counter", text)
+        self.assertIn('teaching_model_calls_total{agent="student",model="', text)
+        self.assertIn('teaching_model_call_duration_seconds_bucket{agent="course_generator",', text)
+        self.assertIn('le="+Inf"} 1', text)
+        self.assertIn("模型调用统计", self.recorder.format_summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
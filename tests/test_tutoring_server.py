@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+测试多学生教学服务
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加src目录到路径以便导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from model_registry import ModelClientRegistry
+from session_store import SessionStore
+from tutoring_server import TutoringServer
+
+SCRIPT = """# 学习脚本
+
+## 🧩 任务一：角色扮演（5分钟）
+让AI扮演英语翻译。
+
+## 🧩 任务二：分步思考（5分钟）
+让AI一步一步推理。
+"""
+
+
+class TestTutoringServer(unittest.TestCase):
+    """测试多个会话在同一个事件循环中并发进行"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.script_dir = os.path.join(self.temp_dir.name, "docs")
+        os.makedirs(self.script_dir)
+        with open(os.path.join(self.script_dir, "lesson.md"), 'w', encoding='utf-8') as f:
+            f.write(SCRIPT)
+        self.store = SessionStore(os.path.join(self.temp_dir.name, "sessions"))
+        self.clients = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _client_factory(self, model):
+        client = ReplayChatCompletionClient([f"{model}：请翻译这句话", f"{model}：很好，进入任务二"] * 2)
+        self.clients.append(client)
+        return client
+
+    def _server(self, **kwargs):
+        return TutoringServer(store=self.store, client_factory=self._client_factory,
+                              script_dir=self.script_dir, **kwargs)
+
+    async def _wait_for_input(self, http, session_id, after=0):
+        """读取事件直到会话等待学生输入，返回 (事件列表, next)"""
+        events = []
+        while True:
+            data = (await http.get(f"/sessions/{session_id}/events",
+                                   params={"after": after, "wait": 5})).json()
+            events += data["events"]
+            after = data["next"]
+            if any(e["type"] in ("input_requested", "finished") for e in data["events"]):
+                return events, after
+
+    def test_concurrent_sessions(self):
+        """测试两名学生各自的对话和进度互不影响"""
+        async def run():
+            async with self._server() as server:
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    created = await asyncio.gather(*(
+                        http.post("/sessions", json={"model": model, "script": "lesson.md"})
+                        for model in ("a", "b")
+                    ))
+                    ids = [r.json()["session_id"] for r in created]
+                    first = await asyncio.gather(*(self._wait_for_input(http, sid) for sid in ids))
+
+                    # 只有第一名学生完成任务一
+                    await http.post(f"/sessions/{ids[0]}/input", json={"text": "我完成了"})
+                    await http.post(f"/sessions/{ids[1]}/input", json={"text": "怎么翻译？"})
+                    second = await asyncio.gather(*(
+                        self._wait_for_input(http, sid, after) for sid, (_, after) in zip(ids, first)
+                    ))
+                    states = [(await http.get(f"/sessions/{sid}")).json() for sid in ids]
+                    listed = (await http.get("/sessions")).json()["sessions"]
+                    deleted = await http.delete(f"/sessions/{ids[0]}")
+                    return created, ids, first, second, states, listed, deleted
+
+        created, ids, first, second, states, listed, deleted = asyncio.run(run())
+        self.assertEqual([r.status_code for r in created], [201, 201])
+        self.assertIn("→ 1. 🧩 任务一", created[0].json()["outline"])
+        for model, (events, _) in zip(("a", "b"), first):
+            messages = [e["content"] for e in events if e["type"] == "message"]
+            self.assertEqual(messages, [f"{model}：请翻译这句话"])
+        replies = [[e["content"] for e in events if e["type"] == "message"] for events, _ in second]
+        self.assertEqual(replies[0], ["我完成了", "a：很好，进入任务二"])
+        self.assertEqual(replies[1], ["怎么翻译？", "b：很好，进入任务二"])
+        self.assertEqual([s["task_index"] for s in states], [1, 0])
+        self.assertEqual([s["status"] for s in states], ["waiting_input", "waiting_input"])
+        self.assertEqual(len(listed), 2)
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual(self.store.load(ids[0])["lesson"], {"index": 1})
+
+    def test_resume_after_restart(self):
+        """测试服务重启后从检查点恢复会话，不调用模型"""
+        async def first():
+            async with self._server() as server:
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    session_id = (await http.post("/sessions", json={"script": "lesson.md"})).json()["session_id"]
+                    await self._wait_for_input(http, session_id)
+                    return session_id
+
+        session_id = asyncio.run(first())
+
+        async def resume():
+            async with self._server() as server:
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    resumed = await http.post(f"/sessions/{session_id}/resume")
+                    events, _ = await self._wait_for_input(http, session_id)
+                    return resumed, events
+
+        resumed, events = asyncio.run(resume())
+        self.assertEqual(resumed.status_code, 201)
+        self.assertEqual(resumed.json()["task_index"], 0)
+        self.assertEqual([e["type"] for e in events], ["input_requested"])
+        self.assertEqual(self.clients[-1]._current_index, 0)
+
+    def test_errors(self):
+        """测试非法脚本路径、不存在的会话和会话上限"""
+        async def run():
+            async with self._server(max_sessions=1) as server:
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    escaped = await http.post("/sessions", json={"script": "../../etc/passwd"})
+                    missing = await http.post("/sessions/nope/input", json={"text": "你好"})
+                    await http.post("/sessions", json={"script": "lesson.md"})
+                    full = await http.post("/sessions", json={"script": "lesson.md"})
+                    bad_json = await http.post("/sessions", content=b"{")
+                    return escaped, missing, full, bad_json
+
+        escaped, missing, full, bad_json = asyncio.run(run())
+        self.assertEqual(escaped.status_code, 400)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(full.status_code, 503)
+        self.assertEqual(bad_json.status_code, 400)
+
+    def test_bad_requests_get_a_response(self):
+        """测试未知模型、非对象请求体返回 400，未预料的错误返回 500 且连接不被直接断开"""
+        def broken_factory(model):
+            raise RuntimeError("模型主机不可用")
+
+        async def run():
+            registry = ModelClientRegistry(adaptive_num_ctx=False)
+            async with TutoringServer(store=self.store, registry=registry, script_dir=self.script_dir) as server:
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    unknown = await http.post("/sessions", json={"model": "nope", "script": "lesson.md"})
+                    listed = await http.post("/sessions", json=["lesson.md"])
+            async with self._server() as server:
+                server._client_factory = broken_factory
+                async with httpx.AsyncClient(base_url=server.url) as http:
+                    broken = await http.post("/sessions", json={"script": "lesson.md"})
+                    health = await http.get("/health")
+            return unknown, listed, broken, health
+
+        unknown, listed, broken, health = asyncio.run(run())
+        self.assertEqual(unknown.status_code, 400)
+        self.assertIn("未知的模型", unknown.json()["error"])
+        self.assertEqual(listed.status_code, 400)
+        self.assertEqual(broken.status_code, 500)
+        self.assertIn("RuntimeError", broken.json()["error"])
+        self.assertEqual(health.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()